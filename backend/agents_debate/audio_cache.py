@@ -0,0 +1,180 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+AUDIO_CACHE_DIR = os.getenv('AUDIO_CACHE_DIR', os.path.join('.cache', 'audio'))
+AUDIO_CACHE_MAX_MB = float(os.getenv('AUDIO_CACHE_MAX_MB', '512'))
+
+FILE_EXTENSIONS = {"mp3": "mp3", "opus": "ogg", "pcm": "pcm", "ulaw": "ulaw", "alaw": "alaw"}
+
+
+def audio_cache_key(text, voice_id, model_id, output_format):
+    return hashlib.sha256(f"{voice_id}\x00{model_id}\x00{output_format}\x00{text}".encode('utf-8')).hexdigest()
+
+
+class AudioCache:
+    """
+    Content-addressed store for synthesized speech
+
+    Clips live on disk as one file per key (written to a .part file and renamed, so a
+    reader never sees a partial clip), with a SQLite index of sizes and last use. When
+    the files exceed max_bytes the least recently used are deleted. Small clips are
+    also kept in an in-memory LRU of at most memory_bytes.
+    """
+
+    def __init__(self, directory=AUDIO_CACHE_DIR, max_bytes=int(AUDIO_CACHE_MAX_MB * 1024 * 1024),
+                 memory_bytes=16 * 1024 * 1024, max_memory_clip_bytes=1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.max_memory_clip_bytes = max_memory_clip_bytes
+        self._memory = OrderedDict()
+        self._memory_size = 0
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(os.path.join(directory, "index.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS clips (key TEXT PRIMARY KEY, filename TEXT NOT NULL, "
+            "output_format TEXT NOT NULL, size INTEGER NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._disk_size = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM clips").fetchone()[0]
+
+    def _remember(self, key, data):
+        if len(data) > self.max_memory_clip_bytes:
+            return
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.memory_bytes:
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_size -= len(evicted)
+
+    def _lookup_file(self, key):
+        """(path, output_format) of an on-disk clip, marking it used; drops rows whose file vanished"""
+        row = self._conn.execute("SELECT filename, output_format, size FROM clips WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        path = os.path.join(self.directory, row[0])
+        if not os.path.exists(path):
+            self._conn.execute("DELETE FROM clips WHERE key = ?", (key,))
+            self._conn.commit()
+            self._disk_size -= row[2]
+            return None
+        self._conn.execute("UPDATE clips SET last_used = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+        return path, row[1]
+
+    def get_bytes(self, key):
+        """The clip's audio from memory or disk, or None on a miss"""
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return data
+            found = self._lookup_file(key)
+            if found is None:
+                self._stats["misses"] += 1
+                return None
+            with open(found[0], "rb") as handle:
+                data = handle.read()
+            self._stats["disk_hits"] += 1
+            self._remember(key, data)
+            return data
+
+    def get_file(self, key):
+        """(path, output_format) for serving a cached clip straight from disk, or None"""
+        with self._lock:
+            found = self._lookup_file(key)
+            if found is not None:
+                self._stats["disk_hits"] += 1
+            return found
+
+    def put(self, key, data, output_format):
+        extension = FILE_EXTENSIONS.get(output_format.split("_")[0], "bin")
+        filename = os.path.join(key[:2], f"{key}.{extension}")
+        path = os.path.join(self.directory, filename)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        part_path = f"{path}.{threading.get_ident()}.part"
+        with open(part_path, "wb") as handle:
+            handle.write(data)
+        os.replace(part_path, path)
+
+        with self._lock:
+            previous = self._conn.execute("SELECT size FROM clips WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO clips (key, filename, output_format, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                (key, filename, output_format, len(data), time.time())
+            )
+            self._conn.commit()
+            self._disk_size += len(data) - (previous[0] if previous else 0)
+            self._remember(key, data)
+            self._evict()
+
+    def _evict(self):
+        """Delete least recently used clips until the store fits in max_bytes"""
+        if self._disk_size <= self.max_bytes:
+            return
+        evicted = []
+        for key, filename, size in self._conn.execute("SELECT key, filename, size FROM clips ORDER BY last_used"):
+            if self._disk_size <= self.max_bytes:
+                break
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except OSError:
+                pass
+            self._disk_size -= size
+            evicted.append((key,))
+        self._conn.executemany("DELETE FROM clips WHERE key = ?", evicted)
+        self._conn.commit()
+        self._stats["evictions"] += len(evicted)
+
+    def stream_through(self, key, chunks, output_format):
+        """
+        Yield audio from the cache, or from `chunks` while recording it
+
+        The clip is only stored once the upstream stream completes, so an interrupted
+        synthesis is never cached.
+        """
+        data = self.get_bytes(key)
+        if data is not None:
+            yield data
+            return
+        received = []
+        for chunk in chunks:
+            received.append(chunk)
+            yield chunk
+        self.put(key, b"".join(received), output_format)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["memory_entries"] = len(self._memory)
+            stats["memory_bytes"] = self._memory_size
+            stats["disk_entries"] = self._conn.execute("SELECT COUNT(*) FROM clips").fetchone()[0]
+            stats["disk_bytes"] = self._disk_size
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = round((stats["memory_hits"] + stats["disk_hits"]) / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_audio_cache = None
+_audio_cache_lock = threading.Lock()
+
+
+def get_audio_cache():
+    """Shared AudioCache, opened on first use"""
+    global _audio_cache
+    with _audio_cache_lock:
+        if _audio_cache is None:
+            _audio_cache = AudioCache()
+        return _audio_cache
@@ -0,0 +1,168 @@
+import asyncio
+import io
+import threading
+import time
+
+from .elevens_labs import init_mixer, synthesize_speech
+from .speech_pipeline import AudioLane
+
+
+class AudioSession:
+    """
+    Audio output and playback state for one debate, keyed by its debate ID
+
+    Each session plays on its own pygame mixer channel, so concurrent debates are
+    mixed together instead of queueing for the mixer's single music stream, and
+    playback is awaited by polling rather than by holding a worker thread. With client
+    delivery nothing is played here; the same pause/stop state gates the clips sent.
+    """
+
+    def __init__(self, session_id, channel_id, delivery="server", window=3):
+        self.session_id = session_id
+        self.channel_id = channel_id
+        self.delivery = delivery
+        self.window = window
+        self.paused = False
+        self.stopped = False
+        self.playing = False
+        self.clips_done = 0
+        self.created_at = time.time()
+        self._lane = None
+
+    def _channel(self):
+        import pygame
+        if pygame.mixer.get_num_channels() <= self.channel_id:
+            pygame.mixer.set_num_channels(self.channel_id + 1)
+        return pygame.mixer.Channel(self.channel_id)
+
+    def _synthesize(self, text, voice_name):
+        # A stopped session skips synthesis for anything still queued
+        if self.stopped:
+            return None
+        return synthesize_speech(text, voice_name)
+
+    def lane(self):
+        """Ordered sentence-by-sentence output, created on first use"""
+        if self._lane is None:
+            self._lane = AudioLane(self._synthesize, self.play, window=self.window)
+        return self._lane
+
+    async def wait_while_paused(self):
+        while self.paused and not self.stopped:
+            await asyncio.sleep(0.05)
+
+    async def play(self, audio):
+        """Play MP3 audio on the session's channel; returns once it has finished or was stopped"""
+        if self.stopped or not audio:
+            return False
+        if not await asyncio.to_thread(init_mixer):
+            print("❌ Pygame mixer not initialized")
+            return False
+
+        import pygame
+        sound = await asyncio.to_thread(pygame.mixer.Sound, file=io.BytesIO(audio))
+        await self.wait_while_paused()
+        if self.stopped:
+            return False
+
+        channel = self._channel()
+        channel.play(sound)
+        self.playing = True
+        try:
+            # A paused channel stays busy, so this also waits out pauses
+            while channel.get_busy():
+                await asyncio.sleep(0.05)
+        finally:
+            self.playing = False
+        if self.stopped:
+            return False
+        self.clips_done += 1
+        return True
+
+    async def speak(self, text, voice_name):
+        """Synthesize text and play it"""
+        return await self.play(await asyncio.to_thread(self._synthesize, text, voice_name))
+
+    def delivered(self):
+        """Record a clip sent to the client"""
+        self.clips_done += 1
+
+    def pause(self):
+        self.paused = True
+        if self.playing:
+            self._channel().pause()
+
+    def resume(self):
+        self.paused = False
+        if self.playing:
+            self._channel().unpause()
+
+    def stop(self):
+        """Stop the current clip and skip everything still queued for this debate"""
+        self.stopped = True
+        if self.playing:
+            self._channel().stop()
+
+    async def drain(self):
+        """Wait until everything queued on the lane has been played"""
+        if self._lane is not None:
+            await self._lane.drain()
+
+    def close(self):
+        if self._lane is not None:
+            self._lane.cancel()
+        self.stop()
+
+    def status(self):
+        return {
+            "session_id": self.session_id,
+            "delivery": self.delivery,
+            "is_playing": self.playing and not self.paused,
+            "paused": self.paused,
+            "stopped": self.stopped,
+            "clips_done": self.clips_done,
+            "started": round(self.created_at, 3)
+        }
+
+
+class AudioSessionRegistry:
+    """Open audio sessions; each holds a mixer channel until it is closed"""
+
+    def __init__(self):
+        self._sessions = {}
+        self._free_channels = []
+        self._next_channel = 0
+        self._lock = threading.Lock()
+
+    def open(self, session_id, delivery="server", window=3):
+        """Return the session for session_id, creating it if needed"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                if self._free_channels:
+                    channel_id = self._free_channels.pop()
+                else:
+                    channel_id = self._next_channel
+                    self._next_channel += 1
+                session = AudioSession(session_id, channel_id, delivery, window)
+                self._sessions[session_id] = session
+            return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def close(self, session_id):
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is not None:
+                self._free_channels.append(session.channel_id)
+        if session is not None:
+            session.close()
+
+    def sessions(self):
+        with self._lock:
+            return list(self._sessions.values())
+
+
+audio_sessions = AudioSessionRegistry()
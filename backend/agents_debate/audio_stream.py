@@ -0,0 +1,85 @@
+import asyncio
+import threading
+from collections import OrderedDict
+
+from .elevens_labs import cached_speech, speech_cache_key
+
+DEFAULT_MODEL_ID = "eleven_multilingual_v2"
+DEFAULT_OUTPUT_FORMAT = "mp3_44100_128"
+CLIP_PATH = "/debate/audio/clip/{clip_id}"
+
+MEDIA_TYPES = {
+    "mp3": "audio/mpeg",
+    "pcm": "audio/L16",
+    "ulaw": "audio/basic",
+    "alaw": "audio/x-alaw-basic",
+    "opus": "audio/ogg",
+}
+
+
+def media_type_for(output_format):
+    return MEDIA_TYPES.get(output_format.split("_")[0], "application/octet-stream")
+
+
+class AudioClip:
+    """An utterance to be synthesized for a client, identified by its audio cache key"""
+
+    def __init__(self, clip_id, text, voice_name, model_id=DEFAULT_MODEL_ID, output_format=DEFAULT_OUTPUT_FORMAT):
+        self.clip_id = clip_id
+        self.text = text
+        self.voice_name = voice_name
+        self.model_id = model_id
+        self.output_format = output_format
+
+    @property
+    def media_type(self):
+        return media_type_for(self.output_format)
+
+    @property
+    def url(self):
+        return CLIP_PATH.format(clip_id=self.clip_id)
+
+    def stream(self):
+        """Audio bytes from the cache, or as ElevenLabs produces them (blocking iterator)"""
+        return cached_speech(self.text, self.voice_name, self.model_id, self.output_format)
+
+    async def astream(self):
+        """Same as stream(), without blocking the event loop"""
+        iterator = self.stream()
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, None)
+            if chunk is None:
+                return
+            yield chunk
+
+
+class ClipRegistry:
+    """
+    Clips announced to clients and not yet fetched
+
+    Synthesis only starts when a client requests a clip, so the debate never waits on
+    audio. Clip IDs are content addresses, so the same text and voice always map to the
+    same clip. The most recent max_clips clips are kept.
+    """
+
+    def __init__(self, max_clips=512):
+        self.max_clips = max_clips
+        self._clips = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, text, voice_name, model_id=DEFAULT_MODEL_ID, output_format=DEFAULT_OUTPUT_FORMAT):
+        clip_id = speech_cache_key(text, voice_name, model_id, output_format)
+        clip = AudioClip(clip_id, text, voice_name, model_id, output_format)
+        with self._lock:
+            self._clips[clip_id] = clip
+            self._clips.move_to_end(clip_id)
+            while len(self._clips) > self.max_clips:
+                self._clips.popitem(last=False)
+        return clip
+
+    def get(self, clip_id):
+        with self._lock:
+            return self._clips.get(clip_id)
+
+
+clip_registry = ClipRegistry()
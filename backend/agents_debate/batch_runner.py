@@ -0,0 +1,188 @@
+"""
+Run debates over many claims concurrently and write the results to JSONL
+
+Usage (from backend/):
+    python -m agents_debate.batch_runner claims.jsonl -o debates.jsonl
+    python -m agents_debate.batch_runner claims.txt -o debates.jsonl --concurrency 16 --llm-concurrency 8
+
+Input is a text file with one claim per line, or JSONL whose objects carry the
+claim under "claim" (or "content", as in /vid fact-check results) and optionally
+an "id". Each completed debate is appended to the output as one JSON line as soon
+as it finishes, and progress is reported on stderr.
+
+Rerunning with the same output file resumes the batch: claims already written
+successfully are skipped, and debates that were interrupted mid-way continue from
+their last checkpointed turn (each claim's debate ID is derived from its claim ID).
+
+Throughput scales with --concurrency (debates in flight) up to the upstream caps,
+--llm-concurrency and --retrieval-concurrency, which are shared by all debates.
+All debates share one DebateService, so its embedding and retrieval caches are
+shared across claims.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import time
+
+from .debate_service import get_debate_service
+
+
+def claim_id(claim):
+    return hashlib.sha1(claim.strip().lower().encode('utf-8')).hexdigest()[:16]
+
+
+def load_claims(path):
+    """[(claim_id, claim)] from a text or JSONL file, skipping blank lines and repeats"""
+    claims = []
+    seen = set()
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            record_id = None
+            if line.startswith("{"):
+                record = json.loads(line)
+                claim = record.get("claim") or record.get("content")
+                record_id = record.get("id")
+            else:
+                claim = line
+            if not claim:
+                continue
+            record_id = str(record_id) if record_id is not None else claim_id(claim)
+            if record_id not in seen:
+                seen.add(record_id)
+                claims.append((record_id, claim))
+    return claims
+
+
+def load_completed(path):
+    """IDs of claims already written successfully to the output file"""
+    completed = set()
+    if not os.path.exists(path):
+        return completed
+    with open(path, encoding='utf-8') as handle:
+        for line in handle:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A line cut short by a crash; that claim is simply run again
+                continue
+            if record.get("status") == "ok":
+                completed.add(record["id"])
+    return completed
+
+
+class Progress:
+
+    def __init__(self, total, stream=sys.stderr):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.started = time.monotonic()
+        self.stream = stream
+
+    def update(self, record):
+        self.done += 1
+        if record["status"] != "ok":
+            self.failed += 1
+        elapsed = time.monotonic() - self.started
+        rate = self.done / elapsed if elapsed else 0.0
+        eta = (self.total - self.done) / rate if rate else 0.0
+        print(f"[{self.done}/{self.total}] {record['status']} {record['id']} ({record['elapsed_s']}s) | "
+              f"{rate:.2f} debates/s, {self.failed} failed, eta {eta:.0f}s", file=self.stream, flush=True)
+
+
+async def run_claim(service, record_id, claim, args):
+    started = time.monotonic()
+    debate_id = f"{args.id_prefix}{record_id}"
+    try:
+        result = await service.run_debate(
+            claim=claim,
+            max_rounds=args.max_rounds,
+            include_audio=False,
+            debate_mode="text_only",
+            refresh_evidence=args.refresh_evidence,
+            debate_id=debate_id,
+            latency_budget_s=args.latency_budget
+        )
+        return {
+            "id": record_id,
+            "claim": claim,
+            "debate_id": debate_id,
+            "status": "ok",
+            "total_exchanges": len(result["conversation_history"]),
+            "conversation_history": result["conversation_history"],
+            "elapsed_s": round(time.monotonic() - started, 2)
+        }
+    except Exception as e:
+        return {
+            "id": record_id,
+            "claim": claim,
+            "debate_id": debate_id,
+            "status": "error",
+            "error": str(e),
+            "elapsed_s": round(time.monotonic() - started, 2)
+        }
+
+
+async def run_batch(claims, args, service=None):
+    """Run every claim, appending each result to args.output as it completes"""
+    service = service or get_debate_service()
+    service.set_concurrency_limits(args.llm_concurrency, args.retrieval_concurrency)
+    slots = asyncio.Semaphore(args.concurrency)
+    progress = Progress(len(claims))
+
+    async def worker(record_id, claim):
+        async with slots:
+            return await run_claim(service, record_id, claim, args)
+
+    with open(args.output, "a", encoding='utf-8') as output:
+        tasks = [asyncio.create_task(worker(record_id, claim)) for record_id, claim in claims]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                record = await finished
+                output.write(json.dumps(record) + "\n")
+                output.flush()
+                progress.update(record)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await service.aclose()
+    return progress
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run debates over a list of claims")
+    parser.add_argument("claims", help="Text file with one claim per line, or JSONL with claim/content fields")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--concurrency", type=int, default=8, help="Debates in flight at once")
+    parser.add_argument("--llm-concurrency", type=int, default=4, help="Concurrent LLM calls across all debates")
+    parser.add_argument("--retrieval-concurrency", type=int, default=4,
+                        help="Concurrent vector searches across all debates")
+    parser.add_argument("--max-rounds", type=int, default=4)
+    parser.add_argument("--latency-budget", type=float, help="Per-debate latency budget in seconds")
+    parser.add_argument("--refresh-evidence", action="store_true")
+    parser.add_argument("--id-prefix", default="batch-", help="Prefix of the checkpointed debate IDs")
+    args = parser.parse_args(argv)
+
+    claims = load_claims(args.claims)
+    completed = load_completed(args.output)
+    pending = [(record_id, claim) for record_id, claim in claims if record_id not in completed]
+    print(f"{len(claims)} claims, {len(claims) - len(pending)} already done, {len(pending)} to run",
+          file=sys.stderr, flush=True)
+    if not pending:
+        return
+
+    progress = asyncio.run(run_batch(pending, args))
+    elapsed = time.monotonic() - progress.started
+    print(f"Finished {progress.done} debates in {elapsed:.1f}s ({progress.failed} failed)", file=sys.stderr)
+    if progress.failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
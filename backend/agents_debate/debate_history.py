@@ -0,0 +1,145 @@
+from contextlib import nullcontext
+from .debate_scheduler import THINKING_TOKENS
+from .ingestion import count_tokens
+from .lexical_index import tokenize
+from llm_accounting import generate_async
+
+
+def hit_token_cap(response):
+    """Whether generation stopped at max_output_tokens rather than finishing"""
+    try:
+        reason = response.candidates[0].finish_reason
+    except (AttributeError, IndexError, TypeError):
+        # Cached and replayed responses carry no candidates
+        return False
+    return getattr(reason, "name", str(reason)) == "MAX_TOKENS"
+
+
+class DebateHistoryManager:
+    """
+    Keeps debate prompts a constant size regardless of how many rounds are run
+
+    The last keep_last turns are quoted verbatim; everything older is folded into a
+    running summary stored in the debate state (history_summary, covering the first
+    summary_covers turns). The summary for the next prompt is produced by a cheaper
+    model while the current speaker is generating, so it is off the critical path.
+    Evidence is capped by a token budget, skipping passages that mostly repeat one
+    already selected.
+
+    summary_max_tokens is the room for the summary itself (150 words is about 200
+    tokens); the summary model thinks before answering and that counts against the
+    cap, so THINKING_TOKENS["flash"] is added on top of it.
+    """
+
+    def __init__(self, summary_model, keep_last=2, summary_max_tokens=256,
+                 evidence_token_budget=1200, redundancy_threshold=0.6, excerpt_chars=240):
+        self.summary_model = summary_model
+        self.keep_last = keep_last
+        self.summary_max_tokens = summary_max_tokens
+        self.evidence_token_budget = evidence_token_budget
+        self.redundancy_threshold = redundancy_threshold
+        self.excerpt_chars = excerpt_chars
+        # Shared cap on concurrent LLM calls (DebateService.set_concurrency_limits)
+        self.llm_limit = nullcontext()
+
+    def history_context(self, state):
+        """Running summary + any unsummarized older turns as excerpts + last K turns verbatim"""
+        history = state['conversation_history']
+        if not history:
+            return ""
+
+        covered = state.get('summary_covers', 0) if state.get('history_summary') else 0
+        verbatim_start = max(0, len(history) - self.keep_last)
+
+        context = ""
+        if covered:
+            context += f"Summary of earlier exchanges:\n{state['history_summary']}\n\n"
+
+        # Turns neither summarized nor recent (e.g. a summary call failed) stay as short excerpts
+        uncovered = history[covered:verbatim_start]
+        if uncovered:
+            context += "Earlier points:\n"
+            for entry in uncovered:
+                context += f"{entry['speaker']}: {entry['response'][:self.excerpt_chars]}...\n"
+            context += "\n"
+
+        context += "Previous exchanges:\n"
+        for entry in history[verbatim_start:]:
+            context += f"{entry['speaker']}: {entry['response']}...\n"
+        return context
+
+    async def update_summary(self, state):
+        """
+        Fold turns that the next prompt will no longer quote verbatim into the summary
+
+        Called at the start of a turn: after it, the history grows by one, so the next
+        prompt needs the summary to cover all but the last keep_last - 1 current turns.
+        Returns a state update, or None when nothing needs folding or the call failed.
+        """
+        history = state['conversation_history']
+        target = len(history) + 1 - self.keep_last
+        covered = state.get('summary_covers', 0)
+        if target <= covered:
+            return None
+
+        new_turns = "\n".join(f"{entry['speaker']}: {entry['response']}" for entry in history[covered:target])
+        prompt = f"""
+                    Update the running summary of a debate on "{state['claim']}".
+
+                    CURRENT SUMMARY:
+                    {state.get('history_summary') or "(none yet)"}
+
+                    NEW EXCHANGES:
+                    {new_turns}
+
+                    Rewrite the summary to include the new exchanges. Keep each side's key claims,
+                    evidence and unanswered points. Be terse; at most 150 words. Return only the summary.
+                    """
+        try:
+            async with self.llm_limit:
+                response = await generate_async(
+                    self.summary_model,
+                    prompt,
+                    "debate_summary",
+                    generation_config={"max_output_tokens": self.summary_max_tokens + THINKING_TOKENS["flash"]}
+                )
+            summary = response.text.strip()
+        except Exception as e:
+            print(f"Error updating debate summary: {e}")
+            return None
+        # A cut-off summary would silently drop points; keep the previous one and let
+        # the uncovered turns fall back to excerpts until the next attempt
+        if not summary or hit_token_cap(response):
+            print("Debate summary came back empty or truncated; keeping the previous summary")
+            return None
+        return {"history_summary": summary, "summary_covers": target}
+
+    def select_evidence(self, evidence):
+        """Pick evidence in rank order within the token budget, skipping near-duplicates"""
+        selected = []
+        selected_terms = []
+        remaining = self.evidence_token_budget
+
+        for ev in evidence:
+            if remaining <= 0:
+                break
+            terms = set(tokenize(ev['content']))
+            redundant = any(
+                len(terms & other) / max(len(terms | other), 1) >= self.redundancy_threshold
+                for other in selected_terms
+            )
+            if redundant:
+                continue
+
+            tokens = count_tokens(ev['content'])
+            if tokens > remaining:
+                # Only worth including a truncated passage if a useful amount fits
+                if remaining < 64:
+                    break
+                ev = {**ev, 'content': ev['content'][:int(len(ev['content']) * remaining / tokens)]}
+                tokens = remaining
+
+            selected.append(ev)
+            selected_terms.append(terms)
+            remaining -= tokens
+        return selected
@@ -1,16 +1,34 @@
-from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import StreamingResponse
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import List, Dict, Optional
 import json
 import asyncio
-from .debate_service import debate_service
-from .elevens_labs import stop_audio, pause_audio, resume_audio, is_audio_playing, get_available_voices, test_voice_connection
+from uuid import uuid4
+from lifecycle import heavy_import, registry, SubsystemUnavailable
+from cancellation import CancelOnDisconnect, ClientDisconnected, http_disconnect, websocket_disconnect
+from .elevens_labs import stop_audio, pause_audio, resume_audio, is_audio_playing, get_available_voices, test_voice_connection, warm_audio
+from .audio_sessions import audio_sessions
+from .audio_stream import clip_registry, media_type_for
+from .audio_cache import get_audio_cache
+from .speech_pipeline import ClipPrefetcher, send_clips
+from .ws_multiplex import DebateMultiplexer
 
 
 router = APIRouter()
 
 
+def _create_debate_service():
+    # LangGraph, LangChain and the vector store clients load here, in the warm-up
+    # thread, rather than when the app is imported
+    return heavy_import(".debate_service", __package__).get_debate_service()
+
+
+# Built in the background at startup; debate routes answer 503 until the service is ready
+registry.register("debate", _create_debate_service, close=lambda service: service.aclose())
+registry.register("audio", warm_audio, required=False)
+
+
 class DebateRequest(BaseModel):
     claim: str
     max_rounds: int = 4
@@ -18,7 +36,13 @@ class DebateRequest(BaseModel):
     pro_voice: str = "Rachel"
     con_voice: str = "Adam"
     debate_mode: str = "both"  # "text_only", "both"
+    refresh_evidence: bool = False  # re-query evidence against the opponent's latest points each turn
+    debate_id: Optional[str] = None  # resume or replay a checkpointed debate
+    audio_delivery: str = "server"  # "server" (played on the backend host) or "client" (streamed to the requester)
+    pipelined_audio: bool = False  # synthesize and play each sentence while the rest of the turn generates
+    latency_budget_s: Optional[float] = None  # finish within this many seconds; None runs every round at full depth
 class DebateResponse(BaseModel):
+    debate_id: str
     claim: str
     total_exchanges: int
     conversation_history: List[Dict]
@@ -26,68 +50,168 @@ class DebateResponse(BaseModel):
 
 
 @router.post("/run", response_model=DebateResponse)
-async def run_debate(request: DebateRequest):
-
+async def run_debate(request: DebateRequest, http_request: Request):
 
+    debate_service = registry.get("debate")
+    debate_id = request.debate_id or str(uuid4())
     try:
-        result = debate_service.run_debate(
-            claim=request.claim,
-            max_rounds=request.max_rounds,
-            include_audio=request.include_audio,
-            pro_voice=request.pro_voice,
-            con_voice=request.con_voice,
-            debate_mode=request.debate_mode
-        )
+        # Completed turns stay checkpointed, so a cancelled debate can be resumed by ID
+        async with CancelOnDisconnect(http_disconnect(http_request)):
+            result = await debate_service.run_debate(
+                claim=request.claim,
+                max_rounds=request.max_rounds,
+                include_audio=request.include_audio,
+                pro_voice=request.pro_voice,
+                con_voice=request.con_voice,
+                debate_mode=request.debate_mode,
+                refresh_evidence=request.refresh_evidence,
+                debate_id=debate_id,
+                audio_delivery=request.audio_delivery,
+                pipelined_audio=request.pipelined_audio,
+                latency_budget_s=request.latency_budget_s
+            )
 
 
         return DebateResponse(
-            claim=request.claim,
+            debate_id=debate_id,
+            claim=result['claim'],
             total_exchanges=len(result['conversation_history']),
             conversation_history=result['conversation_history'],
             success=True
         )
        
+    except ClientDisconnected:
+        print(f"Client disconnected, debate {debate_id} cancelled")
+        raise HTTPException(status_code=499, detail="Client disconnected")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/history/{debate_id}")
+async def get_debate_history(debate_id: str):
+    """Get the recorded turns of a checkpointed debate"""
+    debate_service = registry.get("debate")
+    try:
+        debate = await debate_service.get_debate(debate_id)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    if debate is None:
+        raise HTTPException(status_code=404, detail=f"Debate {debate_id} not found")
+    return {**debate, "success": True}
+
+
+def _audio_sessions_for(session_id: Optional[str]):
+    """The named audio session (a debate ID), or every open session when none is given"""
+    if session_id is None:
+        return audio_sessions.sessions()
+    session = audio_sessions.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail=f"Audio session {session_id} not found")
+    return [session]
+
+
 @router.post("/audio/stop")
-async def stop_audio_playback():
-    """Stop any currently playing audio"""
+async def stop_audio_playback(session_id: Optional[str] = None):
+    """Stop a debate's audio (session_id is its debate ID), or all audio when omitted"""
+    sessions = _audio_sessions_for(session_id)
     try:
-        stop_audio()
+        for session in sessions:
+            session.stop()
+        if session_id is None:
+            stop_audio()
         return {"message": "Audio stopped successfully", "success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/audio/pause")
-async def pause_audio_playback():
-    """Pause currently playing audio"""
+async def pause_audio_playback(session_id: Optional[str] = None):
+    """Pause a debate's audio, or all audio when session_id is omitted"""
+    sessions = _audio_sessions_for(session_id)
     try:
-        pause_audio()
+        for session in sessions:
+            session.pause()
+        if session_id is None:
+            pause_audio()
         return {"message": "Audio paused successfully", "success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @router.post("/audio/resume")
-async def resume_audio_playback():
-    """Resume paused audio"""
+async def resume_audio_playback(session_id: Optional[str] = None):
+    """Resume a debate's paused audio, or all audio when session_id is omitted"""
+    sessions = _audio_sessions_for(session_id)
     try:
-        resume_audio()
+        for session in sessions:
+            session.resume()
+        if session_id is None:
+            resume_audio()
         return {"message": "Audio resumed successfully", "success": True}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/audio/status")
-async def get_audio_status():
-    """Get current audio playback status"""
+async def get_audio_status(session_id: Optional[str] = None):
+    """Get a debate's audio playback status, or that of every open session"""
+    sessions = _audio_sessions_for(session_id)
     try:
-        is_playing = is_audio_playing()
+        statuses = [session.status() for session in sessions]
+        is_playing = any(status["is_playing"] for status in statuses)
+        if session_id is None:
+            is_playing = is_playing or is_audio_playing()
         return {
             "is_playing": is_playing,
             "message": "Audio is playing" if is_playing else "Audio is not playing",
+            "sessions": statuses,
+            "success": True
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/cache/embeddings")
+async def get_embedding_cache_stats():
+    """Get embedding cache hit rates"""
+    debate_service = registry.get("debate")
+    try:
+        return {
+            "stats": debate_service.pinecone_db.embeddings.stats(),
+            "success": True
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/scheduler")
+async def get_scheduler_stats():
+    """Get the per-model turn latency estimates used to plan budgeted debates"""
+    debate_service = registry.get("debate")
+    try:
+        return {
+            "latency": debate_service.scheduler.latency.stats(),
+            "success": True
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/audio/clip/{clip_id}")
+async def stream_audio_clip(clip_id: str):
+    """Serve a debate turn's audio from the cache, or stream it as it is synthesized (chunked transfer)"""
+    cached = await asyncio.to_thread(get_audio_cache().get_file, clip_id)
+    if cached is not None:
+        path, output_format = cached
+        return FileResponse(path, media_type=media_type_for(output_format))
+
+    clip = clip_registry.get(clip_id)
+    if clip is None:
+        raise HTTPException(status_code=404, detail=f"Audio clip {clip_id} not found")
+    return StreamingResponse(clip.astream(), media_type=clip.media_type)
+
+@router.get("/cache/audio")
+async def get_audio_cache_stats():
+    """Get audio cache hit rates and size"""
+    try:
+        return {
+            "stats": get_audio_cache().stats(),
             "success": True
         }
     except Exception as e:
@@ -120,27 +244,34 @@ async def test_connection():
 
 
 @router.post("/run-stream")
-async def run_debate_stream(request: DebateRequest):
+async def run_debate_stream(request: DebateRequest, http_request: Request):
     """Run a debate with streaming responses using Server-Sent Events"""
    
+    debate_service = registry.get("debate")
+    debate_id = request.debate_id or str(uuid4())
+
     async def generate_stream():
         try:
-            # Send initial start message
-            yield f"data: {json.dumps({'type': 'start', 'claim': request.claim})}\n\n"
-           
-            # Stream each message as it's generated
-            async for message in debate_service.run_debate_stream(
-                claim=request.claim,
-                max_rounds=request.max_rounds,
-                include_audio=request.include_audio,
-                pro_voice=request.pro_voice,
-                con_voice=request.con_voice,
-                debate_mode=request.debate_mode
-            ):
-                yield f"data: {json.dumps(message)}\n\n"
-                # Small delay to prevent overwhelming the client
-                await asyncio.sleep(0.1)
+            # Stream each message as it's generated (the first is "start"), stopping the debate if the
+            # client goes away
+            async with CancelOnDisconnect(http_disconnect(http_request)):
+                async for message in debate_service.run_debate_stream(
+                    claim=request.claim,
+                    max_rounds=request.max_rounds,
+                    include_audio=request.include_audio,
+                    pro_voice=request.pro_voice,
+                    con_voice=request.con_voice,
+                    debate_mode=request.debate_mode,
+                    refresh_evidence=request.refresh_evidence,
+                    debate_id=debate_id,
+                    audio_delivery=request.audio_delivery,
+                    pipelined_audio=request.pipelined_audio,
+                    latency_budget_s=request.latency_budget_s
+                ):
+                    yield f"data: {json.dumps(message)}\n\n"
            
+        except ClientDisconnected:
+            print(f"Client disconnected, debate {debate_id} cancelled")
         except Exception as e:
             # Send error message
             error_message = {
@@ -163,33 +294,89 @@ async def run_debate_stream(request: DebateRequest):
 @router.websocket("/run-ws")
 async def run_debate_websocket(websocket: WebSocket):
     await websocket.accept()
+    audio_sender = None
+    prefetcher = ClipPrefetcher()
    
     try:
         request_data = await websocket.receive_json()
         request = DebateRequest(**request_data)
+        debate_service = registry.get("debate")
+        debate_id = request.debate_id or str(uuid4())
        
-        await websocket.send_json({
-            "type": "start",
-            "claim": request.claim
-        })
+        audio_clips = asyncio.Queue()
+        if request.audio_delivery == "client":
+            # Paused and stopped through the audio control endpoints with the debate ID
+            session = audio_sessions.open(debate_id, delivery="client")
+            audio_sender = asyncio.create_task(
+                send_clips(audio_clips, prefetcher, session, websocket.send_json, websocket.send_bytes)
+            )
        
-        # Stream each message as it's generated
-        async for message in debate_service.run_debate_stream(
-            claim=request.claim,
-            max_rounds=request.max_rounds,
-            include_audio=request.include_audio,
-            pro_voice=request.pro_voice,
-            con_voice=request.con_voice,
-            debate_mode=request.debate_mode
-        ):
-            await websocket.send_json(message)
+        # Stream each message as it's generated. The debate is cancelled if the client
+        # disconnects or sends {"type": "cancel"}
+        async with CancelOnDisconnect(websocket_disconnect(websocket)):
+            async for message in debate_service.run_debate_stream(
+                claim=request.claim,
+                max_rounds=request.max_rounds,
+                include_audio=request.include_audio,
+                pro_voice=request.pro_voice,
+                con_voice=request.con_voice,
+                debate_mode=request.debate_mode,
+                refresh_evidence=request.refresh_evidence,
+                debate_id=debate_id,
+                audio_delivery=request.audio_delivery,
+                pipelined_audio=request.pipelined_audio,
+                latency_budget_s=request.latency_budget_s
+            ):
+                await websocket.send_json(message)
+                if message["type"] == "audio" and audio_sender is not None:
+                    if "part" in message:
+                        clip = clip_registry.get(message["clip_id"])
+                        if clip is not None:
+                            prefetcher.prefetch(clip)
+                    audio_clips.put_nowait(message)
+
+            if audio_sender is not None:
+                # Let the last turn's audio finish before closing out
+                audio_clips.put_nowait(None)
+                await audio_sender
        
         await websocket.send_json({"type": "complete"})
        
     except WebSocketDisconnect:
         print("Client disconnected")
+    except ClientDisconnected:
+        print(f"Client disconnected or cancelled, debate {debate_id} cancelled")
+        try:
+            await websocket.send_json({"type": "cancelled", "debate_id": debate_id})
+        except Exception:
+            pass
+    except SubsystemUnavailable as e:
+        await websocket.send_json({
+            "type": "error",
+            "message": str(e),
+            "retry": True
+        })
     except Exception as e:
         await websocket.send_json({
             "type": "error",
             "message": str(e)
-        })
\ No newline at end of file
+        })
+    finally:
+        if audio_sender is not None:
+            if not audio_sender.done():
+                audio_sender.cancel()
+            audio_sessions.close(debate_id)
+        prefetcher.cancel()
+
+
+@router.websocket("/ws")
+async def multiplexed_debate_websocket(websocket: WebSocket):
+    """Run several debates at once over one connection (protocol in DebateMultiplexer)"""
+    await websocket.accept()
+    try:
+        debate_service = registry.get("debate")
+    except SubsystemUnavailable as e:
+        await websocket.send_json({"type": "error", "message": str(e), "retry": True})
+        await websocket.close()
+        return
+    await DebateMultiplexer(websocket, debate_service, DebateRequest).run()
@@ -0,0 +1,128 @@
+import os
+import threading
+
+# Per-tier latency priors, replaced by observations as turns complete
+PRIORS = {
+    "pro": {"first_token_s": 4.0, "tokens_per_s": 40.0},
+    "flash": {"first_token_s": 1.0, "tokens_per_s": 120.0},
+}
+
+# Answer tokens below which a tier isn't worth using; pro needs room to argue
+MIN_TOKENS = {"pro": 192, "flash": 64}
+MAX_TOKENS = int(os.getenv('DEBATE_MAX_TURN_TOKENS', '1024'))
+
+# Gemini 2.5 models think before answering, and thinking counts against
+# max_output_tokens, so the cap sent to the API leaves room for it
+THINKING_TOKENS = {"pro": 512, "flash": 256}
+
+# Per-turn time below which retrieval is shallower
+SHALLOW_RETRIEVAL_S = 6.0
+
+
+class LatencyModel:
+    """
+    EWMA estimates of a turn's time to first token and output rate, per model tier
+
+    Shared by every debate in the process, so each debate's plan starts from what
+    recent turns actually took rather than from the priors.
+    """
+
+    def __init__(self, alpha=0.3, priors=PRIORS):
+        self.alpha = alpha
+        self._estimates = {tier: dict(values) for tier, values in priors.items()}
+        self._observations = {tier: 0 for tier in priors}
+        self._lock = threading.Lock()
+
+    def observe(self, tier, first_token_s, total_s, output_tokens):
+        generating_s = max(total_s - first_token_s, 0.05)
+        samples = {"first_token_s": first_token_s, "tokens_per_s": max(output_tokens, 1) / generating_s}
+        with self._lock:
+            estimate = self._estimates[tier]
+            for key, value in samples.items():
+                estimate[key] += self.alpha * (value - estimate[key])
+            self._observations[tier] += 1
+
+    def turn_seconds(self, tier, tokens):
+        with self._lock:
+            estimate = self._estimates[tier]
+            return estimate["first_token_s"] + tokens / estimate["tokens_per_s"]
+
+    def tokens_within(self, tier, seconds):
+        """Output tokens the tier can produce in `seconds`, after its first-token latency"""
+        with self._lock:
+            estimate = self._estimates[tier]
+            return int((seconds - estimate["first_token_s"]) * estimate["tokens_per_s"])
+
+    def stats(self):
+        with self._lock:
+            return {
+                tier: {**{key: round(value, 3) for key, value in estimate.items()},
+                       "observations": self._observations[tier]}
+                for tier, estimate in self._estimates.items()
+            }
+
+
+class DebateScheduler:
+    """
+    Fit a debate into a latency budget
+
+    Before each turn the remaining budget is split evenly over the turns still
+    planned. The turn gets the pro model if that leaves it enough output tokens,
+    otherwise flash, with an output cap sized to the time it has; retrieval is
+    shallower when turns are short. The number of rounds is re-planned from the
+    same estimates, so a debate that runs slow ends early (after a con turn when it
+    can) instead of overrunning, and one that runs fast gets its rounds back. Without
+    a budget every turn is planned at full depth.
+    """
+
+    def __init__(self, latency=None, default_top_k=5, shallow_top_k=3):
+        self.latency = latency or LatencyModel()
+        self.default_top_k = default_top_k
+        self.shallow_top_k = shallow_top_k
+
+    def full_depth(self):
+        return {"tier": "pro", "max_output_tokens": None, "api_max_output_tokens": None, "top_k": self.default_top_k}
+
+    def min_turn_seconds(self):
+        return self.latency.turn_seconds("flash", MIN_TOKENS["flash"])
+
+    def retrieval_top_k(self, budget_s, rounds):
+        """Depth of the evidence prefetched before the first turn"""
+        if budget_s is None or budget_s / max(rounds, 1) >= SHALLOW_RETRIEVAL_S:
+            return self.default_top_k
+        return self.shallow_top_k
+
+    def plan_rounds(self, remaining_s, round_number, max_rounds):
+        """
+        Last round to run, given the time left before round_number starts
+
+        A debate always gets its first round, even on a budget too small for it.
+        """
+        if remaining_s is None:
+            return max_rounds
+        turns = max(int(remaining_s / self.min_turn_seconds()), 0)
+        planned = min(max_rounds, round_number - 1 + turns)
+        # Prefer ending on a con turn, so the last argument gets its rebuttal
+        if planned < max_rounds and planned % 2 == 1 and planned - 1 >= round_number:
+            planned -= 1
+        return max(planned, 1)
+
+    def plan_turn(self, remaining_s, turns_left):
+        """Model tier, output cap and retrieval depth for the next turn"""
+        if remaining_s is None:
+            return self.full_depth()
+        turn_s = max(remaining_s, 0.0) / max(turns_left, 1)
+        tier, tokens = "flash", MIN_TOKENS["flash"]
+        for candidate in ("pro", "flash"):
+            available = self.latency.tokens_within(candidate, turn_s)
+            if available >= MIN_TOKENS[candidate]:
+                tier, tokens = candidate, available
+                break
+        tokens = min(tokens, MAX_TOKENS)
+        return {
+            "tier": tier,
+            "max_output_tokens": tokens,
+            "api_max_output_tokens": tokens + THINKING_TOKENS[tier],
+            "top_k": self.default_top_k if turn_s >= SHALLOW_RETRIEVAL_S else self.shallow_top_k,
+            "turn_budget_s": round(turn_s, 2)
+        }
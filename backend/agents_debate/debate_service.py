@@ -1,22 +1,38 @@
 from typing import TypedDict, Annotated, Optional, List, Dict
+from collections import OrderedDict
+from contextlib import nullcontext
 from langgraph.graph import StateGraph, END
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langgraph.types import StreamWriter
 from dotenv import load_dotenv
-from langchain_community.tools.tavily_search import TavilySearchResults
-from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
 from uuid import uuid4
-from elevenlabs.client import ElevenLabs
+import aiosqlite
+import asyncio
 import json
 import os
+import threading
 import google.generativeai as genai
-import pygame
 import tempfile
 import time
 from datetime import datetime
-from .vector_db import VectorDB
-from .elevens_labs import text_to_speech, stop_audio, pause_audio, resume_audio
+from .vector_db import get_vector_db
+from .debate_history import DebateHistoryManager, hit_token_cap
+from .audio_stream import clip_registry
+from llm_accounting import LLMCall, estimate_tokens
+import upstream
+from .audio_sessions import audio_sessions
+from .speech_pipeline import SentenceSplitter, drop_unfinished_sentence
+from .debate_scheduler import DebateScheduler
+
+CHECKPOINT_PATH = os.getenv('DEBATE_CHECKPOINT_PATH', os.path.join('.cache', 'debates.sqlite3'))
+
+# Caps on concurrent upstream calls across all debates in the process; 0 means no cap
+LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '0'))
+RETRIEVAL_CONCURRENCY = int(os.getenv('RETRIEVAL_CONCURRENCY', '0'))
+RETRIEVAL_CACHE_TTL_S = float(os.getenv('RETRIEVAL_CACHE_TTL_S', '300'))
 
 class State(TypedDict):
+    debate_id: str
     claim: str
     round_number: int
     max_rounds: int
@@ -25,22 +41,89 @@ class State(TypedDict):
     pro_voice: str
     con_voice: str
     debate_mode: str  # "text_only", "both"
+    audio_delivery: str  # "server" (played here with pygame) or "client" (streamed to the requester)
+    pipelined_audio: bool  # speak each sentence as soon as it is generated
+    evidence: Dict[str, list]  # prefetched evidence per position ("pro"/"con")
+    refresh_evidence: bool
+    history_summary: str  # running summary of turns older than the verbatim window
+    latency_budget_s: Optional[float]  # wall-clock budget for the whole debate, None for full depth
+    planned_rounds: int  # rounds that fit the budget, re-planned after every turn
+    summary_covers: int  # number of leading turns folded into history_summary
+
+class RetrievalCache:
+    """
+    Recent evidence lookups by (query, top_k), shared by both agents of every debate
+
+    Entries expire after ttl seconds, so content indexed since is picked up.
+    """
+
+    def __init__(self, max_entries=1024, ttl=RETRIEVAL_CACHE_TTL_S):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, query, top_k):
+        with self._lock:
+            entry = self._entries.get((query, top_k))
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                return None
+            self._entries.move_to_end((query, top_k))
+            return entry[1]
+
+    def put(self, query, top_k, evidence):
+        with self._lock:
+            self._entries[(query, top_k)] = (time.monotonic(), evidence)
+            self._entries.move_to_end((query, top_k))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
 
 class RAGDebateAgent:
 
-    def __init__(self, name, position, model, db_vector):
+    def __init__(self, name, position, model, db_vector, history_manager, retrieval_deadline=1.5,
+                 fast_model=None):
         self.name = name
         self.position = position
         self.model = model
+        self.fast_model = fast_model or model
         self.db_vector = db_vector
+        self.history_manager = history_manager
+        self.retrieval_deadline = retrieval_deadline
+        # Shared across agents and debates by DebateService
+        self.retrieval_cache = None
+        self.llm_limit = nullcontext()
+        # threading.BoundedSemaphore capping concurrent vector searches, or None
+        self.retrieval_limit = None
 
     def retrieve_evidence(self, query, top_k=5):
-        """Retrieve evidence from vector database"""
+        """
+        Retrieve evidence from the vector database fused with keyword matches, within the retrieval deadline
+
+        Waiting for a retrieval slot counts against the deadline; if none frees up in
+        time, only the keyword search runs. The slot is held until the vector search
+        itself finishes, even one that outlives the deadline. Only results that include
+        the vector search are cached, so a degraded fallback isn't served to later debates.
+        """
+        if self.retrieval_cache is not None:
+            cached = self.retrieval_cache.get(query, top_k)
+            if cached is not None:
+                return list(cached)
+
         evidence = []
-        
+        complete = False
+
         if self.db_vector:
+            started = time.perf_counter()
+            acquired = self.retrieval_limit is None or self.retrieval_limit.acquire(timeout=self.retrieval_deadline)
+            if not acquired:
+                print(f"No retrieval slot within {self.retrieval_deadline}s; using lexical results only")
+            # hybrid_search releases the slot once the vector search is done
+            slot = self.retrieval_limit if acquired else None
             try:
-                vector_results = self.db_vector.search(query, top_k)
+                remaining = max(0.0, self.retrieval_deadline - (time.perf_counter() - started))
+                vector_results, complete = self.db_vector.hybrid_search(query, top_k, deadline=remaining,
+                                                                        vector=acquired, slot=slot)
                 for docs, score in vector_results:
                     evidence.append({
                         "content": docs.page_content, 
@@ -48,32 +131,36 @@ class RAGDebateAgent:
                         "score": score
                     })
             except Exception as e:
-                print(f"Vector DB error: {e}")
-                
+                print(f"Retrieval error: {e}")
+                return evidence
+
+        if complete and self.retrieval_cache is not None:
+            self.retrieval_cache.put(query, top_k, evidence)
         return evidence
 
 
-    def generate_debate_response(self, state: State): 
-        """Generate a debate response using evidence"""
-        search_query = f"{state['claim']} {self.position} arguments"
-        evidence = self.retrieve_evidence(search_query, top_k=5)
+    def evidence_query(self, claim):
+        """Query used to prefetch evidence for this agent's position"""
+        return f"{claim} {self.position} arguments"
+
+    def rebuttal_query(self, claim, opponent_response):
+        """Query targeting evidence against the opponent's latest points"""
+        return f"{claim} {self.position} rebuttal {opponent_response[:300]}"
 
+    def _build_prompt(self, state: State, evidence, max_words=None):
+        """Assemble the debate prompt from the claim, bounded history and token-capped evidence"""
         evidence_context = ""
-        for i, ev in enumerate(evidence, 1):
+        for i, ev in enumerate(self.history_manager.select_evidence(evidence), 1):
             evidence_context += f"Evidence {i} ({ev['source']}): {ev['content']}...\n"
 
-        history_context = ""
-        if state['conversation_history']:
-            history_context = "Previous exchanges:\n"
-            for entry in state['conversation_history']:
-                history_context += f"{entry['speaker']}: {entry['response']}...\n"
+        history_context = self.history_manager.history_context(state)
 
         prompt = f"""
                     You are {self.name}, a {self.position}ponent in a debate.
 
                     DEBATE TOPIC: "{state['claim']}"
 
-                    ROUND: {state['round_number']}/{state['max_rounds']}
+                    ROUND: {state['round_number']}/{state.get('planned_rounds') or state['max_rounds']}
 
                     {history_context}
 
@@ -86,14 +173,74 @@ class RAGDebateAgent:
                     3. Address any points made by the opponent.
                     4. Be extremely concise.
                     5. Keep response concise and cite evidence where possible.
+                    {f"6. Use at most {max_words} words." if max_words else ""}
 
                     Your {self.position} response:
                     """
+        return prompt
+
+    async def stream_debate_response(self, state: State, plan=None, stats=None):
+        """
+        Generate a debate response using evidence, yielding text deltas as they arrive
+
+        plan (from DebateScheduler) picks the model tier, output cap and retrieval depth.
+        stats, if given, is filled in for the scheduler: "requested_at" (when the model
+        was called, after retrieval and once an LLM slot was free), "hit_cap" (the
+        answer stopped at the output cap) and "retried". A capped call that produced no
+        text at all, because thinking used up the cap, is retried once without the cap.
+        """
+        plan = plan or {}
+        stats = {} if stats is None else stats
+        evidence = state.get("evidence", {}).get(self.position)
+        if evidence is None:
+            # Not prefetched for this debate; embedding + vector search are blocking
+            # network calls, so keep them off the event loop
+            evidence = await asyncio.to_thread(self.retrieve_evidence, self.evidence_query(state['claim']),
+                                               plan.get("top_k", 5))
+
+        max_tokens = plan.get("max_output_tokens")
+        # Evidence selection counts tokens with tiktoken, which may download its BPE file
+        # on first use
+        prompt = await asyncio.to_thread(self._build_prompt, state, evidence,
+                                         int(max_tokens * 0.75) if max_tokens else None)
+        model = self.fast_model if plan.get("tier") == "flash" else self.model
+        kwargs = {}
+        if plan.get("api_max_output_tokens"):
+            kwargs["generation_config"] = {"max_output_tokens": plan["api_max_output_tokens"]}
         try:
-            response = self.model.generate_content(prompt)
-            return response.text
+            # The slot is held until the stream is exhausted
+            async with self.llm_limit:
+                produced = False
+                async for text in self._stream_model(model, prompt, kwargs, stats):
+                    produced = produced or bool(text.strip())
+                    yield text
+                if stats["hit_cap"] and not produced and kwargs:
+                    print(f"{self.name}'s turn used its whole output cap thinking; retrying without the cap")
+                    stats["retried"] = True
+                    async for text in self._stream_model(model, prompt, {}, stats):
+                        yield text
         except Exception as e:
-            return f"Error generating response: {e}"
+            yield f"Error generating response: {e}"
+
+    async def _stream_model(self, model, prompt, kwargs, stats):
+        async with LLMCall("debate_turn", model, prompt) as call:
+            stats["requested_at"] = time.monotonic()
+            response = await model.generate_content_async(prompt, stream=True, **kwargs)
+            async for chunk in response:
+                try:
+                    text = chunk.text
+                except ValueError:
+                    # Chunks without text parts (e.g. finish/safety metadata)
+                    continue
+                if text:
+                    call.feed(text)
+                    yield text
+            call.finish(response)
+        stats["hit_cap"] = hit_token_cap(response)
+
+    async def generate_debate_response(self, state: State):
+        """Generate a complete debate response using evidence"""
+        return "".join([delta async for delta in self.stream_debate_response(state)])
 
 
 class DebateService:
@@ -105,31 +252,91 @@ class DebateService:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
         genai.configure(api_key=api_key)
         
-        self.model = genai.GenerativeModel('gemini-2.5-pro')
-        self.pinecone_db = VectorDB("article-analyses")
+        self.model = upstream.wrap_model(genai.GenerativeModel('gemini-2.5-pro'))
+        # Running debate summaries use the faster model, off the critical path; turns
+        # fall back to it when a latency budget is tight
+        self.fast_model = upstream.wrap_model(genai.GenerativeModel('gemini-2.5-flash'))
+        self.history_manager = DebateHistoryManager(self.fast_model)
+        self.pinecone_db = get_vector_db("article-analyses")
+        retrieval_deadline = float(os.getenv('RETRIEVAL_DEADLINE_S', '1.5'))
 
         self.pro_agent = RAGDebateAgent(
             name="Proponent",
             position="pro",
             model=self.model,
-            db_vector=self.pinecone_db
+            db_vector=self.pinecone_db,
+            history_manager=self.history_manager,
+            retrieval_deadline=retrieval_deadline,
+            fast_model=self.fast_model
         )
 
         self.con_agent = RAGDebateAgent(
             name="Conponent", 
             position="con",
             model=self.model,
-            db_vector=self.pinecone_db
+            db_vector=self.pinecone_db,
+            history_manager=self.history_manager,
+            retrieval_deadline=retrieval_deadline,
+            fast_model=self.fast_model
         )
         
-        self._build_debate_graph()
-
+        # Sentence-pipelined audio: at most this many sentences are synthesized at once
+        self.tts_concurrency = int(os.getenv('TTS_CONCURRENCY', '3'))
+
+        self.retrieval_cache = RetrievalCache()
+        self.set_concurrency_limits(LLM_CONCURRENCY, RETRIEVAL_CONCURRENCY)
+
+        # Latency budgets: per-turn plans from observed turn latencies, and the
+        # monotonic deadline of each running debate that has a budget
+        self.scheduler = DebateScheduler()
+        self._deadlines = {}
+
+        self.checkpoint_path = CHECKPOINT_PATH
+        self.checkpointer = None
+        self.compiled_graph = None
+        self._graph_lock = asyncio.Lock()
+
+
+    def set_concurrency_limits(self, llm=0, retrieval=0):
+        """
+        Cap concurrent LLM calls and vector searches across every debate this service runs
+
+        0 means no cap. Set before debates start: the LLM limit binds to the event loop
+        that first waits on it.
+        """
+        llm_limit = asyncio.Semaphore(llm) if llm > 0 else nullcontext()
+        retrieval_limit = threading.BoundedSemaphore(retrieval) if retrieval > 0 else None
+        self.history_manager.llm_limit = llm_limit
+        for agent in (self.pro_agent, self.con_agent):
+            agent.llm_limit = llm_limit
+            agent.retrieval_limit = retrieval_limit
+            agent.retrieval_cache = self.retrieval_cache
+
+    async def _get_graph(self):
+        """Compile the debate graph on first use, once the event loop the checkpointer binds to is running"""
+        async with self._graph_lock:
+            if self.compiled_graph is None:
+                directory = os.path.dirname(self.checkpoint_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self.checkpointer = AsyncSqliteSaver(aiosqlite.connect(self.checkpoint_path))
+                await self.checkpointer.setup()
+                self._build_debate_graph()
+        return self.compiled_graph
+
+    async def aclose(self):
+        """Close the checkpoint database connection"""
+        if self.checkpointer is not None:
+            await self.checkpointer.conn.close()
+            self.checkpointer = None
+            self.compiled_graph = None
 
     def _build_debate_graph(self):
-        """Build the LangGraph debate workflow"""
+        """Build the LangGraph debate workflow, checkpointing state after every node"""
         graph_builder = StateGraph(State)
         
         # Add nodes
+        graph_builder.add_node("prefetch_evidence", self._prefetch_evidence_node)
         graph_builder.add_node("pro_agent", self._pro_agent_node)
         graph_builder.add_node("con_agent", self._con_agent_node)
         
@@ -152,15 +359,17 @@ class DebateService:
             }
         )
         
-        graph_builder.set_entry_point("pro_agent")
+        graph_builder.add_edge("prefetch_evidence", "pro_agent")
+        graph_builder.set_entry_point("prefetch_evidence")
         
-        self.compiled_graph = graph_builder.compile()
+        self.compiled_graph = graph_builder.compile(checkpointer=self.checkpointer)
 
-    def _play_agent_audio(self, text: str, voice_name: str):
-        """Play audio for agent response"""
+    async def _play_agent_audio(self, debate_id: str, text: str, voice_name: str):
+        """Play audio for agent response on the debate's audio session"""
         try:
             print(f"🎤 Playing audio for {voice_name}: {text[:50]}...")
-            success = text_to_speech(text, voice_name)
+            session = audio_sessions.open(debate_id, window=self.tts_concurrency)
+            success = await session.speak(text, voice_name)
             if success:
                 print(f"✅ Audio played successfully for {voice_name}")
             else:
@@ -168,6 +377,33 @@ class DebateService:
         except Exception as e:
             print(f"❌ Error playing audio for {voice_name}: {e}")
 
+    async def _finish_audio(self, debate_id):
+        """Wait for the debate's pipelined audio to finish playing"""
+        session = audio_sessions.get(debate_id)
+        if session is not None:
+            await session.drain()
+
+    def _discard_audio(self, debate_id):
+        # Client-delivery sessions belong to the connection sending the clips
+        session = audio_sessions.get(debate_id)
+        if session is not None and session.delivery == "server":
+            audio_sessions.close(debate_id)
+
+    def _start_clock(self, debate_id, latency_budget_s, snapshot=None):
+        """Start the debate's budget; a resumed debate gets its recorded budget again unless given a new one"""
+        if latency_budget_s is None and snapshot is not None:
+            latency_budget_s = snapshot.values.get("latency_budget_s")
+        if latency_budget_s is not None:
+            self._deadlines[debate_id] = time.monotonic() + latency_budget_s
+
+    def _remaining_s(self, debate_id):
+        """Seconds left in the debate's latency budget, or None without one"""
+        deadline = self._deadlines.get(debate_id)
+        return None if deadline is None else deadline - time.monotonic()
+
+    def _planned_rounds(self, state):
+        return state.get("planned_rounds") or state["max_rounds"]
+
     def _should_play_audio(self, state: State) -> bool:
         """Determine if audio should be played based on debate mode"""
         debate_mode = state.get("debate_mode", "both")
@@ -183,67 +419,197 @@ class DebateService:
         debate_mode = state.get("debate_mode", "both")
         return debate_mode in ["text_only", "both"]
 
-    def _pro_agent_node(self, state):
-        response = self.pro_agent.generate_debate_response(state)
-        
-        # Play audio if enabled based on debate mode
-        if self._should_play_audio(state):
-            voice_name = state.get("pro_voice", "Rachel")
-            self._play_agent_audio(response, voice_name)
-        
-        # Update conversation history
-        new_entry = {
-            "speaker": "Proponent",
-            "response": response,
-            "round": state["round_number"],
-            "show_text": self._should_show_text(state),
-            "play_audio": self._should_play_audio(state)
-        }
-
-        updated_history = state["conversation_history"] + [new_entry]
-
-        return {
-            "conversation_history": updated_history,
-            "round_number": state["round_number"] + 1
-        }
-
-    def _con_agent_node(self, state):
-        response = self.con_agent.generate_debate_response(state)
-        
-        # Play audio if enabled based on debate mode
-        if self._should_play_audio(state):
-            voice_name = state.get("con_voice", "Adam")
-            self._play_agent_audio(response, voice_name)
-        
-        # Update conversation history
-        new_entry = {
-            "speaker": "Conponent",
-            "response": response,
-            "round": state["round_number"],
-            "show_text": self._should_show_text(state),
-            "play_audio": self._should_play_audio(state)
-        }
-
-        updated_history = state["conversation_history"] + [new_entry]
+    async def _prefetch_evidence_node(self, state):
+        """Retrieve pro and con evidence concurrently once, before the first turn"""
+        top_k = self.scheduler.retrieval_top_k(self._remaining_s(state["debate_id"]), self._planned_rounds(state))
+        pro_evidence, con_evidence = await asyncio.gather(
+            asyncio.to_thread(self.pro_agent.retrieve_evidence, self.pro_agent.evidence_query(state["claim"]), top_k),
+            asyncio.to_thread(self.con_agent.retrieve_evidence, self.con_agent.evidence_query(state["claim"]), top_k)
+        )
+        return {"evidence": {"pro": pro_evidence, "con": con_evidence}}
 
-        return {
-            "conversation_history": updated_history,
-            "round_number": state["round_number"] + 1
-        }
+    async def _refresh_opponent_evidence(self, opponent, state, response):
+        """Retrieve evidence aimed at the latest response and merge it into the opponent's evidence"""
+        refreshed = await asyncio.to_thread(
+            opponent.retrieve_evidence, opponent.rebuttal_query(state["claim"], response), 5
+        )
+        merged = []
+        seen = set()
+        for ev in refreshed + state.get("evidence", {}).get(opponent.position, []):
+            if ev["content"] not in seen:
+                seen.add(ev["content"])
+                merged.append(ev)
+        return {**state.get("evidence", {}), opponent.position: merged[:8]}
+
+    async def _agent_turn(self, agent, agent_type, speaker, voice_name, state, writer):
+        """
+        Run one debate turn without blocking the event loop
+
+        Text deltas are pushed to stream consumers as they arrive, followed by the
+        complete message. With client audio delivery an "audio" event announces a clip
+        the client streams itself, so the turn ends without waiting on synthesis; server
+        playback goes to the debate's own audio session. The running history summary needed by the
+        next turn is produced concurrently with this turn.
+
+        With pipelined audio, each sentence is spoken as soon as it has been generated:
+        client delivery announces one clip per sentence, and server playback queues it
+        on the session's audio lane, which keeps playing while the next turn generates.
+
+        With a latency budget the scheduler plans the turn (model tier, output cap,
+        retrieval depth) from the time left, and re-plans the remaining rounds after it.
+        Every turn's latency feeds the scheduler's estimates.
+        """
+        summary_task = asyncio.create_task(self.history_manager.update_summary(state))
+        refresh_task = None
+        budgeted = state["debate_id"] in self._deadlines
+        plan = self.scheduler.plan_turn(self._remaining_s(state["debate_id"]),
+                                        self._planned_rounds(state) - state["round_number"] + 1)
+        stats = {}
+        first_token_at = None
+        try:
+            play_audio = self._should_play_audio(state)
+            client_audio = state.get("audio_delivery") == "client"
+            splitter = SentenceSplitter() if play_audio and state.get("pipelined_audio") else None
+            clip_ids = []
+
+            def speak(sentence):
+                if client_audio:
+                    clip = clip_registry.register(sentence, voice_name)
+                    clip_ids.append(clip.clip_id)
+                    writer({**self._audio_event(agent_type, state["round_number"], clip), "part": len(clip_ids) - 1})
+                else:
+                    audio_sessions.open(state["debate_id"], window=self.tts_concurrency).lane().submit(sentence, voice_name)
+
+            chunks = []
+            async for delta in agent.stream_debate_response(state, plan, stats):
+                if first_token_at is None:
+                    first_token_at = time.monotonic()
+                chunks.append(delta)
+                writer({
+                    "type": "delta",
+                    "speaker": agent_type,
+                    "delta": delta,
+                    "round": state["round_number"]
+                })
+                if splitter is not None:
+                    for sentence in splitter.feed(delta):
+                        speak(sentence)
+            response = "".join(chunks)
+            truncated = stats.get("hit_cap", False)
+            if truncated:
+                # Cut off at the output cap: keep, speak and record only whole sentences
+                response = drop_unfinished_sentence(response) or response
+            elif first_token_at is not None and "requested_at" in stats and not stats.get("retried"):
+                # Timed from the model call, so retrieval and waiting for an LLM slot
+                # don't read as a slow model
+                self.scheduler.latency.observe(plan["tier"], first_token_at - stats["requested_at"],
+                                               time.monotonic() - stats["requested_at"], estimate_tokens(response))
+            if splitter is not None:
+                remainder = splitter.flush()
+                if truncated:
+                    remainder = [sentence for sentence in [drop_unfinished_sentence(" ".join(remainder))] if sentence]
+                for sentence in remainder:
+                    speak(sentence)
+
+            # Start the opponent's targeted retrieval now so it overlaps audio playback
+            if state.get("refresh_evidence"):
+                opponent = self.con_agent if agent is self.pro_agent else self.pro_agent
+                refresh_task = asyncio.create_task(self._refresh_opponent_evidence(opponent, state, response))
+
+            # Update conversation history
+            new_entry = {
+                "speaker": speaker,
+                "response": response,
+                "round": state["round_number"],
+                "show_text": self._should_show_text(state),
+                "play_audio": self._should_play_audio(state)
+            }
+            if budgeted:
+                new_entry["plan"] = plan
+
+            writer(self._message_event(agent_type, new_entry))
+
+            # Play audio if enabled based on debate mode
+            if play_audio:
+                if splitter is not None:
+                    if clip_ids:
+                        new_entry["clip_ids"] = clip_ids
+                elif client_audio:
+                    clip = clip_registry.register(response, voice_name)
+                    new_entry["clip_id"] = clip.clip_id
+                    writer(self._audio_event(agent_type, new_entry["round"], clip))
+                else:
+                    await self._play_agent_audio(state["debate_id"], response, voice_name)
+
+            updated_history = state["conversation_history"] + [new_entry]
+
+            update = {
+                "conversation_history": updated_history,
+                "round_number": state["round_number"] + 1
+            }
+            if refresh_task is not None:
+                update["evidence"] = await refresh_task
+            summary_update = await summary_task
+            if summary_update:
+                update.update(summary_update)
+            if budgeted:
+                update["planned_rounds"] = self.scheduler.plan_rounds(
+                    self._remaining_s(state["debate_id"]), state["round_number"] + 1, state["max_rounds"]
+                )
+            return update
+        finally:
+            # Cancelled mid-turn (the client went away): don't leave these running
+            for task in (summary_task, refresh_task):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _pro_agent_node(self, state, writer: StreamWriter):
+        voice_name = state.get("pro_voice", "Rachel")
+        return await self._agent_turn(self.pro_agent, "pro", "Proponent", voice_name, state, writer)
+
+    async def _con_agent_node(self, state, writer: StreamWriter):
+        voice_name = state.get("con_voice", "Adam")
+        return await self._agent_turn(self.con_agent, "con", "Conponent", voice_name, state, writer)
 
     def _should_continue(self, state: State):
         """Determine if debate should continue"""
-        if state["round_number"] >= state["max_rounds"]:
+        if state["round_number"] > self._planned_rounds(state):
             return "end"
         elif state["round_number"] % 2 == 1:  # Odd rounds go to pro_agent
             return "pro_agent"
         else:  # Even rounds go to con_agent
             return "con_agent"    
 
-    def run_debate(self, claim: str, max_rounds: int = 4, include_audio: bool = False, 
-                   pro_voice: str = "Rachel", con_voice: str = "Adam", debate_mode: str = "both"):
-        """Run a debate with the given claim"""
-        initial_state = {
+    def _message_event(self, agent_type, entry, replayed=False):
+        event = {
+            "type": "message",
+            "speaker": agent_type,
+            "message": entry["response"],
+            "round": entry["round"],
+            "timestamp": str(datetime.now()),
+            "show_text": entry["show_text"],
+            "play_audio": entry["play_audio"]
+        }
+        if replayed:
+            event["replayed"] = True
+        return event
+
+    def _audio_event(self, agent_type, round_number, clip):
+        return {
+            "type": "audio",
+            "speaker": agent_type,
+            "round": round_number,
+            "clip_id": clip.clip_id,
+            "url": clip.url,
+            "media_type": clip.media_type
+        }
+
+    def _initial_state(self, debate_id: str, claim: str, max_rounds: int, include_audio: bool,
+                       pro_voice: str, con_voice: str, debate_mode: str, refresh_evidence: bool,
+                       audio_delivery: str = "server", pipelined_audio: bool = False,
+                       latency_budget_s: Optional[float] = None):
+        return {
+            "debate_id": debate_id,
             "claim": claim,
             "round_number": 1,
             "max_rounds": max_rounds,
@@ -251,65 +617,182 @@ class DebateService:
             "include_audio": include_audio,
             "pro_voice": pro_voice,
             "con_voice": con_voice,
-            "debate_mode": debate_mode
+            "debate_mode": debate_mode,
+            "audio_delivery": audio_delivery,
+            "pipelined_audio": pipelined_audio,
+            "evidence": {},
+            "refresh_evidence": refresh_evidence,
+            "history_summary": "",
+            "latency_budget_s": latency_budget_s,
+            "planned_rounds": self.scheduler.plan_rounds(latency_budget_s, 1, max_rounds),
+            "summary_covers": 0
         }
-        
+
+    def _graph_config(self, debate_id: str, max_rounds: int):
+        # One graph step per round plus headroom; LangGraph's default limit is 25 steps
+        return {"recursion_limit": max_rounds + 10, "configurable": {"thread_id": debate_id}}
+
+    async def _load_debate(self, graph, debate_id: str, max_rounds: int):
+        """
+        Look up a checkpointed debate
+
+        Returns (config, snapshot), where snapshot is None for an unknown debate ID.
+        A snapshot with pending tasks was interrupted and can be resumed (tasks that had
+        already finished keep their saved writes and are not rerun);
+        one without has finished and can only be replayed.
+        """
+        snapshot = await graph.aget_state({"configurable": {"thread_id": debate_id}})
+        if not snapshot.values:
+            return self._graph_config(debate_id, max_rounds), None
+        # A resumed debate keeps its original settings, including the round count
+        return self._graph_config(debate_id, snapshot.values["max_rounds"]), snapshot
+
+    async def get_debate(self, debate_id: str):
+        """Recorded state of a debate, or None if the ID is unknown"""
+        graph = await self._get_graph()
+        snapshot = await graph.aget_state({"configurable": {"thread_id": debate_id}})
+        if not snapshot.values:
+            return None
+        return {
+            "debate_id": debate_id,
+            "claim": snapshot.values["claim"],
+            "max_rounds": snapshot.values["max_rounds"],
+            "conversation_history": snapshot.values["conversation_history"],
+            "completed": not snapshot.tasks
+        }
+
+    async def run_debate(self, claim: str, max_rounds: int = 4, include_audio: bool = False, 
+                         pro_voice: str = "Rachel", con_voice: str = "Adam", debate_mode: str = "both",
+                         refresh_evidence: bool = False, debate_id: Optional[str] = None,
+                         audio_delivery: str = "server", pipelined_audio: bool = False,
+                         latency_budget_s: Optional[float] = None):
+        """
+        Run a debate with the given claim
+
+        State is checkpointed under debate_id after every turn. Passing the ID of an
+        interrupted debate resumes it from its last completed turn; passing the ID of a
+        finished debate returns its recorded result without calling the model again.
+
+        latency_budget_s bounds the debate's wall-clock time: turns are shortened,
+        moved to the faster model and rounds dropped as needed to fit (see
+        DebateScheduler). None runs every round at full depth.
+        """
+        debate_id = debate_id or str(uuid4())
+
         try:
-            result = self.compiled_graph.invoke(initial_state)
+            graph = await self._get_graph()
+            config, snapshot = await self._load_debate(graph, debate_id, max_rounds)
+            self._start_clock(debate_id, latency_budget_s, snapshot)
+            if snapshot is None:
+                initial_state = self._initial_state(debate_id, claim, max_rounds, include_audio, pro_voice,
+                                                    con_voice, debate_mode, refresh_evidence, audio_delivery,
+                                                    pipelined_audio, latency_budget_s)
+                result = await graph.ainvoke(initial_state, config)
+            elif not snapshot.tasks:
+                return snapshot.values
+            else:
+                print(f"Resuming debate {debate_id} after {len(snapshot.values['conversation_history'])} turns")
+                result = await graph.ainvoke(None, config)
+            await self._finish_audio(debate_id)
             return result
         except Exception as e:
             raise Exception(f"Error running debate: {e}")        
+        finally:
+            self._discard_audio(debate_id)
+            self._deadlines.pop(debate_id, None)
         
     
     async def run_debate_stream(self, claim: str, max_rounds: int = 4, include_audio: bool = False, 
-                           pro_voice: str = "Rachel", con_voice: str = "Adam", debate_mode: str = "both"):
-        """Run a debate with streaming responses"""
-        initial_state = {
-            "claim": claim,
-            "round_number": 1,
-            "max_rounds": max_rounds,
-            "conversation_history": [],
-            "include_audio": include_audio,
-            "pro_voice": pro_voice,
-            "con_voice": con_voice,
-            "debate_mode": debate_mode
-        }
-        
-        current_state = initial_state
-        
-        while current_state["round_number"] <= max_rounds:
-            # Determine which agent should respond
-            if current_state["round_number"] % 2 == 1:
-                # Pro agent turn
-                updated_state = self._pro_agent_node(current_state)
-                agent_type = "pro"
-            else:
-                # Con agent turn  
-                updated_state = self._con_agent_node(current_state)
-                agent_type = "con"
-            
-            # Update state
-            current_state.update(updated_state)
-            
-            # Get the latest message
-            latest_message = current_state["conversation_history"][-1]
-            
-            # Yield the message for streaming
+                           pro_voice: str = "Rachel", con_voice: str = "Adam", debate_mode: str = "both",
+                           refresh_evidence: bool = False, debate_id: Optional[str] = None,
+                           audio_delivery: str = "server", pipelined_audio: bool = False,
+                           latency_budget_s: Optional[float] = None):
+        """
+        Run a debate with streaming responses
+
+        Yields a "start" event with the debate's claim (the recorded one when an
+        existing debate ID is resumed or replayed), then "delta" events with text fragments as the model produces them, a
+        "message" event with the full text at the end of each turn, and a final
+        "complete" event with the whole conversation history. With client audio
+        delivery each spoken turn is followed by an "audio" event naming the clip to
+        stream; with pipelined audio there is one "audio" event per sentence, numbered
+        by "part", sent while the turn is still being generated.
+
+        For a debate ID that was seen before, the recorded turns are first replayed as
+        "message" events marked "replayed" (no model calls); an interrupted debate then
+        continues from its last completed turn.
+        """
+        debate_id = debate_id or str(uuid4())
+        graph = await self._get_graph()
+        config, snapshot = await self._load_debate(graph, debate_id, max_rounds)
+        yield {"type": "start", "claim": claim if snapshot is None else snapshot.values["claim"],
+               "debate_id": debate_id}
+
+        if snapshot is None:
+            graph_input = self._initial_state(debate_id, claim, max_rounds, include_audio, pro_voice,
+                                              con_voice, debate_mode, refresh_evidence, audio_delivery,
+                                              pipelined_audio, latency_budget_s)
+            final_state = graph_input
+        else:
+            final_state = snapshot.values
             yield {
-                "type": "message",
-                "speaker": agent_type,
-                "message": latest_message["response"],
-                "round": latest_message["round"],
-                "timestamp": str(datetime.now()),
-                "show_text": latest_message.get("show_text", True),
-                "play_audio": latest_message.get("play_audio", False)
+                "type": "resume",
+                "debate_id": debate_id,
+                "completed_turns": len(final_state["conversation_history"]),
+                "finished": not snapshot.tasks
             }
+            for entry in final_state["conversation_history"]:
+                agent_type = "pro" if entry["speaker"] == self.pro_agent.name else "con"
+                yield self._message_event(agent_type, entry, replayed=True)
+                if entry["play_audio"] and final_state.get("audio_delivery") == "client":
+                    voice_name = final_state["pro_voice"] if agent_type == "pro" else final_state["con_voice"]
+                    if "clip_ids" in entry:
+                        # Re-split the same way so the clips map to the same cache entries
+                        splitter = SentenceSplitter()
+                        sentences = splitter.feed(entry["response"]) + splitter.flush()
+                        for part, sentence in enumerate(sentences):
+                            clip = clip_registry.register(sentence, voice_name)
+                            yield {**self._audio_event(agent_type, entry["round"], clip), "part": part}
+                    else:
+                        clip = clip_registry.register(entry["response"], voice_name)
+                        yield self._audio_event(agent_type, entry["round"], clip)
+            # Input None continues from the checkpoint
+            graph_input = None
+
+        # A finished debate has nothing left to run
+        if snapshot is None or snapshot.tasks:
+            self._start_clock(debate_id, latency_budget_s, snapshot)
+            try:
+                async for mode, chunk in graph.astream(
+                    graph_input,
+                    config,
+                    stream_mode=["custom", "values"]
+                ):
+                    if mode == "custom":
+                        yield chunk
+                    else:
+                        final_state = chunk
+                await self._finish_audio(debate_id)
+            finally:
+                self._discard_audio(debate_id)
+                self._deadlines.pop(debate_id, None)
         
         # Send completion message
         yield {
             "type": "complete",
-            "total_exchanges": len(current_state["conversation_history"]),
-            "conversation_history": current_state["conversation_history"]
+            "debate_id": debate_id,
+            "total_exchanges": len(final_state["conversation_history"]),
+            "conversation_history": final_state["conversation_history"]
         }
 
-debate_service = DebateService()
\ No newline at end of file
+_debate_service = None
+_debate_service_lock = threading.Lock()
+
+
+def get_debate_service():
+    """Shared DebateService, created on first use rather than at import time"""
+    global _debate_service
+    with _debate_service_lock:
+        if _debate_service is None:
+            _debate_service = DebateService()
+        return _debate_service
\ No newline at end of file
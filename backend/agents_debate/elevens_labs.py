@@ -1,9 +1,12 @@
-from elevenlabs import ElevenLabs
 from dotenv import load_dotenv
+import io
 import os
-import pygame
-import tempfile
+import threading
 import logging
+from .audio_cache import audio_cache_key, get_audio_cache
+from telemetry import span
+from lifecycle import heavy_import
+import upstream
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -12,17 +15,54 @@ logger = logging.getLogger(__name__)
 load_dotenv()
 elevenlabs_key = os.getenv('ELEVENLABS_API_KEY')
 
-# Initialize the ElevenLabs client with API key
-elevenlabs_client = ElevenLabs(api_key=elevenlabs_key)
+# The ElevenLabs client and the pygame mixer (and their libraries) are loaded on first use
+# or by warm_audio at startup, so importing this module never touches the network or the
+# sound device
+_elevenlabs_client = None
+_mixer_initialized = None  # None until the first attempt, then whether it succeeded
+_init_lock = threading.Lock()
 
-# Global Pygame Mixer Initialization - Initialize at module level
-try:
-    pygame.mixer.pre_init(frequency=22050, size=-16, channels=2, buffer=512)
-    pygame.mixer.init()
-    logger.info("✅ Pygame mixer initialized successfully")
-except pygame.error as e:
-    logger.error(f"❌ Failed to initialize pygame mixer: {e}")
-    pygame.mixer = None
+
+def get_elevenlabs_client():
+    global _elevenlabs_client
+    with _init_lock:
+        if _elevenlabs_client is None:
+            ElevenLabs = heavy_import("elevenlabs").ElevenLabs
+            _elevenlabs_client = ElevenLabs(api_key=elevenlabs_key)
+        return _elevenlabs_client
+
+
+def init_mixer():
+    """Initialize the pygame mixer once; returns whether it is usable"""
+    global _mixer_initialized
+    with _init_lock:
+        if _mixer_initialized is None:
+            pygame = heavy_import("pygame")
+            try:
+                pygame.mixer.pre_init(frequency=22050, size=-16, channels=2, buffer=512)
+                pygame.mixer.init()
+                logger.info("✅ Pygame mixer initialized successfully")
+                _mixer_initialized = True
+            except pygame.error as e:
+                logger.error(f"❌ Failed to initialize pygame mixer: {e}")
+                _mixer_initialized = False
+        return _mixer_initialized
+
+
+def _mixer_active():
+    """Whether the mixer was initialized, without initializing it"""
+    if not _mixer_initialized:
+        return False
+    import pygame
+    return pygame.mixer.get_init()
+
+
+def warm_audio():
+    """Startup warm-up for the audio subsystem"""
+    get_elevenlabs_client()
+    if not init_mixer():
+        raise RuntimeError("Pygame mixer could not be initialized")
+    return True
 
 def get_voice_id(voice_name):
     """
@@ -44,54 +84,84 @@ def get_voice_id(voice_name):
     }
     return voice_mapping.get(voice_name, "21m00Tcm4TlvDq8ikWAM")  # Default to Rachel
 
+def stream_speech(text, voice_name="Rachel", model_id="eleven_multilingual_v2", output_format="mp3_44100_128"):
+    """
+    Synthesize text with the ElevenLabs streaming API, yielding audio bytes as they arrive
+    """
+    voice_id = get_voice_id(voice_name)
+    logger.info(f"🎤 Streaming speech with voice: {voice_name} (ID: {voice_id})")
+    def stream():
+        for chunk in get_elevenlabs_client().text_to_speech.stream(
+            voice_id=voice_id,
+            text=text,
+            model_id=model_id,
+            output_format=output_format
+        ):
+            if chunk:
+                yield chunk
+
+    request = {"text": text, "voice_id": voice_id, "model_id": model_id, "output_format": output_format}
+    with span("tts"):
+        yield from upstream.call_stream("elevenlabs", "tts", request, stream, synthesize=upstream.synthetic_speech)
+
+def speech_cache_key(text, voice_name="Rachel", model_id="eleven_multilingual_v2", output_format="mp3_44100_128"):
+    return audio_cache_key(text, get_voice_id(voice_name), model_id, output_format)
+
+def cached_speech(text, voice_name="Rachel", model_id="eleven_multilingual_v2", output_format="mp3_44100_128"):
+    """
+    stream_speech behind the audio cache: repeated utterances cost no synthesis time or quota
+    """
+    key = speech_cache_key(text, voice_name, model_id, output_format)
+    return get_audio_cache().stream_through(key, stream_speech(text, voice_name, model_id, output_format), output_format)
+
+def synthesize_speech(text, voice_name="Rachel", model_id="eleven_multilingual_v2"):
+    """
+    Complete MP3 audio for text, from the cache when possible
+    """
+    return b"".join(cached_speech(text, voice_name, model_id, output_format="mp3_44100_128"))
+
+def play_audio_bytes(audio):
+    """
+    Play MP3 audio on this machine's sound device, blocking until playback finishes
+    """
+    try:
+        if not init_mixer():
+            logger.error("❌ Pygame mixer not initialized")
+            return False
+
+        import pygame
+
+        # Load and play the audio from memory, no temporary file
+        pygame.mixer.music.load(io.BytesIO(audio), "mp3")
+        pygame.mixer.music.play()
+        
+        # Wait for playback to finish
+        while pygame.mixer.music.get_busy():
+            pygame.time.wait(100)
+        return True
+
+    except Exception as e:
+        logger.error(f"❌ Error playing audio: {e}")
+        return False
+
 def text_to_speech(text, voice_name="Rachel", model_id="eleven_multilingual_v2"):
     """
-    Convert text to speech using ElevenLabs API and play it
+    Convert text to speech using ElevenLabs API and play it on this machine's sound device
+
+    Blocks until playback finishes; call it from a worker thread.
     """
     try:
         # Check if mixer is initialized
-        if not pygame.mixer or not pygame.mixer.get_init():
+        if not init_mixer():
             logger.error("❌ Pygame mixer not initialized")
             return False
             
-        # Get the correct voice ID
-        voice_id = get_voice_id(voice_name)
-        logger.info(f"🎤 Converting text to speech with voice: {voice_name} (ID: {voice_id})")
-        
-        # Generate audio using the correct API parameters
-        audio = elevenlabs_client.text_to_speech.convert(
-            text=text,
-            voice_id=voice_id,  # Use the mapped voice ID
-            model_id=model_id,    # Use model_id parameter
-            output_format="mp3_44100_128"  # Use MP3 format for better compatibility
-        )
-        
-        # Create a temporary file with proper cleanup
-        with tempfile.NamedTemporaryFile(suffix=".mp3", delete=False) as temp_file:
-            temp_file_path = temp_file.name
-            
-            # Write audio data to temporary file
-            for chunk in audio:
-                temp_file.write(chunk)
+        # MP3 for better compatibility
+        if not play_audio_bytes(synthesize_speech(text, voice_name, model_id)):
+            return False
         
-        try:
-            # Load and play the audio
-            pygame.mixer.music.load(temp_file_path)
-            pygame.mixer.music.play()
-            
-            # Wait for playback to finish
-            while pygame.mixer.music.get_busy():
-                pygame.time.wait(100)
-            
-            logger.info(f"✅ Successfully played audio: {text[:50]}...")
-            return True
-            
-        finally:
-            # Clean up temporary file
-            try:
-                os.unlink(temp_file_path)
-            except OSError as e:
-                logger.warning(f"Could not delete temporary file: {e}")
+        logger.info(f"✅ Successfully played audio: {text[:50]}...")
+        return True
         
     except Exception as e:
         logger.error(f"❌ Error in text-to-speech: {e}")
@@ -100,7 +170,8 @@ def text_to_speech(text, voice_name="Rachel", model_id="eleven_multilingual_v2")
 def stop_audio():
     """Stop any currently playing audio"""
     try:
-        if pygame.mixer and pygame.mixer.get_init():
+        if _mixer_active():
+            import pygame
             pygame.mixer.music.stop()
             logger.info("🛑 Audio stopped successfully")
             return True
@@ -114,7 +185,8 @@ def stop_audio():
 def pause_audio():
     """Pause currently playing audio"""
     try:
-        if pygame.mixer and pygame.mixer.get_init():
+        if _mixer_active():
+            import pygame
             pygame.mixer.music.pause()
             logger.info("⏸️ Audio paused successfully")
             return True
@@ -128,7 +200,8 @@ def pause_audio():
 def resume_audio():
     """Resume paused audio"""
     try:
-        if pygame.mixer and pygame.mixer.get_init():
+        if _mixer_active():
+            import pygame
             pygame.mixer.music.unpause()
             logger.info("▶️ Audio resumed successfully")
             return True
@@ -142,7 +215,8 @@ def resume_audio():
 def is_audio_playing():
     """Check if audio is currently playing"""
     try:
-        if pygame.mixer and pygame.mixer.get_init():
+        if _mixer_active():
+            import pygame
             return pygame.mixer.music.get_busy()
         return False
     except Exception as e:
@@ -152,7 +226,7 @@ def is_audio_playing():
 def get_available_voices():
     """Fetch available voices from ElevenLabs API"""
     try:
-        voices = elevenlabs_client.voices.get_all()
+        voices = get_elevenlabs_client().voices.get_all()
         logger.info(f"✅ Retrieved {len(voices.voices)} available voices")
         return voices.voices
     except Exception as e:
@@ -0,0 +1,259 @@
+import hashlib
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .vector_db import get_vector_db
+from lifecycle import heavy_import
+
+DEFAULT_INDEX = "article-analyses"
+auto_index_content = os.getenv('AUTO_INDEX_CONTENT', 'true').lower() == 'true'
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    """cl100k_base (the text-embedding-3 tokenizer), or None if it can't be loaded"""
+    global _encoding, _encoding_loaded
+    with _encoding_lock:
+        if not _encoding_loaded:
+            try:
+                tiktoken = heavy_import("tiktoken")
+                _encoding = tiktoken.get_encoding("cl100k_base")
+            except Exception as e:
+                # tiktoken downloads its BPE file on first use; offline we estimate instead
+                print(f"Tokenizer unavailable, estimating token counts: {e}")
+                _encoding = None
+            _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text):
+    """Token count under the embedding model's tokenizer (estimated as chars/4 without it)"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def _split_long_text(text, max_tokens):
+    """Hard-split a single sentence that exceeds max_tokens"""
+    encoding = _get_encoding()
+    if encoding is None:
+        step = max_tokens * 4
+        return [text[i:i + step] for i in range(0, len(text), step)]
+    tokens = encoding.encode(text, disallowed_special=())
+    return [encoding.decode(tokens[i:i + max_tokens]) for i in range(0, len(tokens), max_tokens)]
+
+
+def chunk_text(text, max_tokens=400, overlap_tokens=50):
+    """
+    Split text into chunks of at most max_tokens tokens on sentence boundaries
+
+    Consecutive chunks share up to overlap_tokens worth of trailing sentences so
+    evidence that straddles a boundary is still retrievable.
+    """
+    sentences = [s.strip() for s in re.split(r'(?<=[.!?])\s+|\n+', text or '') if s.strip()]
+    pieces = []
+    for sentence in sentences:
+        tokens = count_tokens(sentence)
+        if tokens > max_tokens:
+            pieces.extend((part, count_tokens(part)) for part in _split_long_text(sentence, max_tokens))
+        else:
+            pieces.append((sentence, tokens))
+
+    chunks = []
+    current, current_tokens = [], 0
+    for piece, tokens in pieces:
+        if current and current_tokens + tokens > max_tokens:
+            chunks.append(" ".join(p for p, _ in current))
+            # Carry trailing sentences forward as overlap
+            carried, carried_tokens = [], 0
+            for p, t in reversed(current):
+                if carried_tokens + t > overlap_tokens or carried_tokens + t + tokens > max_tokens:
+                    break
+                carried.insert(0, (p, t))
+                carried_tokens += t
+            current, current_tokens = carried, carried_tokens
+        current.append((piece, tokens))
+        current_tokens += tokens
+    if current:
+        chunks.append(" ".join(p for p, _ in current))
+    return chunks
+
+
+def content_hash(text):
+    """Stable vector ID for a chunk, so identical content is only ever indexed once"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+def _with_retry(fn, *args, max_retries=4, base_delay=0.5):
+    """Call fn, retrying failures with exponential backoff and jitter"""
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(*args)
+        except Exception as e:
+            if attempt == max_retries:
+                raise
+            delay = base_delay * (2 ** attempt) * (0.5 + random.random())
+            print(f"Retrying {getattr(fn, '__name__', 'call')} in {delay:.1f}s after error: {e}")
+            time.sleep(delay)
+
+
+class IngestionPipeline:
+    """
+    Chunk, deduplicate, embed and upsert documents into a VectorDB
+
+    Chunks are identified by content hash and skipped when already indexed. Embedding
+    requests are batched by both item count and total tokens and run with bounded
+    concurrency; each embedded batch is upserted as soon as it is ready, also with
+    bounded concurrency, and every remote call is retried with backoff.
+    """
+
+    def __init__(self, vector_db, max_tokens=400, overlap_tokens=50, embed_batch_size=96,
+                 embed_batch_tokens=8000, embed_concurrency=4, upsert_batch_size=100,
+                 upsert_concurrency=4, max_retries=4):
+        self.vector_db = vector_db
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.embed_batch_size = embed_batch_size
+        self.embed_batch_tokens = embed_batch_tokens
+        self.embed_concurrency = embed_concurrency
+        self.upsert_batch_size = upsert_batch_size
+        self.upsert_concurrency = upsert_concurrency
+        self.max_retries = max_retries
+
+    def _prepare(self, documents):
+        """Chunk documents and drop chunks that are duplicated or already indexed"""
+        chunks = {}
+        total = 0
+        for text, metadata in documents:
+            for i, chunk in enumerate(chunk_text(text, self.max_tokens, self.overlap_tokens)):
+                total += 1
+                chunk_id = content_hash(chunk)
+                if chunk_id not in chunks:
+                    chunks[chunk_id] = (chunk, {**(metadata or {}), "chunk": i, "content_hash": chunk_id})
+
+        ids = list(chunks)
+        existing = set()
+        for start in range(0, len(ids), 100):
+            existing.update(_with_retry(
+                self.vector_db.vector_store.existing_ids, ids[start:start + 100], max_retries=self.max_retries
+            ))
+
+        # Chunks already in the vector store may predate the keyword index
+        lexical_missing = [chunk_id for chunk_id in existing if chunk_id not in self.vector_db.lexical_index]
+        if lexical_missing:
+            self.vector_db.lexical_index.add(
+                lexical_missing,
+                [chunks[chunk_id][0] for chunk_id in lexical_missing],
+                [chunks[chunk_id][1] for chunk_id in lexical_missing]
+            )
+
+        new_chunks = [(chunk_id, *chunks[chunk_id]) for chunk_id in ids if chunk_id not in existing]
+        return new_chunks, total
+
+    def _embedding_batches(self, chunks):
+        """Group chunks so no batch exceeds embed_batch_size items or embed_batch_tokens tokens"""
+        batch, batch_tokens = [], 0
+        for chunk in chunks:
+            tokens = count_tokens(chunk[1])
+            if batch and (len(batch) >= self.embed_batch_size or batch_tokens + tokens > self.embed_batch_tokens):
+                yield batch
+                batch, batch_tokens = [], 0
+            batch.append(chunk)
+            batch_tokens += tokens
+        if batch:
+            yield batch
+
+    def _embed(self, batch):
+        vectors = _with_retry(
+            self.vector_db.embeddings.embed_documents, [text for _, text, _ in batch], max_retries=self.max_retries
+        )
+        return batch, vectors
+
+    def _upsert(self, batch, vectors):
+        ids = [chunk_id for chunk_id, _, _ in batch]
+        texts = [text for _, text, _ in batch]
+        metadatas = [metadata for _, _, metadata in batch]
+        _with_retry(self.vector_db.vector_store.upsert_vectors, ids, vectors, texts, metadatas,
+                    max_retries=self.max_retries)
+        self.vector_db.lexical_index.add(ids, texts, metadatas)
+        return len(batch)
+
+    def ingest_many(self, documents):
+        """
+        Index a list of (text, metadata) documents
+
+        Returns counts of chunks produced, skipped as duplicates/already indexed,
+        upserted, and failed.
+        """
+        started = time.perf_counter()
+        new_chunks, total = self._prepare(documents)
+        stats = {"chunks": total, "skipped": total - len(new_chunks), "upserted": 0, "failed": 0}
+
+        with ThreadPoolExecutor(max_workers=self.embed_concurrency) as embed_pool, \
+                ThreadPoolExecutor(max_workers=self.upsert_concurrency) as upsert_pool:
+            embed_futures = [embed_pool.submit(self._embed, batch) for batch in self._embedding_batches(new_chunks)]
+
+            upsert_futures = {}
+            for future in as_completed(embed_futures):
+                try:
+                    batch, vectors = future.result()
+                except Exception as e:
+                    print(f"Error embedding batch: {e}")
+                    continue
+                for start in range(0, len(batch), self.upsert_batch_size):
+                    part = batch[start:start + self.upsert_batch_size]
+                    upsert_futures[upsert_pool.submit(
+                        self._upsert, part, vectors[start:start + self.upsert_batch_size]
+                    )] = len(part)
+
+            for future in as_completed(upsert_futures):
+                try:
+                    stats["upserted"] += future.result()
+                except Exception as e:
+                    print(f"Error upserting batch: {e}")
+
+        stats["failed"] = len(new_chunks) - stats["upserted"]
+        stats["seconds"] = round(time.perf_counter() - started, 3)
+        print(f"Ingested {stats['upserted']} new chunks ({stats['skipped']} skipped, "
+              f"{stats['failed']} failed) in {stats['seconds']}s")
+        return stats
+
+    def ingest(self, text, metadata=None):
+        return self.ingest_many([(text, metadata)])
+
+
+_pipelines = {}
+_pipelines_lock = threading.Lock()
+
+
+def get_ingestion_pipeline(index_name=DEFAULT_INDEX):
+    """Shared pipeline for an index, backed by the shared VectorDB instance"""
+    with _pipelines_lock:
+        if index_name not in _pipelines:
+            _pipelines[index_name] = IngestionPipeline(get_vector_db(index_name))
+        return _pipelines[index_name]
+
+
+def index_in_background(documents, index_name=DEFAULT_INDEX):
+    """
+    Background-task entry point for the /vid and /article routes
+
+    Never raises: indexing failures must not affect the request that produced the content.
+    """
+    if not auto_index_content:
+        return
+    documents = [(text, metadata) for text, metadata in documents if text]
+    if not documents:
+        return
+    try:
+        get_ingestion_pipeline(index_name).ingest_many(documents)
+    except Exception as e:
+        print(f"Error indexing content: {e}")
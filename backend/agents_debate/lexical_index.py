@@ -0,0 +1,134 @@
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict
+
+from langchain.schema import Document
+
+LEXICAL_INDEX_DIR = os.getenv('LEXICAL_INDEX_DIR', os.path.join('.cache', 'lexical'))
+
+STOPWORDS = frozenset("""
+a an and are as at be but by for from has have in is it its of on or that the this to was were will with
+""".split())
+
+
+def tokenize(text):
+    return [token for token in re.findall(r"\w+", text.lower()) if token not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Local keyword index scored with Okapi BM25
+
+    Documents are persisted in SQLite and the inverted index is rebuilt in memory on
+    startup, so lexical retrieval works without any network call.
+    """
+
+    def __init__(self, path, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents (id TEXT PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.commit()
+
+        self._ids = []
+        self._positions = {}
+        self._texts = []
+        self._metadatas = []
+        self._lengths = []
+        self._total_length = 0
+        self._postings = defaultdict(dict)  # term -> {doc position: term frequency}
+
+        for id_, text, metadata in self._conn.execute("SELECT id, text, metadata FROM documents"):
+            self._index(id_, text, json.loads(metadata))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, id_):
+        return id_ in self._positions
+
+    def _index(self, id_, text, metadata):
+        position = len(self._ids)
+        self._ids.append(id_)
+        self._positions[id_] = position
+        self._texts.append(text)
+        self._metadatas.append(metadata)
+        counts = Counter(tokenize(text))
+        length = sum(counts.values())
+        self._lengths.append(length)
+        self._total_length += length
+        for term, frequency in counts.items():
+            self._postings[term][position] = frequency
+
+    def add(self, ids, texts, metadatas=None):
+        """Add documents, ignoring IDs that are already indexed"""
+        metadatas = metadatas or [{} for _ in texts]
+        with self._lock:
+            new = [(id_, text, metadata or {}) for id_, text, metadata in zip(ids, texts, metadatas)
+                   if id_ not in self._positions]
+            if not new:
+                return
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO documents (id, text, metadata) VALUES (?, ?, ?)",
+                [(id_, text, json.dumps(metadata)) for id_, text, metadata in new]
+            )
+            self._conn.commit()
+            for id_, text, metadata in new:
+                self._index(id_, text, metadata)
+
+    def search(self, query, k=4):
+        """Return [(Document, bm25 score)] for the k best matching documents"""
+        terms = tokenize(query)
+        with self._lock:
+            count = len(self._ids)
+            if not count or not terms:
+                return []
+            average_length = self._total_length / count
+            scores = defaultdict(float)
+            for term in set(terms):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for position, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._lengths[position] / average_length)
+                    scores[position] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+            best = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+            return [
+                (Document(page_content=self._texts[position], metadata=dict(self._metadatas[position])), score)
+                for position, score in best
+            ]
+
+
+def reciprocal_rank_fusion(result_lists, top_k, k=60):
+    """
+    Merge ranked [(Document, score)] lists by reciprocal rank fusion
+
+    Each document scores sum(1 / (k + rank)) over the lists it appears in; documents
+    are matched by their text.
+    """
+    fused = {}
+    for results in result_lists:
+        for rank, (doc, _) in enumerate(results, 1):
+            key = doc.page_content
+            if key not in fused:
+                fused[key] = [doc, 0.0]
+            elif not fused[key][0].metadata:
+                # Keep whichever copy carries metadata (e.g. the source)
+                fused[key][0] = doc
+            fused[key][1] += 1.0 / (k + rank)
+    ranked = sorted(fused.values(), key=lambda item: item[1], reverse=True)[:top_k]
+    return [(doc, score) for doc, score in ranked]
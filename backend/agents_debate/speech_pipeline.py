@@ -0,0 +1,176 @@
+import asyncio
+import re
+
+from fastapi import WebSocketDisconnect
+
+from .audio_stream import clip_registry
+
+# Sentence end: terminal punctuation, optional closing quotes/brackets, then whitespace
+SENTENCE_END = re.compile(r'(?<=[.!?])["\')\]]*\s+')
+
+
+def drop_unfinished_sentence(text):
+    """text up to the end of its last complete sentence, or "" if it has none"""
+    ends = list(SENTENCE_END.finditer(text + " "))
+    return text[:ends[-1].end()].strip() if ends else ""
+
+
+class SentenceSplitter:
+    """
+    Split streamed text into sentences as soon as each one is complete
+
+    Sentences shorter than min_chars are held back and merged with the next one, so
+    fragments like "Yes." don't each become a separate synthesis request.
+    """
+
+    def __init__(self, min_chars=40):
+        self.min_chars = min_chars
+        self._buffer = ""
+
+    def feed(self, text):
+        """Add streamed text; return the sentences it completed"""
+        self._buffer += text
+        sentences = []
+        start = 0
+        for match in SENTENCE_END.finditer(self._buffer):
+            if match.end() - start >= self.min_chars:
+                sentences.append(self._buffer[start:match.end()].strip())
+                start = match.end()
+        self._buffer = self._buffer[start:]
+        return sentences
+
+    def flush(self):
+        """Return whatever is left once the stream has ended"""
+        remainder, self._buffer = self._buffer.strip(), ""
+        return [remainder] if remainder else []
+
+
+class AudioLane:
+    """
+    Ordered audio output for one debate
+
+    Sentences are submitted as soon as they are generated. Up to `window` of them are
+    synthesized concurrently, and playback happens strictly in submission order in the
+    background, so the debate can go on generating the next turn while this one is
+    still being spoken. synthesize(text, voice_name) -> bytes is blocking and runs in
+    a worker thread; play(bytes) is a coroutine function.
+    """
+
+    def __init__(self, synthesize, play, window=3):
+        self.synthesize = synthesize
+        self.play = play
+        self._window = asyncio.Semaphore(window)
+        self._queue = asyncio.Queue()
+        self._pending = []
+        self._player = asyncio.create_task(self._play_in_order())
+
+    async def _synthesize(self, text, voice_name):
+        async with self._window:
+            return await asyncio.to_thread(self.synthesize, text, voice_name)
+
+    def submit(self, text, voice_name):
+        task = asyncio.create_task(self._synthesize(text, voice_name))
+        self._pending.append(task)
+        self._queue.put_nowait(task)
+
+    async def _play_in_order(self):
+        while True:
+            task = await self._queue.get()
+            try:
+                audio = await task
+                if audio:
+                    await self.play(audio)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"❌ Error in audio lane: {e}")
+            finally:
+                self._pending.remove(task)
+                self._queue.task_done()
+
+    async def drain(self):
+        """Wait until everything submitted so far has been played"""
+        await self._queue.join()
+
+    def cancel(self):
+        self._player.cancel()
+        for task in self._pending:
+            task.cancel()
+
+
+class ClipPrefetcher:
+    """
+    Synthesize announced clips into the audio cache ahead of delivery, `window` at a time
+
+    A sender delivering clips in order awaits ready(clip_id) before streaming a clip,
+    which is then served from the cache.
+    """
+
+    def __init__(self, window=3):
+        self._window = asyncio.Semaphore(window)
+        self._tasks = {}
+
+    async def _fetch(self, clip):
+        async with self._window:
+            await asyncio.to_thread(lambda: b"".join(clip.stream()))
+
+    def prefetch(self, clip):
+        if clip.clip_id not in self._tasks:
+            self._tasks[clip.clip_id] = asyncio.create_task(self._fetch(clip))
+
+    async def ready(self, clip_id):
+        task = self._tasks.pop(clip_id, None)
+        if task is not None:
+            try:
+                await task
+            except Exception as e:
+                print(f"Error prefetching audio clip {clip_id}: {e}")
+
+    def cancel(self):
+        for task in self._tasks.values():
+            task.cancel()
+        self._tasks.clear()
+
+
+async def send_clips(clips, prefetcher, session, send_json, send_bytes):
+    """
+    Send queued clip events' audio one at a time: audio_start, binary chunks, audio_end
+
+    Runs alongside the debate stream, so text for the next turn keeps flowing while
+    the current turn's audio is still being synthesized and sent. Sentence clips are
+    prefetched as soon as they are announced, so later sentences are ready by the
+    time the earlier ones have been sent. The debate's audio session can pause
+    delivery, or stop it for the rest of the debate. A None event ends delivery.
+    """
+    while True:
+        event = await clips.get()
+        if event is None:
+            return
+        clip = clip_registry.get(event["clip_id"])
+        if clip is None:
+            continue
+        await prefetcher.ready(clip.clip_id)
+        await session.wait_while_paused()
+        if session.stopped:
+            continue
+        await send_json({
+            "type": "audio_start",
+            "clip_id": clip.clip_id,
+            "speaker": event["speaker"],
+            "round": event["round"],
+            "part": event.get("part"),
+            "media_type": clip.media_type
+        })
+        try:
+            async for chunk in clip.astream():
+                await session.wait_while_paused()
+                if session.stopped:
+                    break
+                await send_bytes(chunk)
+            else:
+                session.delivered()
+        except WebSocketDisconnect:
+            raise
+        except Exception as e:
+            await send_json({"type": "audio_error", "clip_id": clip.clip_id, "message": str(e)})
+        await send_json({"type": "audio_end", "clip_id": clip.clip_id})
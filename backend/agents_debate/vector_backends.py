@@ -0,0 +1,313 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from abc import ABC, abstractmethod
+
+import numpy as np
+from langchain.schema import Document
+from lifecycle import heavy_import
+
+LOCAL_VECTOR_DIR = os.getenv('LOCAL_VECTOR_DIR', os.path.join('.cache', 'vectors'))
+
+
+class VectorBackend(ABC):
+    """
+    Storage and search interface behind VectorDB
+
+    Mirrors the subset of the LangChain vector store API that VectorDB uses, so a
+    backend can either wrap a LangChain store or implement storage itself. Subclasses
+    must implement upsert_vectors, similarity_search_by_vector_with_score,
+    existing_ids and iter_documents (a backend missing one can't be constructed); text
+    based calls are derived from those using the shared embeddings object.
+    """
+
+    def __init__(self, embeddings):
+        self.embeddings = embeddings
+
+    @abstractmethod
+    def upsert_vectors(self, ids, vectors, texts, metadatas):
+        """Insert or overwrite pre-computed vectors with their text and metadata"""
+        ...
+
+    @abstractmethod
+    def similarity_search_by_vector_with_score(self, vector, k=4):
+        """Return [(Document, score)] for the k nearest stored vectors"""
+        ...
+
+    @abstractmethod
+    def existing_ids(self, ids):
+        """Return the subset of ids that are already stored"""
+        ...
+
+    @abstractmethod
+    def iter_documents(self, batch_size=100):
+        """Yield every stored document as lists of (id, text, metadata)"""
+        ...
+
+    def add_texts(self, texts, metadatas=None, ids=None):
+        texts = list(texts)
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = self.embeddings.embed_documents(texts)
+        self.upsert_vectors(ids, vectors, texts, metadatas)
+        return ids
+
+    def add_documents(self, documents, ids=None):
+        return self.add_texts(
+            [doc.page_content for doc in documents],
+            metadatas=[doc.metadata for doc in documents],
+            ids=ids
+        )
+
+    def similarity_search_with_score(self, query, k=4):
+        return self.similarity_search_by_vector_with_score(self.embeddings.embed_query(query), k=k)
+
+
+class PineconeBackend(VectorBackend):
+    """Remote Pinecone index accessed through LangChain's PineconeVectorStore"""
+
+    # PineconeVectorStore keeps the document text under this metadata key
+    text_key = "text"
+
+    def __init__(self, index_name, embeddings, dimension, api_key):
+        PineconeVectorStore = heavy_import("langchain_pinecone.vectorstores").PineconeVectorStore
+        Pinecone = heavy_import("pinecone").Pinecone
+
+        super().__init__(embeddings)
+        self.pc = Pinecone(api_key=api_key)
+
+        # Check if index exists, create if not
+        if index_name not in [index.name for index in self.pc.list_indexes()]:
+            print(f"Index {index_name} does not exist. Creating...")
+            self.pc.create_index(
+                name=index_name,
+                dimension=dimension,
+                metric="cosine",
+                spec={
+                    "serverless": {
+                        "cloud": "aws",
+                        "region": "us-east-1"
+                    }
+                }
+            )
+
+        self.index = self.pc.Index(index_name)
+        self.vector_store = PineconeVectorStore(
+            index_name=index_name,
+            embedding=embeddings,
+            pinecone_api_key=api_key,
+            text_key=self.text_key
+        )
+
+    def upsert_vectors(self, ids, vectors, texts, metadatas):
+        self.index.upsert(vectors=[
+            (id_, list(map(float, vector)), {**metadata, self.text_key: text})
+            for id_, vector, text, metadata in zip(ids, vectors, texts, metadatas)
+        ])
+
+    def existing_ids(self, ids):
+        if not ids:
+            return set()
+        return set(self.index.fetch(ids=list(ids)).vectors.keys())
+
+    def iter_documents(self, batch_size=100):
+        # Listing IDs is only supported on serverless indexes, which is what __init__ creates
+        for ids in self.index.list(limit=batch_size):
+            batch = []
+            for id_, record in self.index.fetch(ids=list(ids)).vectors.items():
+                metadata = dict(record.metadata or {})
+                text = metadata.pop(self.text_key, None)
+                if text:
+                    batch.append((id_, text, metadata))
+            yield batch
+
+    def add_texts(self, texts, metadatas=None, ids=None):
+        return self.vector_store.add_texts(texts, metadatas=metadatas, ids=ids)
+
+    def add_documents(self, documents, ids=None):
+        return self.vector_store.add_documents(documents, ids=ids)
+
+    def similarity_search_with_score(self, query, k=4):
+        return self.vector_store.similarity_search_with_score(query, k=k)
+
+    def similarity_search_by_vector_with_score(self, vector, k=4):
+        return self.vector_store.similarity_search_by_vector_with_score(vector, k=k)
+
+
+class LocalVectorBackend(VectorBackend):
+    """
+    In-process cosine index with no network dependency
+
+    Vectors are L2-normalized and kept in one contiguous memory-mapped float32 matrix
+    (vectors.f32), so exact search is a single matrix-vector product followed by
+    argpartition. Text and metadata live in a SQLite sidecar (meta.sqlite3) keyed by
+    matrix row. Once the index holds ivf_threshold vectors, an in-memory IVF index
+    (k-means coarse quantizer) is built and only the nprobe closest lists are scanned;
+    rows added since the last build are always scanned exactly.
+    """
+
+    def __init__(self, index_name, embeddings, dimension, directory=LOCAL_VECTOR_DIR,
+                 ivf_threshold=None, nprobe=16):
+        super().__init__(embeddings)
+        self.dimension = dimension
+        self.directory = os.path.join(directory, index_name)
+        self.ivf_threshold = ivf_threshold if ivf_threshold is not None else int(
+            os.getenv('LOCAL_VECTOR_IVF_THRESHOLD', '50000'))
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        os.makedirs(self.directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(os.path.join(self.directory, "meta.sqlite3"), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS items (row INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, "
+            "text TEXT NOT NULL, metadata TEXT NOT NULL)"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM items").fetchone()[0]
+
+        self._matrix_path = os.path.join(self.directory, "vectors.f32")
+        self._matrix = None
+        self._open_matrix(max(self._count, 1024))
+
+        self._ivf = None  # (centroids, lists, rows covered when built)
+
+    def _open_matrix(self, capacity):
+        """Map the vector file with room for `capacity` rows, growing the file if needed"""
+        row_bytes = self.dimension * 4
+        with open(self._matrix_path, "ab") as handle:
+            size = handle.seek(0, os.SEEK_END)
+            if size < capacity * row_bytes:
+                handle.truncate(capacity * row_bytes)
+        if self._matrix is not None:
+            self._matrix.flush()
+        self._matrix = np.memmap(self._matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.dimension))
+
+    def __len__(self):
+        return self._count
+
+    def existing_ids(self, ids):
+        ids = list(ids)
+        if not ids:
+            return set()
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM items WHERE id IN ({','.join('?' * len(ids))})", ids
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def iter_documents(self, batch_size=100):
+        last_row = -1
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT row, id, text, metadata FROM items WHERE row > ? ORDER BY row LIMIT ?",
+                    (last_row, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_row = rows[-1][0]
+            yield [(id_, text, json.loads(metadata)) for _, id_, text, metadata in rows]
+
+    def upsert_vectors(self, ids, vectors, texts, metadatas):
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dimension)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = vectors / np.maximum(norms, 1e-12)
+
+        with self._lock:
+            existing = dict(self._conn.execute(
+                f"SELECT id, row FROM items WHERE id IN ({','.join('?' * len(ids))})", list(ids)
+            ).fetchall()) if ids else {}
+
+            rows = []
+            for id_ in ids:
+                if id_ not in existing:
+                    existing[id_] = self._count
+                    self._count += 1
+                rows.append(existing[id_])
+
+            if self._count > self._matrix.shape[0]:
+                self._open_matrix(max(self._count, 2 * self._matrix.shape[0]))
+
+            self._matrix[rows] = vectors
+            self._matrix.flush()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO items (row, id, text, metadata) VALUES (?, ?, ?, ?)",
+                [(row, id_, text, json.dumps(metadata or {}))
+                 for row, id_, text, metadata in zip(rows, ids, texts, metadatas)]
+            )
+            self._conn.commit()
+
+    def _documents_for_rows(self, rows):
+        records = {}
+        rows = [int(row) for row in rows]
+        for start in range(0, len(rows), 500):
+            batch = rows[start:start + 500]
+            for row, text, metadata in self._conn.execute(
+                f"SELECT row, text, metadata FROM items WHERE row IN ({','.join('?' * len(batch))})", batch
+            ).fetchall():
+                records[row] = Document(page_content=text, metadata=json.loads(metadata))
+        return records
+
+    def _build_ivf(self, count, iterations=10, sample_size=20000):
+        """Cluster the current vectors with k-means and bucket every row by nearest centroid"""
+        matrix = self._matrix[:count]
+        nlist = max(1, int(np.sqrt(count)))
+        rng = np.random.default_rng(0)
+        sample = matrix[np.sort(rng.choice(count, size=min(sample_size, count), replace=False))]
+        centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for cluster in range(nlist):
+                members = sample[assignment == cluster]
+                if len(members):
+                    centroid = members.mean(axis=0)
+                    centroids[cluster] = centroid / max(np.linalg.norm(centroid), 1e-12)
+
+        assignment = np.empty(count, dtype=np.int64)
+        for start in range(0, count, 65536):
+            assignment[start:start + 65536] = np.argmax(matrix[start:start + 65536] @ centroids.T, axis=1)
+        order = np.argsort(assignment, kind="stable")
+        boundaries = np.searchsorted(assignment[order], np.arange(nlist + 1))
+        lists = [order[boundaries[i]:boundaries[i + 1]] for i in range(nlist)]
+        self._ivf = (centroids, lists, count)
+
+    def _candidate_rows(self, query, count):
+        """Rows to score exactly: everything, or the probed IVF lists plus unindexed rows"""
+        if count < self.ivf_threshold:
+            return None
+        if self._ivf is None or count >= 2 * self._ivf[2]:
+            self._build_ivf(count)
+        centroids, lists, covered = self._ivf
+        nprobe = min(self.nprobe, len(lists))
+        probe = np.argpartition(-(centroids @ query), nprobe - 1)[:nprobe]
+        candidates = [lists[i] for i in probe]
+        if covered < count:
+            candidates.append(np.arange(covered, count))
+        return np.concatenate(candidates)
+
+    def similarity_search_by_vector_with_score(self, vector, k=4):
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / max(np.linalg.norm(query), 1e-12)
+
+        with self._lock:
+            count = self._count
+            if count == 0:
+                return []
+            candidates = self._candidate_rows(query, count)
+            if candidates is None:
+                scores = self._matrix[:count] @ query
+                rows = np.arange(count)
+            else:
+                scores = self._matrix[candidates] @ query
+                rows = candidates
+
+            k = min(k, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            documents = self._documents_for_rows(rows[top])
+
+        return [(documents[int(rows[i])], float(scores[i])) for i in top if int(rows[i]) in documents]
@@ -1,55 +1,63 @@
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
 from dotenv import load_dotenv
 from langchain_openai import OpenAIEmbeddings
-from langchain_pinecone.vectorstores import PineconeVectorStore
 import google.generativeai as genai
 from langchain.schema import Document
-from pinecone import Pinecone
 import numpy as np
+from .embedding_cache import CachedEmbeddings
+from .vector_backends import LocalVectorBackend, PineconeBackend
+from .lexical_index import LEXICAL_INDEX_DIR, BM25Index, reciprocal_rank_fusion
+from telemetry import timed
+import upstream
 
 load_dotenv()
 
 openai_key = os.getenv('OPENAI_API_KEY')
 pinecone_key = os.getenv('PINECONE_API_KEY')
+vector_backend = os.getenv('VECTOR_BACKEND', 'pinecone')  # "pinecone" or "local"
+
+# Vector searches run here so hybrid_search can stop waiting at its deadline
+_search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="vector-search")
 
 class VectorDB():
 
-    def __init__(self, index_name, dimension=1536):  # OpenAI embedding dimension
+    def __init__(self, index_name, dimension=1536, backend=None):  # OpenAI embedding dimension
         self.index_name = index_name
         self.dimension = dimension
-        
-        # Initialize Pinecone
-        self.pc = Pinecone(api_key=pinecone_key)
-        
-        # Check if index exists, create if not
-        if index_name not in [index.name for index in self.pc.list_indexes()]:
-            print(f"Index {index_name} does not exist. Creating...")
-            self.pc.create_index(
-                name=index_name, 
-                dimension=self.dimension,
-                metric="cosine",
-                spec={
-                    "serverless": {
-                        "cloud": "aws",
-                        "region": "us-east-1"
-                    }
-                }
-            )
-
-        # Initialize OpenAI embeddings
-        self.embeddings = OpenAIEmbeddings(
-            model="text-embedding-3-small",  # Cost-effective OpenAI embedding model
-            openai_api_key=openai_key
-        )
-        
-        # Initialize Pinecone vector store
-        self.vector_store = PineconeVectorStore(
-            index_name=index_name,
-            embedding=self.embeddings,
-            pinecone_api_key=pinecone_key
+        self.backend = backend or vector_backend
+        if upstream.MODE == "replay" and self.backend == "pinecone":
+            # Nothing leaves the machine in replay mode; the local index stands in for Pinecone
+            print("Replaying upstream calls; using the local vector backend instead of Pinecone")
+            self.backend = "local"
+
+        # Initialize OpenAI embeddings behind a persistent cache, so repeated
+        # queries and documents skip the embedding API round trip
+        self.embeddings = CachedEmbeddings(
+            OpenAIEmbeddings(
+                model="text-embedding-3-small",  # Cost-effective OpenAI embedding model
+                openai_api_key=openai_key
+            ),
+            model_name="text-embedding-3-small"
         )
         
-        print(f"Connected to Pinecone index '{index_name}' with OpenAI embeddings")
+        # Initialize the vector store backend
+        if self.backend == "local":
+            self.vector_store = LocalVectorBackend(index_name, self.embeddings, self.dimension)
+            print(f"Opened local vector index '{index_name}' ({len(self.vector_store)} vectors) with OpenAI embeddings")
+        elif self.backend == "pinecone":
+            self.vector_store = PineconeBackend(index_name, self.embeddings, self.dimension, pinecone_key)
+            print(f"Connected to Pinecone index '{index_name}' with OpenAI embeddings")
+        else:
+            raise ValueError(f"Unknown vector backend '{self.backend}'. Use 'pinecone' or 'local'.")
+
+        # Keyword index over the same documents, used by hybrid_search
+        self.lexical_index = BM25Index(os.path.join(LEXICAL_INDEX_DIR, f"{index_name}.sqlite3"))
+        if not len(self.lexical_index):
+            print(f"Keyword index for '{index_name}' is empty; if the vector index already holds documents, "
+                  f"run python -m agents_debate.vector_db backfill-lexical {index_name}")
    
 
     def generate_embedding(self, text: str):
@@ -68,7 +76,8 @@ class VectorDB():
                 metadata = metadatas[i] if metadatas and i < len(metadatas) else {}
                 documents.append(Document(page_content=text, metadata=metadata))
             
-            self.vector_store.add_documents(documents)
+            ids = self.vector_store.add_documents(documents)
+            self.lexical_index.add(ids, [doc.page_content for doc in documents], [doc.metadata for doc in documents])
             print(f"Added {len(documents)} documents to vector store")
         except Exception as e:
             print(f"Error adding documents: {e}")
@@ -76,13 +85,14 @@ class VectorDB():
     def add_texts(self, texts, metadatas=None):
         """Add texts directly to the vector store"""
         try:
-            self.vector_store.add_texts(texts, metadatas=metadatas)
+            ids = self.vector_store.add_texts(texts, metadatas=metadatas)
+            self.lexical_index.add(ids, list(texts), metadatas)
             print(f"Added {len(texts)} texts to vector store")
         except Exception as e:
             print(f"Error adding texts: {e}")
 
     def search(self, query, top_k=2):
-        """Retrieve top-k similar documents from Pinecone using LangChain"""
+        """Retrieve top-k similar documents from the vector store"""
         try:
             results = self.vector_store.similarity_search_with_score(query, k=top_k)
             return results  # list of (Document, score) tuples
@@ -90,6 +100,82 @@ class VectorDB():
             print(f"Error searching: {e}")
             return []
 
+    @timed("vector_search")
+    def hybrid_search(self, query, top_k=5, deadline=1.5, vector=True, slot=None):
+        """
+        Fuse vector and BM25 keyword results with reciprocal rank fusion
+
+        The vector search (embedding + remote query) gets `deadline` seconds. If it
+        misses the deadline or fails, the lexical results are returned alone, so
+        retrieval latency stays bounded and a vector outage still yields evidence.
+        With vector=False only the lexical search runs.
+
+        slot is an already acquired semaphore capping concurrent vector searches. It is
+        released when the vector search finishes, not when this returns, so a search
+        left running past the deadline keeps its slot until its worker thread is free.
+
+        The keyword index only holds documents ingested through this code (or added
+        by backfill_lexical_index); on an index that predates it, run the backfill or
+        older documents can only be found by the vector search.
+
+        Returns (results, complete), where complete says whether the vector results
+        made it in; lexical-only fallbacks shouldn't be cached as if they were full.
+        """
+        started = time.perf_counter()
+        vector_future = None
+        try:
+            if vector:
+                vector_future = _search_executor.submit(self.vector_store.similarity_search_with_score, query, top_k * 2)
+        finally:
+            if slot is not None:
+                if vector_future is None:
+                    slot.release()
+                else:
+                    vector_future.add_done_callback(lambda _: slot.release())
+
+        try:
+            lexical_results = self.lexical_index.search(query, top_k * 2)
+        except Exception as e:
+            print(f"Error in lexical search: {e}")
+            lexical_results = []
+
+        if vector_future is None:
+            return reciprocal_rank_fusion([lexical_results], top_k), False
+
+        complete = False
+        try:
+            remaining = max(0.0, deadline - (time.perf_counter() - started))
+            vector_results = vector_future.result(timeout=remaining)
+            complete = True
+        except TimeoutError:
+            print(f"Vector search missed the {deadline:.2f}s deadline; using lexical results only")
+            vector_results = []
+        except Exception as e:
+            print(f"Error in vector search: {e}")
+            vector_results = []
+
+        return reciprocal_rank_fusion([vector_results, lexical_results], top_k), complete
+
+    def backfill_lexical_index(self, batch_size=100):
+        """
+        Add every document already in the vector store to the keyword index
+
+        For vector indexes populated before the keyword index existed. Documents the
+        keyword index already has are skipped, so it is safe to rerun.
+        """
+        started = time.perf_counter()
+        seen = added = 0
+        for batch in self.vector_store.iter_documents(batch_size):
+            missing = [document for document in batch if document[0] not in self.lexical_index]
+            if missing:
+                self.lexical_index.add(*(list(column) for column in zip(*missing)))
+            seen += len(batch)
+            added += len(missing)
+            print(f"Backfilling keyword index for '{self.index_name}': {seen} documents read, {added} added")
+        stats = {"documents": seen, "added": added, "seconds": round(time.perf_counter() - started, 3)}
+        print(f"Keyword index backfill for '{self.index_name}' done: {stats}")
+        return stats
+
     def search_by_vector(self, vector, top_k=2):
         """Search using a pre-computed vector"""
         try:
@@ -97,4 +183,34 @@ class VectorDB():
             return results
         except Exception as e:
             print(f"Error searching by vector: {e}")
-            return []
\ No newline at end of file
+            return []
+
+
+_vector_dbs = {}
+_vector_dbs_lock = threading.Lock()
+
+
+def get_vector_db(index_name):
+    """Shared VectorDB per index, so the debate agents and ingestion reuse one client and cache"""
+    with _vector_dbs_lock:
+        if index_name not in _vector_dbs:
+            _vector_dbs[index_name] = VectorDB(index_name)
+        return _vector_dbs[index_name]
+
+
+def main(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Maintenance for the debate evidence indexes")
+    commands = parser.add_subparsers(dest="command", required=True)
+    backfill = commands.add_parser("backfill-lexical", help="Copy documents from the vector index into the keyword index")
+    backfill.add_argument("index", nargs="?", default="article-analyses")
+    backfill.add_argument("--batch-size", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    if args.command == "backfill-lexical":
+        VectorDB(args.index).backfill_lexical_index(args.batch_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+import asyncio
+import json
+import time
+from collections import deque
+
+from fastapi import WebSocket, WebSocketDisconnect
+from pydantic import ValidationError
+
+from .audio_sessions import audio_sessions
+from .audio_stream import clip_registry
+from .speech_pipeline import ClipPrefetcher, send_clips
+
+HEARTBEAT_S = 15.0
+MAX_SESSIONS = 8
+SESSION_QUEUE_SIZE = 256
+
+
+def _positive_int(value):
+    """value if it is a JSON integer above zero, else None"""
+    if isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+        return None
+    return value
+
+
+class MuxSession:
+    """
+    One debate on a multiplexed connection
+
+    Outgoing frames wait in a bounded queue; when the connection can't keep up, the
+    debate stalls on put() instead of buffering without limit. With a window, the
+    client must also grant credits (ack) before more than `window` frames are sent.
+    """
+
+    def __init__(self, session_id, debate_id, window=None):
+        self.session_id = session_id
+        self.debate_id = debate_id
+        self.window = window
+        self.credits = window
+        self.queue = asyncio.Queue(maxsize=SESSION_QUEUE_SIZE)
+        self.task = None
+        self.status = "running"
+        self.end_frame = None  # sent once every queued frame has gone out
+        self.frames_sent = 0
+
+    def can_send(self):
+        if self.queue.empty():
+            return self.end_frame is not None
+        return self.window is None or self.credits > 0
+
+
+class DebateMultiplexer:
+    """
+    Several concurrent debates over one WebSocket
+
+    Client -> server (JSON):
+        {"type": "start", "session": id, "request": {...DebateRequest...}, "window": n}
+        {"type": "cancel", "session": id}
+        {"type": "ack", "session": id, "credits": n}
+        {"type": "ping"}
+    Server -> client: every debate event with its "session" added, then a
+    "session_end" event with the session's status ("complete", "cancelled" or
+    "error"); "pong" and "heartbeat" frames; "error" for bad messages, which never
+    close the connection. window and credits are positive integers. With
+    audio_delivery "client", audio is sent as binary frames of one byte giving the
+    session ID's length, the UTF-8 session ID, then the audio bytes.
+
+    A single writer sends one frame per ready session in turn, so a chatty session
+    can't starve the others. Control frames go first. A heartbeat is sent whenever
+    the connection has been idle for heartbeat_s.
+    """
+
+    def __init__(self, websocket: WebSocket, debate_service, request_model,
+                 max_sessions=MAX_SESSIONS, heartbeat_s=HEARTBEAT_S):
+        self.websocket = websocket
+        self.debate_service = debate_service
+        self.request_model = request_model
+        self.max_sessions = max_sessions
+        self.heartbeat_s = heartbeat_s
+        self.sessions = {}
+        self._ready = deque()
+        self._control = deque()
+        self._wake = asyncio.Event()
+        self._last_sent = time.monotonic()
+
+    # Scheduling
+
+    def _mark_ready(self, session):
+        if session.can_send() and session not in self._ready:
+            self._ready.append(session)
+            self._wake.set()
+
+    def send_control(self, frame):
+        self._control.append(frame)
+        self._wake.set()
+
+    async def _put(self, session, frame):
+        await session.queue.put(frame)
+        self._mark_ready(session)
+
+    async def _writer(self):
+        while True:
+            if self._control:
+                frame = self._control.popleft()
+            elif self._ready:
+                session = self._ready.popleft()
+                if not session.can_send():
+                    continue
+                if session.queue.empty():
+                    frame = session.end_frame
+                    self.sessions.pop(session.session_id, None)
+                else:
+                    frame = session.queue.get_nowait()
+                    session.frames_sent += 1
+                    if session.window is not None:
+                        session.credits -= 1
+                    # Back of the line, behind every other session with frames waiting
+                    self._mark_ready(session)
+            else:
+                self._wake.clear()
+                try:
+                    await asyncio.wait_for(self._wake.wait(), self.heartbeat_s)
+                except asyncio.TimeoutError:
+                    pass
+                if time.monotonic() - self._last_sent >= self.heartbeat_s:
+                    self.send_control({"type": "heartbeat", "sessions": len(self.sessions)})
+                continue
+            if isinstance(frame, bytes):
+                await self.websocket.send_bytes(frame)
+            else:
+                await self.websocket.send_text(json.dumps(frame))
+            self._last_sent = time.monotonic()
+
+    # Sessions
+
+    async def _run_session(self, session, request):
+        prefetcher = ClipPrefetcher()
+        clips = asyncio.Queue()
+        audio_sender = None
+        prefix = bytes([len(session.session_id.encode('utf-8'))]) + session.session_id.encode('utf-8')
+
+        async def send_json(event):
+            await self._put(session, {**event, "session": session.session_id})
+
+        async def send_bytes(chunk):
+            await self._put(session, prefix + chunk)
+
+        try:
+            if request.audio_delivery == "client":
+                audio = audio_sessions.open(session.debate_id, delivery="client")
+                audio_sender = asyncio.create_task(send_clips(clips, prefetcher, audio, send_json, send_bytes))
+
+            async for message in self.debate_service.run_debate_stream(
+                claim=request.claim,
+                max_rounds=request.max_rounds,
+                include_audio=request.include_audio,
+                pro_voice=request.pro_voice,
+                con_voice=request.con_voice,
+                debate_mode=request.debate_mode,
+                refresh_evidence=request.refresh_evidence,
+                debate_id=session.debate_id,
+                audio_delivery=request.audio_delivery,
+                pipelined_audio=request.pipelined_audio,
+                latency_budget_s=request.latency_budget_s
+            ):
+                await send_json(message)
+                if message["type"] == "audio" and audio_sender is not None:
+                    if "part" in message:
+                        clip = clip_registry.get(message["clip_id"])
+                        if clip is not None:
+                            prefetcher.prefetch(clip)
+                    clips.put_nowait(message)
+
+            if audio_sender is not None:
+                clips.put_nowait(None)
+                await audio_sender
+            session.status = "complete"
+        except asyncio.CancelledError:
+            session.status = "cancelled"
+        except Exception as e:
+            session.status = "error"
+            await send_json({"type": "error", "message": str(e)})
+        finally:
+            if audio_sender is not None:
+                if not audio_sender.done():
+                    audio_sender.cancel()
+                audio_sessions.close(session.debate_id)
+            prefetcher.cancel()
+            session.end_frame = {"type": "session_end", "session": session.session_id,
+                                 "debate_id": session.debate_id, "status": session.status}
+            self._mark_ready(session)
+
+    def _start(self, message):
+        session_id = message.get("session")
+        if not isinstance(session_id, str) or not session_id or len(session_id.encode('utf-8')) > 255:
+            return self._error("start needs a session ID of 1-255 bytes", session_id)
+        if session_id in self.sessions:
+            return self._error(f"Session {session_id} is already running", session_id)
+        if len(self.sessions) >= self.max_sessions:
+            return self._error(f"At most {self.max_sessions} concurrent sessions per connection", session_id)
+        fields = message.get("request", {})
+        if not isinstance(fields, dict):
+            return self._error("request must be an object", session_id)
+        window = message.get("window")
+        if window is not None and _positive_int(window) is None:
+            return self._error("window must be a positive integer", session_id)
+        try:
+            request = self.request_model(**fields)
+        except ValidationError as e:
+            return self._error(str(e), session_id)
+
+        session = MuxSession(session_id, request.debate_id or f"{session_id}-{time.time_ns()}", window)
+        self.sessions[session_id] = session
+        session.task = asyncio.create_task(self._run_session(session, request))
+
+    def _session(self, message):
+        session_id = message.get("session")
+        return self.sessions.get(session_id) if isinstance(session_id, str) else None
+
+    def _cancel(self, message):
+        session = self._session(message)
+        if session is None:
+            return self._error("Unknown session", message.get("session"))
+        if not session.task.done():
+            session.task.cancel()
+
+    def _ack(self, message):
+        session = self._session(message)
+        if session is None or session.window is None:
+            return
+        credits = _positive_int(message.get("credits", session.window))
+        if credits is None:
+            return self._error("credits must be a positive integer", session.session_id)
+        session.credits += credits
+        self._mark_ready(session)
+
+    def _error(self, text, session_id=None):
+        self.send_control({"type": "error", "session": session_id, "message": text})
+
+    async def run(self):
+        """Serve the connection until the client disconnects; cancels its debates on exit"""
+        writer = asyncio.create_task(self._writer())
+        try:
+            while True:
+                receive = asyncio.create_task(self.websocket.receive())
+                done, _ = await asyncio.wait({receive, writer}, return_when=asyncio.FIRST_COMPLETED)
+                if writer in done:
+                    receive.cancel()
+                    # Raises the writer's error (usually the client having gone away)
+                    writer.result()
+                frame = receive.result()
+                if frame["type"] == "websocket.disconnect":
+                    break
+                if frame.get("text") is None:
+                    self._error("Messages must be JSON text frames")
+                    continue
+                try:
+                    message = json.loads(frame["text"])
+                except json.JSONDecodeError:
+                    self._error("Messages must be JSON")
+                    continue
+                kind = message.get("type") if isinstance(message, dict) else None
+                if kind == "start":
+                    self._start(message)
+                elif kind == "cancel":
+                    self._cancel(message)
+                elif kind == "ack":
+                    self._ack(message)
+                elif kind == "ping":
+                    self.send_control({"type": "pong", "sessions": len(self.sessions)})
+                else:
+                    self._error(f"Unknown message type: {kind}")
+        except (WebSocketDisconnect, RuntimeError):
+            pass
+        finally:
+            for session in list(self.sessions.values()):
+                if session.task is not None and not session.task.done():
+                    session.task.cancel()
+            writer.cancel()
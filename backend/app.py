@@ -1,11 +1,24 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
+from lifecycle import registry, SubsystemUnavailable
+from telemetry import TimingMiddleware, metrics
+from llm_accounting import llm_ledger
 from video_transcription.transcribe import router as vid_router
 from video_transcription.article_transcribe import router as article_router
 from agents_debate.debate_router import router as agent_router
 
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Warm up heavy clients in the background so /vid and /article serve immediately
+    registry.start_all()
+    yield
+    await registry.close_all()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 app.add_middleware(
@@ -14,10 +27,48 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],  # Allows all methods
     allow_headers=["*"],  # Allows all headers
+    expose_headers=["Server-Timing"],
 )
+# Added last, so it is outermost and times the whole request
+app.add_middleware(TimingMiddleware)
 
 app.include_router(vid_router, prefix="/vid")
 app.include_router(article_router, prefix="/article")
 app.include_router(agent_router, prefix="/debate")
 
 
+@app.exception_handler(SubsystemUnavailable)
+async def subsystem_unavailable_handler(request: Request, exc: SubsystemUnavailable):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc), "subsystem": exc.name, "status": exc.status},
+        headers={"Retry-After": "5"}
+    )
+
+
+@app.get("/health/live")
+async def liveness():
+    """The process is up and serving requests"""
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+async def readiness():
+    """Per-subsystem startup status; 503 until every required subsystem is ready"""
+    ready = registry.is_ready()
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={"ready": ready, "subsystems": registry.status()}
+    )
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Stage latency histograms, call counters and in-flight gauges in Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/metrics/llm")
+async def llm_usage():
+    """Model calls, tokens, latency and estimated cost per endpoint and prompt type, costliest first"""
+    return llm_ledger.summary()
@@ -0,0 +1,239 @@
+"""
+Micro-benchmarks for the pure-Python code that runs on every /vid request
+
+Usage (from backend/):
+    python -m benchmarks.bench_hot_paths
+    python -m benchmarks.bench_hot_paths --filter fact_checks --repeat 11
+    python -m benchmarks.bench_hot_paths --save-baseline
+
+Covers parse_fact_checks_response, parse_gemini_response_to_json,
+parse_alternate_links_to_json, format_search_results and join_transcript_text on
+generated inputs of realistic sizes: FlashEvent arrays as Gemini returns them
+(fenced in ```json, up to 120 events, optionally with missing URLs that fall back to
+a web search), and transcripts from ten minutes to three hours.
+
+For each case it reports the median and minimum time per call over --repeat runs
+(each long enough to time reliably) and, from a separate run under tracemalloc, the
+peak memory allocated during one call and the memory the result keeps alive.
+
+Results are compared with benchmarks/baselines/hot_paths.json. A case regresses when
+its peak memory grows by more than --mem-tolerance, or its median time by more than
+--time-tolerance; times are only compared when the baseline was recorded on the same
+Python and machine, since they don't transfer between machines. Exits non-zero on a
+regression. --save-baseline overwrites the baseline with this run.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+
+from video_transcription.transcribe import (
+    format_search_results,
+    join_transcript_text,
+    parse_alternate_links_to_json,
+    parse_fact_checks_response,
+    parse_gemini_response_to_json,
+)
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(__file__), "baselines", "hot_paths.json")
+
+WORDS = ("the", "government", "announced", "new", "policy", "on", "climate", "and", "energy", "prices",
+         "which", "experts", "say", "will", "affect", "millions", "of", "households", "next", "year",
+         "according", "to", "recent", "data", "from", "independent", "analysts", "in", "several", "states")
+CLASSIFICATIONS = ("correct", "mostly correct", "somewhat correct", "mostly incorrect", "incorrect",
+                   "misleading", "unverifiable")
+
+
+def sentence(rng, low, high):
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high)))
+
+
+def flash_events_response(count, missing_url_share=0.0, seed=0):
+    """A Gemini fact-check reply: a fenced JSON array of `count` FlashEvents"""
+    rng = random.Random(seed)
+    events = []
+    for i in range(count):
+        events.append({
+            "id": f"video123_{i * 30}_{i}",
+            "timestamp": i * 30 + rng.randint(0, 29),
+            "content": sentence(rng, 15, 30)[:200],
+            "factuality_classification": rng.choice(CLASSIFICATIONS),
+            "context_omission": rng.choice(("none", "minor", "major")),
+            "emotional_language": rng.choice(("none", "mild", "strong")),
+            "emotional_tone": rng.choice(("neutral", "positive", "negative", "mixed", "sarcastic", "sensationalist")),
+            "reasoning_and_sources": sentence(rng, 30, 60),
+            "duration": rng.randint(5, 20),
+            "url": ("see reasoning" if rng.random() < missing_url_share
+                    else f"https://www.factcheck.org/{2024 + i % 2}/claim-{i}/")
+        })
+    return "```json\n" + json.dumps(events, indent=2) + "\n```"
+
+
+def search_results(count, seed=0):
+    rng = random.Random(seed)
+    return [{"title": sentence(rng, 4, 10).title(), "url": f"https://news.example.com/{i}/{rng.randint(1000, 9999)}",
+             "snippet": sentence(rng, 10, 20)} for i in range(count)]
+
+
+def transcript_snippets(hours, seed=0):
+    """Snippets as youtube_transcript_api returns them, one every ~3 seconds of speech"""
+    rng = random.Random(seed)
+    snippets = []
+    start = 0.0
+    while start < hours * 3600:
+        duration = round(rng.uniform(1.5, 4.5), 2)
+        snippets.append({"text": sentence(rng, 4, 12), "start": round(start, 2), "duration": duration})
+        start += duration
+    return snippets
+
+
+def build_cases():
+    """[(name, function, args)] with inputs generated up front"""
+    cases = []
+    for count in (20, 120):
+        response = flash_events_response(count)
+        cases.append((f"parse_fact_checks_response/{count}_events", parse_fact_checks_response, (response, "video123")))
+        cases.append((f"parse_gemini_response_to_json/{count}_events", parse_gemini_response_to_json, (response,)))
+    # Events without a URL go through search_web; without SERPAPI_API_KEY that is the local fallback
+    cases.append(("parse_fact_checks_response/120_events_10pct_no_url", parse_fact_checks_response,
+                  (flash_events_response(120, missing_url_share=0.1), "video123")))
+    for count in (3, 50):
+        results = search_results(count)
+        cases.append((f"format_search_results/{count}_results", format_search_results, (results,)))
+        cases.append((f"parse_alternate_links_to_json/{count}_links", parse_alternate_links_to_json,
+                      (format_search_results(results),)))
+    for label, hours in (("10min", 1 / 6), ("1h", 1), ("3h", 3)):
+        cases.append((f"join_transcript_text/{label}", join_transcript_text, (transcript_snippets(hours),)))
+    return cases
+
+
+def time_case(func, args, repeat, min_time):
+    """(median, min) seconds per call; each run loops enough calls to last min_time"""
+    loops = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func(*args)
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            break
+        loops *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    runs = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(loops):
+            func(*args)
+        runs.append((time.perf_counter() - started) / loops)
+    return statistics.median(runs), min(runs)
+
+
+def measure_memory(func, args):
+    """(peak KiB allocated during one call, KiB still held by its result)"""
+    func(*args)  # warm caches and lazy imports outside the measurement
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = func(*args)
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return (peak - before) / 1024, (after - before) / 1024
+
+
+def machine_fingerprint():
+    return {"python": platform.python_version(), "implementation": platform.python_implementation(),
+            "machine": platform.machine(), "processor": platform.processor() or platform.machine()}
+
+
+def load_baseline(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as handle:
+        return json.load(handle)
+
+
+def compare(results, baseline, time_tolerance, mem_tolerance, mem_slack_kib):
+    """(regressions, notes) against the baseline's cases"""
+    regressions, notes = [], []
+    times_comparable = baseline["machine"] == machine_fingerprint()
+    if not times_comparable:
+        notes.append("baseline recorded on a different machine or Python; times not compared")
+    for name, result in results.items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            notes.append(f"{name}: no baseline")
+            continue
+        if result["peak_kib"] > base["peak_kib"] * (1 + mem_tolerance) + mem_slack_kib:
+            regressions.append(f"{name}: peak memory {result['peak_kib']:.1f} KiB vs {base['peak_kib']:.1f} KiB")
+        if times_comparable and result["median_us"] > base["median_us"] * (1 + time_tolerance):
+            regressions.append(f"{name}: median {result['median_us']:.1f} us vs {base['median_us']:.1f} us")
+    return regressions, notes
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the /vid parsing and transcript hot paths")
+    parser.add_argument("--filter", help="Only run cases whose name contains this")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed runs per case; the median is reported")
+    parser.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per timed run")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Write this run as the new baseline")
+    parser.add_argument("--time-tolerance", type=float, default=0.25, help="Allowed median time growth (0.25 = 25%%)")
+    parser.add_argument("--mem-tolerance", type=float, default=0.10, help="Allowed peak memory growth")
+    parser.add_argument("--mem-slack-kib", type=float, default=2.0, help="Absolute peak memory allowance")
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args(argv)
+
+    # The URL fallback must stay local: never reach SerpAPI from a benchmark
+    os.environ.pop("SERPAPI_API_KEY", None)
+
+    cases = [case for case in build_cases() if not args.filter or args.filter in case[0]]
+    results = {}
+    print(f"{'case':<52}{'median us':>12}{'min us':>12}{'peak KiB':>11}{'kept KiB':>11}")
+    for name, func, case_args in cases:
+        # The parsers print on fallbacks; keep that out of the timings and the report
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            median_s, min_s = time_case(func, case_args, args.repeat, args.min_time)
+            peak_kib, kept_kib = measure_memory(func, case_args)
+        results[name] = {"median_us": round(median_s * 1e6, 2), "min_us": round(min_s * 1e6, 2),
+                         "peak_kib": round(peak_kib, 2), "kept_kib": round(kept_kib, 2)}
+        print(f"{name:<52}{median_s * 1e6:>12.1f}{min_s * 1e6:>12.1f}{peak_kib:>11.1f}{kept_kib:>11.1f}")
+
+    regressions, notes = [], []
+    baseline = load_baseline(args.baseline)
+    if args.save_baseline:
+        cases_out = {**(baseline or {}).get("cases", {}), **results} if args.filter else results
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as handle:
+            json.dump({"machine": machine_fingerprint(), "cases": cases_out}, handle, indent=2, sort_keys=True)
+            handle.write("\n")
+        print(f"\nBaseline written to {args.baseline}")
+    elif baseline is None:
+        notes.append(f"no baseline at {args.baseline}; run with --save-baseline to create one")
+    else:
+        regressions, notes = compare(results, baseline, args.time_tolerance, args.mem_tolerance, args.mem_slack_kib)
+
+    for note in notes:
+        print(f"note: {note}")
+
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump({"machine": machine_fingerprint(), "cases": results, "regressions": regressions,
+                       "notes": notes}, handle, indent=2)
+
+    if regressions:
+        print("\nREGRESSIONS:\n  " + "\n  ".join(regressions))
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
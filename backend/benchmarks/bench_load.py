@@ -0,0 +1,382 @@
+"""
+End-to-end load benchmark for /vid, /article and /debate
+
+Usage (from backend/):
+    python -m benchmarks.bench_load
+    python -m benchmarks.bench_load --concurrency 32 --requests 500 --mix vid=4,article=2,debate=1
+    python -m benchmarks.bench_load --duration 60 --latency-scale 0.5 --error-rate 0.02 --json load.json
+    python -m benchmarks.bench_load --url http://127.0.0.1:8000 --mode live
+
+By default a uvicorn server is spawned with UPSTREAM_MODE=replay (see upstream.py),
+so every upstream call is answered from benchmarks/fixtures (or synthesized) with
+recorded or profiled latencies and nothing leaves the machine. Its caches, indexes
+and debate checkpoints go to a temporary directory. Record fixtures first by running
+the server once with UPSTREAM_MODE=record and exercising the endpoints; recorded
+video IDs and article URLs are then used as benchmark inputs.
+
+--concurrency workers send requests back to back, picking a scenario by --mix weight,
+until --requests have been sent or --duration has passed. Reports throughput,
+p50/p95/p99 latency, error and degraded rates per scenario and overall, and how many
+upstream calls were replayed from fixtures, synthesized or failed during the run. A
+request counts as an error on a transport failure, an HTTP status >= 400, or a JSON
+body with an "error" field. Several endpoints absorb upstream failures and still
+answer 200, so a request is degraded when it has an X-Degraded header or its body is
+that scenario's placeholder (see DEGRADED).
+
+The server's stderr goes to --server-log (a file in the temporary directory unless
+given). Exits non-zero if the overall error plus degraded rate exceeds
+--max-error-rate, or p95 exceeds --max-p95-ms.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.bench_startup import BACKEND_DIR, free_port
+from upstream import FIXTURES_DIR, FixtureStore
+
+DEFAULT_MIX = "vid=3,summary=1,article=2,debate=1"
+
+DEFAULT_VIDEO_IDS = ["dQw4w9WgXcQ", "9bZkp7q19f0", "kJQP7kiw5Fk", "JGwWNGJdvx8", "OPf0YbXqDm0"]
+DEFAULT_ARTICLE_URLS = [f"https://example.com/news/story-{i}" for i in range(8)]
+DEFAULT_CLAIMS = [
+    "Remote work increases productivity",
+    "Nuclear power is the safest source of energy",
+    "Social media harms teenagers' mental health",
+    "A four-day work week benefits the economy",
+    "Electric cars are better for the environment than petrol cars",
+]
+
+
+def load_inputs(fixtures_dir):
+    """Video IDs and article URLs with recorded fixtures, else placeholders that get synthetic replies"""
+    store = FixtureStore(fixtures_dir)
+    video_ids = sorted({request["video_id"] for request in store.requests("youtube", "transcript")})
+    urls = sorted({request["url"] for request in store.requests("web", "fetch_url")})
+    return {
+        "video_ids": video_ids or DEFAULT_VIDEO_IDS,
+        "urls": urls or DEFAULT_ARTICLE_URLS,
+        "claims": DEFAULT_CLAIMS,
+        "recorded": bool(video_ids or urls)
+    }
+
+
+def build_scenarios(inputs, debate_rounds):
+    """name -> function(rng) returning (method, path, request kwargs)"""
+    return {
+        "vid": lambda rng: ("GET", f"/vid/youtube-transcript/{rng.choice(inputs['video_ids'])}", {}),
+        "summary": lambda rng: ("GET", f"/vid/youtube-summary/{rng.choice(inputs['video_ids'])}", {}),
+        "article": lambda rng: ("GET", "/article/alternative", {"params": {"url": rng.choice(inputs["urls"])}}),
+        "debate": lambda rng: ("POST", "/debate/run", {"json": {
+            "claim": rng.choice(inputs["claims"]),
+            "max_rounds": debate_rounds,
+            "include_audio": False,
+            "debate_mode": "text_only"
+        }}),
+    }
+
+
+def parse_mix(text, scenarios):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in scenarios:
+            raise SystemExit(f"Unknown scenario '{name}'; choose from {', '.join(scenarios)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, round(pct / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def _debate_turn_failed(body):
+    return any(str(turn.get("response", "")).startswith("Error generating response:")
+               for turn in body.get("conversation_history", []) if isinstance(turn, dict))
+
+
+def _article_placeholder(body):
+    summary = body.get("summary", "")
+    return summary in ("Summary not available", "Could not extract article content") or summary.startswith("Error: ")
+
+
+# scenario -> predicate on a 200 JSON body: the placeholder an endpoint returns when an
+# upstream call failed. The fact-check prompt asks for at least two checks per minute,
+# so an empty list means the check failed even from a server without X-Degraded.
+DEGRADED = {
+    "vid": lambda body: body == [],
+    "summary": lambda body: isinstance(body, dict) and body.get("summary") == "Summary not available",
+    "article": lambda body: isinstance(body, dict) and _article_placeholder(body),
+    "debate": lambda body: isinstance(body, dict) and _debate_turn_failed(body),
+}
+
+
+def classify(name, response):
+    """"ok", "error" or "degraded" for a scenario's response"""
+    if response.status_code >= 400:
+        return "error"
+    try:
+        body = response.json()
+    except ValueError:
+        return "ok"
+    if isinstance(body, dict) and body.get("error"):
+        return "error"
+    if "X-Degraded" in response.headers or DEGRADED.get(name, lambda body: False)(body):
+        return "degraded"
+    return "ok"
+
+
+async def run_load(base_url, scenarios, mix, concurrency, total_requests, duration, timeout, seed):
+    """[(scenario, latency_s, outcome)] for every request sent, plus the wall time"""
+    rng = random.Random(seed)
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    results = []
+    sent = 0
+    started = time.perf_counter()
+    deadline = started + duration if duration else None
+
+    def next_request():
+        nonlocal sent
+        if deadline is not None and time.perf_counter() >= deadline:
+            return None
+        if deadline is None and sent >= total_requests:
+            return None
+        sent += 1
+        name = rng.choices(names, weights)[0]
+        return name, scenarios[name](rng)
+
+    async def worker(client):
+        while (job := next_request()) is not None:
+            name, (method, path, kwargs) = job
+            request_started = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                outcome = classify(name, response)
+            except httpx.HTTPError:
+                outcome = "error"
+            results.append((name, time.perf_counter() - request_started, outcome))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    return results, time.perf_counter() - started
+
+
+def summarize(results, wall_s):
+    def stats(rows):
+        latencies = sorted(latency for _, latency, _ in rows)
+        errors = sum(1 for _, _, outcome in rows if outcome == "error")
+        degraded = sum(1 for _, _, outcome in rows if outcome == "degraded")
+        return {
+            "requests": len(rows),
+            "errors": errors,
+            "error_rate": round(errors / len(rows), 4) if rows else 0.0,
+            "degraded": degraded,
+            "degraded_rate": round(degraded / len(rows), 4) if rows else 0.0,
+            "throughput_rps": round(len(rows) / wall_s, 2) if wall_s else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+            "p95_ms": round(percentile(latencies, 95) * 1000, 1),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0
+        }
+
+    by_scenario = {}
+    for row in results:
+        by_scenario.setdefault(row[0], []).append(row)
+    return {"overall": stats(results),
+            "scenarios": {name: stats(rows) for name, rows in sorted(by_scenario.items())}}
+
+
+def replay_counts(base_url):
+    """upstream_replays_total from the server's /metrics, summed by result"""
+    try:
+        text = httpx.get(f"{base_url}/metrics", timeout=10).text
+    except httpx.HTTPError:
+        return {}
+    counts = {}
+    for line in text.splitlines():
+        if line.startswith("upstream_replays_total{"):
+            labels, value = line.rsplit(" ", 1)
+            result = labels.split('result="', 1)[1].split('"', 1)[0]
+            counts[result] = counts.get(result, 0) + float(value)
+    return counts
+
+
+def replay_delta(before, after):
+    """Replays per result between two replay_counts snapshots"""
+    return {result: count - before.get(result, 0) for result, count in after.items()
+            if count - before.get(result, 0)}
+
+
+def start_server(args, workdir, log):
+    port = free_port()
+    env = {
+        **os.environ,
+        "UPSTREAM_MODE": args.mode,
+        "UPSTREAM_FIXTURES": os.path.abspath(args.fixtures),
+        "UPSTREAM_LATENCY_SCALE": str(args.latency_scale),
+        "UPSTREAM_ERROR_RATE": str(args.error_rate),
+        # Client constructors insist on keys even though replayed calls never use them
+        "GEMINI_API_KEY": os.environ.get("GEMINI_API_KEY", "replay"),
+        "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "replay"),
+        "VECTOR_BACKEND": os.environ.get("VECTOR_BACKEND", "local"),
+        "DEBATE_CHECKPOINT_PATH": os.path.join(workdir, "debates.sqlite3"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite3"),
+        "LEXICAL_INDEX_DIR": os.path.join(workdir, "lexical"),
+        "LOCAL_VECTOR_DIR": os.path.join(workdir, "vectors"),
+        "AUDIO_CACHE_DIR": os.path.join(workdir, "audio"),
+    }
+    if args.profile:
+        env["UPSTREAM_PROFILE"] = os.path.abspath(args.profile)
+    if args.seed is not None:
+        env["UPSTREAM_SEED"] = str(args.seed)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=log
+    )
+    return server, f"http://127.0.0.1:{port}"
+
+
+def log_tail(path, chars=2000):
+    with open(path, errors="replace") as handle:
+        return handle.read()[-chars:]
+
+
+def wait_until_ready(base_url, server, timeout, log_path=None):
+    started = time.perf_counter()
+    while time.perf_counter() - started < timeout:
+        if server is not None and server.poll() is not None:
+            raise RuntimeError(f"uvicorn exited with {server.returncode}:\n{log_tail(log_path)}")
+        try:
+            response = httpx.get(f"{base_url}/health/ready", timeout=1)
+        except httpx.HTTPError:
+            time.sleep(0.1)
+            continue
+        if response.status_code == 200:
+            return
+        failed = {name: subsystem.get("error") for name, subsystem in response.json()["subsystems"].items()
+                  if subsystem["required"] and subsystem["status"] == "failed"}
+        if failed:
+            raise RuntimeError(f"Required subsystems failed to start: {failed}")
+        time.sleep(0.1)
+    raise RuntimeError(f"{base_url} not ready within {timeout}s")
+
+
+def print_report(summary, replays):
+    print(f"\n{'scenario':<10}{'requests':>9}{'errors':>8}{'err %':>7}{'degraded':>10}{'dgr %':>7}{'req/s':>8}"
+          f"{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    rows = list(summary["scenarios"].items()) + [("overall", summary["overall"])]
+    for name, stats in rows:
+        print(f"{name:<10}{stats['requests']:>9}{stats['errors']:>8}{stats['error_rate'] * 100:>7.1f}"
+              f"{stats['degraded']:>10}{stats['degraded_rate'] * 100:>7.1f}{stats['throughput_rps']:>8.2f}"
+              f"{stats['p50_ms']:>10.1f}{stats['p95_ms']:>10.1f}{stats['p99_ms']:>10.1f}")
+    if replays:
+        total = sum(replays.values())
+        print("\nUpstream replays during the run: " + ", ".join(
+            f"{result} {count:.0f} ({count / total:.0%})" for result, count in sorted(replays.items())))
+        overall = summary["overall"]
+        print(f"{replays.get('error', 0):.0f} failed upstream calls surfaced as {overall['errors']} errors "
+              f"and {overall['degraded']} degraded responses")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load-test /vid, /article and /debate")
+    parser.add_argument("--url", help="Benchmark this running server instead of spawning one")
+    parser.add_argument("--mode", default="replay", choices=["replay", "live", "record"],
+                        help="UPSTREAM_MODE of the spawned server")
+    parser.add_argument("--fixtures", default=FIXTURES_DIR, help="Fixture directory to replay")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier on replayed latencies")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Injected upstream failure probability")
+    parser.add_argument("--profile", help="UPSTREAM_PROFILE JSON with per-service latency and error rates")
+    parser.add_argument("--seed", type=int, help="Seed for scenario choice and replay randomness")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=200, help="Requests to send (ignored with --duration)")
+    parser.add_argument("--duration", type=float, help="Send requests for this many seconds instead")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Scenario weights, e.g. vid=3,article=2,debate=1")
+    parser.add_argument("--debate-rounds", type=int, default=2)
+    parser.add_argument("--timeout", type=float, default=180.0, help="Per-request timeout in seconds")
+    parser.add_argument("--startup-timeout", type=float, default=120.0)
+    parser.add_argument("--max-error-rate", type=float,
+                        help="Fail if the overall rate of errors plus degraded responses is above this")
+    parser.add_argument("--max-p95-ms", type=float, help="Fail if the overall p95 is above this")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--server-log", help="Keep the spawned server's stderr in this file")
+    args = parser.parse_args(argv)
+
+    inputs = load_inputs(args.fixtures)
+    scenarios = build_scenarios(inputs, args.debate_rounds)
+    mix = parse_mix(args.mix, scenarios)
+    print(f"{len(inputs['video_ids'])} video IDs, {len(inputs['urls'])} article URLs "
+          f"({'from fixtures' if inputs['recorded'] else 'synthetic, no fixtures recorded'})")
+
+    server = None
+    log = None
+    with tempfile.TemporaryDirectory(prefix="bench_load_") as workdir:
+        if args.url:
+            base_url = args.url.rstrip("/")
+            log_path = None
+        else:
+            log_path = os.path.abspath(args.server_log or os.path.join(workdir, "server.log"))
+            log = open(log_path, "w")
+            server, base_url = start_server(args, workdir, log)
+        try:
+            wait_until_ready(base_url, server, args.startup_timeout, log_path)
+            load = f"{args.duration}s" if args.duration else f"{args.requests} requests"
+            print(f"Driving {base_url} with {args.concurrency} workers for {load} (mix {args.mix})")
+            replays_before = replay_counts(base_url)
+            results, wall_s = asyncio.run(run_load(
+                base_url, scenarios, mix, args.concurrency, args.requests, args.duration, args.timeout, args.seed))
+            replays = replay_delta(replays_before, replay_counts(base_url))
+        finally:
+            if server is not None:
+                server.terminate()
+                try:
+                    server.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    server.kill()
+            if log is not None:
+                log.close()
+
+    summary = summarize(results, wall_s)
+    print_report(summary, replays)
+    print(f"\nWall time {wall_s:.1f}s")
+
+    failures = []
+    overall = summary["overall"]
+    unsuccessful_rate = overall["error_rate"] + overall["degraded_rate"]
+    if args.max_error_rate is not None and unsuccessful_rate > args.max_error_rate:
+        failures.append(f"error + degraded rate {unsuccessful_rate:.2%} > {args.max_error_rate:.2%}")
+    if args.max_p95_ms is not None and overall["p95_ms"] > args.max_p95_ms:
+        failures.append(f"p95 {overall['p95_ms']:.1f} ms > {args.max_p95_ms} ms")
+
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump({
+                "config": {key: value for key, value in vars(args).items() if key != "json"},
+                "wall_s": round(wall_s, 3),
+                **summary,
+                "upstream_replays": replays,
+                "failures": failures
+            }, handle, indent=2)
+
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
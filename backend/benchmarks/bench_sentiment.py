@@ -0,0 +1,263 @@
+"""
+Benchmark and accuracy suite for Word2VecSentimentScorer
+
+Usage (from backend/):
+    python -m benchmarks.bench_sentiment
+    python -m benchmarks.bench_sentiment --models all --json sentiment_bench.json
+
+For each model this reports load time and resident memory, then for every scoring
+method and batch size the throughput (sentences/sec) and per-batch latency
+percentiles of both the reference path (analyze() per sentence) and the vectorized
+path (score_batch). The accuracy check compares the two paths over the whole corpus
+and exits non-zero if any method drifts past --tolerance, so performance work
+cannot silently change scores.
+
+Each model is measured in its own subprocess so load time and RSS are not skewed by
+a previously loaded model.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+SUPPORTED_MODELS = ['glove-twitter-25', 'glove-wiki-gigaword-300', 'word2vec-google-news-300']
+METHODS = ['similarity', 'projection', 'individual', 'weighted']
+DEFAULT_CORPUS = os.path.join(os.path.dirname(__file__), "data", "sentiment_corpus.txt")
+
+
+def current_rss_mb():
+    """Resident set size of this process in MB"""
+    try:
+        with open("/proc/self/status") as handle:
+            for line in handle:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as handle:
+        return [line.strip() for line in handle if line.strip()]
+
+
+def percentiles(samples_ms):
+    samples = np.asarray(samples_ms)
+    return {
+        "p50_ms": round(float(np.percentile(samples, 50)), 4),
+        "p95_ms": round(float(np.percentile(samples, 95)), 4),
+        "p99_ms": round(float(np.percentile(samples, 99)), 4),
+    }
+
+
+def time_batches(score_fn, corpus, batch_size, seconds, min_batches, rng):
+    """Run score_fn over random batches for roughly `seconds`, returning timing stats"""
+    latencies_ms = []
+    sentences = 0
+    started = time.perf_counter()
+    while len(latencies_ms) < min_batches or time.perf_counter() - started < seconds:
+        batch = [corpus[rng.randrange(len(corpus))] for _ in range(batch_size)]
+        t0 = time.perf_counter()
+        score_fn(batch)
+        latencies_ms.append((time.perf_counter() - t0) * 1000)
+        sentences += batch_size
+    total = sum(latencies_ms) / 1000
+    return {
+        "batches": len(latencies_ms),
+        "sentences_per_sec": round(sentences / total, 1) if total else None,
+        **percentiles(latencies_ms),
+    }
+
+
+def reference_scores(scorer, sentences, method):
+    """Unrounded scores from the per-sentence reference methods"""
+    score_fn = {
+        'similarity': scorer.score_similarity,
+        'projection': scorer.score_projection,
+        'individual': scorer.score_individual_words,
+        'weighted': scorer.score_weighted,
+    }[method]
+    return np.array([score_fn(sentence) for sentence in sentences], dtype=np.float64)
+
+
+def check_accuracy(scorer, corpus, tolerance):
+    """Compare score_batch against the reference methods for every corpus sentence"""
+    results = {}
+    for method in METHODS:
+        reference = reference_scores(scorer, corpus, method)
+        optimized = scorer.score_batch(corpus, method)
+        nan_mismatch = int(np.sum(np.isnan(reference) != np.isnan(optimized)))
+        finite = ~np.isnan(reference) & ~np.isnan(optimized)
+        max_abs_diff = float(np.max(np.abs(reference[finite] - optimized[finite]))) if finite.any() else 0.0
+        results[method] = {
+            "max_abs_diff": max_abs_diff,
+            "nan_mismatches": nan_mismatch,
+            "passed": nan_mismatch == 0 and max_abs_diff <= tolerance,
+        }
+    return results
+
+
+def benchmark_model(model_name, corpus, batch_sizes, seconds, min_batches, tolerance, seed, model_path=None):
+    """Measure one model in the current process"""
+    from gensim.models import KeyedVectors
+    from video_transcription.sentiment import Word2VecSentimentScorer
+
+    rss_before = current_rss_mb()
+    t0 = time.perf_counter()
+    if model_path:
+        scorer = Word2VecSentimentScorer(model_name, keyed_vectors=KeyedVectors.load(model_path, mmap='r'))
+    else:
+        scorer = Word2VecSentimentScorer(model_name)
+    load_seconds = time.perf_counter() - t0
+    rss_after_load = current_rss_mb()
+
+    accuracy = check_accuracy(scorer, corpus, tolerance)
+
+    throughput = []
+    for method in METHODS:
+        for batch_size in batch_sizes:
+            rng = random.Random(seed)
+            reference = time_batches(
+                lambda batch: [scorer.analyze(sentence, method) for sentence in batch],
+                corpus, batch_size, seconds, min_batches, rng,
+            )
+            rng = random.Random(seed)
+            optimized = time_batches(
+                lambda batch: scorer.score_batch(batch, method),
+                corpus, batch_size, seconds, min_batches, rng,
+            )
+            throughput.append({
+                "method": method,
+                "batch_size": batch_size,
+                "reference": reference,
+                "optimized": optimized,
+            })
+
+    return {
+        "model": model_name,
+        "vocab_size": len(scorer.model.key_to_index),
+        "vector_size": scorer.model.vector_size,
+        "load_seconds": round(load_seconds, 3),
+        "rss_mb_before_load": round(rss_before, 1),
+        "rss_mb_after_load": round(rss_after_load, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "accuracy": accuracy,
+        "throughput": throughput,
+    }
+
+
+def print_report(result):
+    print(f"\n=== {result['model']} ===")
+    print(f"Load time: {result['load_seconds']:.2f}s  "
+          f"RSS after load: {result['rss_mb_after_load']:.0f} MB "
+          f"(+{result['rss_mb_after_load'] - result['rss_mb_before_load']:.0f} MB)  "
+          f"Peak RSS: {result['peak_rss_mb']:.0f} MB")
+
+    print("\nAccuracy (score_batch vs reference):")
+    for method, check in result["accuracy"].items():
+        status = "PASS" if check["passed"] else "FAIL"
+        print(f"  {method:12s} max|diff|={check['max_abs_diff']:.2e} nan_mismatches={check['nan_mismatches']} {status}")
+
+    print(f"\n{'method':12s} {'batch':>6s} | {'ref sent/s':>11s} {'p50':>8s} {'p95':>8s} {'p99':>8s} "
+          f"| {'opt sent/s':>11s} {'p50':>8s} {'p95':>8s} {'p99':>8s} | {'speedup':>7s}")
+    for row in result["throughput"]:
+        ref, opt = row["reference"], row["optimized"]
+        speedup = opt["sentences_per_sec"] / ref["sentences_per_sec"] if ref["sentences_per_sec"] else float("nan")
+        print(f"{row['method']:12s} {row['batch_size']:6d} | "
+              f"{ref['sentences_per_sec']:11.0f} {ref['p50_ms']:8.3f} {ref['p95_ms']:8.3f} {ref['p99_ms']:8.3f} | "
+              f"{opt['sentences_per_sec']:11.0f} {opt['p50_ms']:8.3f} {opt['p95_ms']:8.3f} {opt['p99_ms']:8.3f} | "
+              f"{speedup:6.1f}x")
+
+
+def run_in_subprocess(model_name, args):
+    """Benchmark one model in a fresh interpreter and return its JSON result"""
+    command = [
+        sys.executable, "-m", "benchmarks.bench_sentiment",
+        "--models", model_name,
+        "--corpus", args.corpus,
+        "--batch-sizes", *[str(size) for size in args.batch_sizes],
+        "--seconds", str(args.seconds),
+        "--min-batches", str(args.min_batches),
+        "--tolerance", str(args.tolerance),
+        "--seed", str(args.seed),
+        "--single",
+    ]
+    if args.model_path:
+        command += ["--model-path", args.model_path]
+    completed = subprocess.run(command, capture_output=True, text=True,
+                               cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if completed.returncode not in (0, 1):
+        raise RuntimeError(f"Benchmark for {model_name} failed:\n{completed.stderr}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Word2VecSentimentScorer")
+    parser.add_argument("--models", nargs="+", default=['glove-twitter-25'],
+                        help=f"Models to benchmark, or 'all' for {', '.join(SUPPORTED_MODELS)}")
+    parser.add_argument("--model-path", help="Load a local gensim .kv file (memory-mapped) instead of downloading")
+    parser.add_argument("--corpus", default=DEFAULT_CORPUS)
+    parser.add_argument("--batch-sizes", nargs="+", type=int, default=[1, 16, 128, 1024])
+    parser.add_argument("--seconds", type=float, default=1.0, help="Time budget per method/batch size/path")
+    parser.add_argument("--min-batches", type=int, default=5)
+    parser.add_argument("--tolerance", type=float, default=1e-4, help="Max allowed |optimized - reference|")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Write the full results to this file")
+    parser.add_argument("--single", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    models = SUPPORTED_MODELS if args.models == ["all"] else args.models
+    corpus = load_corpus(args.corpus)
+
+    if args.single:
+        result = benchmark_model(models[0], corpus, args.batch_sizes, args.seconds, args.min_batches,
+                                 args.tolerance, args.seed, args.model_path)
+        print(json.dumps(result))
+        sys.exit(0 if all(check["passed"] for check in result["accuracy"].values()) else 1)
+
+    results = [run_in_subprocess(model_name, args) for model_name in models]
+    for result in results:
+        print_report(result)
+
+    report = {
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "corpus": {"path": os.path.relpath(args.corpus), "sentences": len(corpus)},
+        "seed": args.seed,
+        "tolerance": args.tolerance,
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+        print(f"\nWrote results to {args.json}")
+
+    failed = [(result["model"], method) for result in results
+              for method, check in result["accuracy"].items() if not check["passed"]]
+    if failed:
+        print(f"\nAccuracy check FAILED for: {failed}")
+        sys.exit(1)
+    print("\nAccuracy check passed for all models and methods")
+
+
+if __name__ == "__main__":
+    main()
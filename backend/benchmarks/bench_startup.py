@@ -0,0 +1,179 @@
+"""
+Startup benchmark for the FastAPI app
+
+Usage (from backend/):
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --repeat 5 --max-import-ms 1500 --json startup_bench.json
+
+Reports the import-time breakdown of `import app` (from python -X importtime: total,
+the slowest modules by cumulative time and self time summed per top-level package)
+and time-to-first-request, measured from spawning uvicorn until GET --path answers.
+Every measurement runs in a fresh interpreter; the median over --repeat runs is used.
+
+Exits non-zero if the median import or first-request time exceeds its threshold, or
+if any --forbid module (heavy client libraries that should only load when their
+endpoints are first used) is imported at startup.
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy dependencies that must stay out of the startup path
+DEFAULT_FORBIDDEN = [
+    'yt_dlp', 'youtube_transcript_api', 'google.generativeai', 'langgraph', 'langchain',
+    'langchain_core', 'langchain_openai', 'langchain_community', 'pinecone', 'elevenlabs',
+    'pygame', 'serpapi', 'trafilatura', 'gensim', 'scipy'
+]
+
+
+def parse_importtime(stderr):
+    """Return [(module, self_us, cumulative_us, depth)] from -X importtime output"""
+    records = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        records.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return records
+
+
+def measure_imports(module):
+    """Import `module` in a fresh interpreter and return its import-time records"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+    return parse_importtime(result.stderr)
+
+
+def import_breakdown(records, top):
+    """Total import time of the root module, slowest modules and per-package self time"""
+    total_us = next((cumulative for name, _, cumulative, depth in reversed(records) if depth == 0), 0)
+    by_package = defaultdict(int)
+    for name, self_us, _, _ in records:
+        by_package[name.split(".")[0]] += self_us
+    slowest = sorted(records, key=lambda record: record[2], reverse=True)[:top]
+    return {
+        "total_ms": total_us / 1000,
+        "modules": [{"module": name, "cumulative_ms": cumulative / 1000, "self_ms": self_us / 1000}
+                    for name, self_us, cumulative, _ in slowest],
+        "packages": dict(sorted(((package, us / 1000) for package, us in by_package.items()),
+                                key=lambda item: item[1], reverse=True)[:top])
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_first_request(app, path, timeout):
+    """Seconds from spawning uvicorn until `path` first answers (any HTTP status)"""
+    port = free_port()
+    url = f"http://127.0.0.1:{port}{path}"
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", app, "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with {server.returncode}:\n{server.stderr.read()[-2000:]}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    status = response.status
+            except urllib.error.HTTPError as e:
+                status = e.code
+            except (urllib.error.URLError, ConnectionError, socket.timeout):
+                time.sleep(0.01)
+                continue
+            return time.perf_counter() - started, status
+        raise RuntimeError(f"No response from {url} within {timeout}s")
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark FastAPI app startup")
+    parser.add_argument("--module", default="app", help="Module whose import is measured")
+    parser.add_argument("--app", default="app:app", help="uvicorn application for time-to-first-request")
+    parser.add_argument("--path", default="/health/live", help="Endpoint used as the first request")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=15, help="Number of modules/packages to list")
+    parser.add_argument("--max-import-ms", type=float, default=1500.0)
+    parser.add_argument("--max-first-request-ms", type=float, default=3000.0)
+    parser.add_argument("--forbid", nargs="*", default=DEFAULT_FORBIDDEN,
+                        help="Modules that must not be imported at startup")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Max seconds to wait for the first request")
+    parser.add_argument("--json", help="Write the full results to this file")
+    args = parser.parse_args(argv)
+
+    runs = [measure_imports(args.module) for _ in range(args.repeat)]
+    breakdowns = [import_breakdown(records, args.top) for records in runs]
+    median_run = sorted(range(len(runs)), key=lambda i: breakdowns[i]["total_ms"])[len(runs) // 2]
+    breakdown = breakdowns[median_run]
+
+    imported = {name for name, _, _, _ in runs[median_run]}
+    forbidden = sorted(module for module in args.forbid if module in imported)
+
+    first_requests = [measure_first_request(args.app, args.path, args.timeout) for _ in range(args.repeat)]
+    first_request_ms = statistics.median(seconds for seconds, _ in first_requests) * 1000
+
+    run_totals = ", ".join(f"{b['total_ms']:.0f}" for b in breakdowns)
+    print(f"import {args.module}: {breakdown['total_ms']:.1f} ms (median of {args.repeat} runs: {run_totals})")
+    print("\nSlowest modules (cumulative ms / self ms):")
+    for module in breakdown["modules"]:
+        print(f"  {module['cumulative_ms']:9.1f} {module['self_ms']:9.1f}  {module['module']}")
+    print("\nSelf time by top-level package (ms):")
+    for package, ms in breakdown["packages"].items():
+        print(f"  {ms:9.1f}  {package}")
+    print(f"\nTime to first request ({args.path}): {first_request_ms:.1f} ms "
+          f"(status {first_requests[0][1]})")
+
+    failures = []
+    if breakdown["total_ms"] > args.max_import_ms:
+        failures.append(f"import time {breakdown['total_ms']:.1f} ms > {args.max_import_ms} ms")
+    if first_request_ms > args.max_first_request_ms:
+        failures.append(f"time to first request {first_request_ms:.1f} ms > {args.max_first_request_ms} ms")
+    if forbidden:
+        failures.append(f"heavy modules imported at startup: {', '.join(forbidden)}")
+
+    if args.json:
+        with open(args.json, "w") as handle:
+            json.dump({
+                "python": sys.version,
+                "import": breakdown,
+                "import_runs_ms": [b["total_ms"] for b in breakdowns],
+                "first_request_ms": first_request_ms,
+                "first_request_runs_ms": [seconds * 1000 for seconds, _ in first_requests],
+                "forbidden_imported": forbidden,
+                "failures": failures
+            }, handle, indent=2)
+
+    if failures:
+        print("\nFAIL: " + "; ".join(failures))
+        sys.exit(1)
+    print("\nOK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+import asyncio
+import json
+
+
+class ClientDisconnected(Exception):
+    """Raised in place of the cancellation when the client went away mid-request"""
+
+
+async def http_disconnect(request):
+    """Return once the HTTP client has disconnected"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+async def websocket_disconnect(websocket):
+    """
+    Return once the WebSocket client has disconnected or sent {"type": "cancel"}
+
+    Only for handlers that have finished reading from the socket: it consumes
+    every incoming message. Anything other than a JSON cancel message is ignored.
+    """
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        if not message.get("text"):
+            continue
+        try:
+            payload = json.loads(message["text"])
+        except ValueError:
+            continue
+        if isinstance(payload, dict) and payload.get("type") == "cancel":
+            return
+
+
+class CancelOnDisconnect:
+    """
+    Cancel the enclosing task when the client goes away
+
+    Used like asyncio.timeout(): the awaitable passed in (http_disconnect(request) or
+    websocket_disconnect(websocket)) is watched alongside the block, and when it
+    completes the task running the block is cancelled, so in-flight LLM, retrieval and
+    TTS awaits stop instead of producing output nobody reads. The cancellation surfaces
+    as ClientDisconnected at the end of the block.
+    """
+
+    def __init__(self, disconnected):
+        self._disconnected = disconnected
+        self._task = None
+        self._watcher = None
+        self._exited = False
+        self.triggered = False
+
+    async def __aenter__(self):
+        self._task = asyncio.current_task()
+        self._watcher = asyncio.create_task(self._disconnected)
+        self._watcher.add_done_callback(self._on_disconnect)
+        return self
+
+    def _on_disconnect(self, watcher):
+        if watcher.cancelled() or self._exited:
+            return
+        # A receive that fails (the connection is already gone) also counts
+        watcher.exception()
+        self.triggered = True
+        self._task.cancel()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._exited = True
+        if not self._watcher.done():
+            self._watcher.cancel()
+        if self.triggered and exc_type is asyncio.CancelledError:
+            self._task.uncancel()
+            raise ClientDisconnected() from exc
+        return False
@@ -0,0 +1,2 @@
+# Lets tests import the backend's top-level modules (app, agents_debate, ...) the same
+# way the app does when it is run from backend/
@@ -0,0 +1,159 @@
+import asyncio
+import importlib
+import importlib.util
+import inspect
+import sys
+import threading
+import time
+
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+# Held by heavy_import around a first import of a heavy library, from whichever thread
+# gets there first: warm-up factories, background indexing, or the /vid and /article
+# routes that load their clients on first use. Two threads importing a shared
+# dependency (pydantic.v1, protobuf, langchain) for the first time at once can fail with
+# partially initialized modules, so first imports take turns. Only the import itself
+# runs under it, never client construction or network calls, so a slow warm-up never
+# holds up a request. Reentrant, since one heavy module may heavy_import another.
+heavy_imports = threading.RLock()
+
+
+def heavy_import(name, package=None):
+    """importlib.import_module(name, package) under heavy_imports; lock-free once loaded"""
+    module = sys.modules.get(importlib.util.resolve_name(name, package))
+    if module is not None and not getattr(getattr(module, "__spec__", None), "_initializing", False):
+        return module
+    with heavy_imports:
+        return importlib.import_module(name, package)
+
+
+class SubsystemUnavailable(Exception):
+    """Raised when a subsystem is requested before it has started (or after it failed to)"""
+
+    def __init__(self, name, status, error=None):
+        self.name = name
+        self.status = status
+        self.error = error
+        message = f"{name} is {status}"
+        if error:
+            message += f": {error}"
+        super().__init__(message)
+
+
+class Subsystem:
+
+    def __init__(self, name, factory, close=None, required=True, retry_after=30.0):
+        self.name = name
+        self.factory = factory
+        self.close = close
+        self.required = required
+        self.retry_after = retry_after
+        self.status = PENDING
+        self.value = None
+        self.error = None
+        self.task = None
+        self.changed_at = time.time()
+        self.warm_seconds = None
+
+    def _set_status(self, status):
+        self.status = status
+        self.changed_at = time.time()
+
+
+class SubsystemRegistry:
+    """
+    Heavyweight clients that are built in the background instead of at import time
+
+    Each subsystem has a blocking factory that is run in a worker thread, so the
+    server accepts traffic while it warms up. Factories load their libraries through
+    heavy_import, since they do the first import of most of them. Routes that need a
+    subsystem call get(), which raises SubsystemUnavailable until it is ready; a failed
+    subsystem is retried on the next request once retry_after seconds have passed.
+    """
+
+    def __init__(self):
+        self._subsystems = {}
+
+    def register(self, name, factory, close=None, required=True, retry_after=30.0):
+        """Add a subsystem; close(value) runs on shutdown and may be a coroutine function"""
+        if name not in self._subsystems:
+            self._subsystems[name] = Subsystem(name, factory, close, required, retry_after)
+
+    def _start(self, subsystem):
+        subsystem._set_status(WARMING)
+        subsystem.error = None
+        subsystem.task = asyncio.create_task(self._warm(subsystem))
+
+    async def _warm(self, subsystem):
+        started = time.perf_counter()
+        try:
+            value = await asyncio.to_thread(subsystem.factory)
+        except Exception as e:
+            subsystem.error = str(e)
+            subsystem._set_status(FAILED)
+            print(f"❌ {subsystem.name} failed to start: {e}")
+            return
+        subsystem.value = value
+        subsystem.warm_seconds = round(time.perf_counter() - started, 3)
+        subsystem._set_status(READY)
+        print(f"✅ {subsystem.name} ready in {subsystem.warm_seconds}s")
+
+    def start_all(self):
+        """Begin warming every pending subsystem; must be called from the event loop"""
+        for subsystem in self._subsystems.values():
+            if subsystem.status == PENDING:
+                self._start(subsystem)
+
+    def get(self, name):
+        """Return a ready subsystem, starting (or retrying) its warm-up if needed"""
+        subsystem = self._subsystems[name]
+        if subsystem.status == READY:
+            return subsystem.value
+        if subsystem.status == PENDING or (
+                subsystem.status == FAILED and time.time() - subsystem.changed_at >= subsystem.retry_after):
+            self._start(subsystem)
+        raise SubsystemUnavailable(name, subsystem.status, subsystem.error)
+
+    async def wait(self, name, timeout=None):
+        """Wait for a subsystem to finish warming and return it"""
+        subsystem = self._subsystems[name]
+        if subsystem.status in (PENDING, FAILED):
+            self._start(subsystem)
+        if subsystem.status == WARMING:
+            await asyncio.wait_for(asyncio.shield(subsystem.task), timeout)
+        return self.get(name)
+
+    def is_ready(self):
+        """Whether every required subsystem is ready"""
+        return all(s.status == READY for s in self._subsystems.values() if s.required)
+
+    def status(self):
+        return {
+            name: {
+                "status": s.status,
+                "required": s.required,
+                "error": s.error,
+                "warm_seconds": s.warm_seconds,
+                "since": round(s.changed_at, 3)
+            }
+            for name, s in self._subsystems.items()
+        }
+
+    async def close_all(self):
+        """Cancel warm-ups still in flight and close subsystems that started"""
+        for subsystem in self._subsystems.values():
+            if subsystem.task is not None and not subsystem.task.done():
+                subsystem.task.cancel()
+            if subsystem.status == READY and subsystem.close is not None:
+                try:
+                    result = subsystem.close(subsystem.value)
+                    if inspect.isawaitable(result):
+                        await result
+                except Exception as e:
+                    print(f"Error closing {subsystem.name}: {e}")
+
+
+registry = SubsystemRegistry()
@@ -0,0 +1,276 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from telemetry import Counter, Histogram, current_endpoint, metrics, span
+
+# Completed responses kept per process for prompts marked cacheable; 0 disables
+LLM_CACHE_SIZE = int(os.getenv('LLM_CACHE_SIZE', '256'))
+
+# USD per million tokens (input, output); override with LLM_PRICES='{"model": [in, out]}'
+PRICES = {
+    "gemini-2.5-pro": (1.25, 10.0),
+    "gemini-2.5-flash": (0.30, 2.50),
+}
+PRICES.update({model: tuple(price) for model, price in json.loads(os.getenv('LLM_PRICES', '{}')).items()})
+
+llm_calls = metrics.register(Counter(
+    "llm_calls_total", "Model calls by endpoint, prompt type, model and cache result",
+    ("endpoint", "prompt_type", "model", "cache")))
+llm_tokens = metrics.register(Counter(
+    "llm_tokens_total", "Tokens sent to and generated by the model",
+    ("endpoint", "prompt_type", "model", "direction")))
+llm_cost = metrics.register(Counter(
+    "llm_cost_usd_total", "Estimated model spend at list prices", ("endpoint", "prompt_type", "model")))
+llm_latency = metrics.register(Histogram(
+    "llm_call_duration_seconds", "Model call latency, to the end of the response", ("prompt_type", "model")))
+
+
+def model_name(model):
+    return getattr(model, "model_name", "unknown").removeprefix("models/")
+
+
+def cost_usd(model, prompt_tokens, output_tokens):
+    input_price, output_price = PRICES.get(model, (0.0, 0.0))
+    return (prompt_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+
+def estimate_tokens(text):
+    """
+    Rough token count (4 characters per token) for calls without usage metadata
+
+    Deliberately not the tokenizer: this runs on the event loop when an `async with
+    LLMCall` block exits, and loading tiktoken may download its BPE file.
+    """
+    return max(1, len(text) // 4) if text else 0
+
+
+class CachedResponse:
+    """Stands in for a model response replayed from the cache"""
+
+    def __init__(self, text):
+        self.text = text
+        self.usage_metadata = None
+
+
+class LLMLedger:
+    """Running totals of model calls per (endpoint, prompt type, model)"""
+
+    def __init__(self):
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, prompt_type, model, latency_s, prompt_tokens, output_tokens,
+               cache_hit=False, estimated=False, error=False, saved_usd=0.0):
+        key = (endpoint, prompt_type, model)
+        with self._lock:
+            row = self._rows.get(key)
+            if row is None:
+                row = self._rows[key] = {
+                    "endpoint": endpoint, "prompt_type": prompt_type, "model": model,
+                    "calls": 0, "cache_hits": 0, "errors": 0, "estimated_calls": 0,
+                    "prompt_tokens": 0, "output_tokens": 0,
+                    "latency_s_total": 0.0, "latency_s_max": 0.0,
+                    "cost_usd": 0.0, "saved_usd": 0.0
+                }
+            row["calls"] += 1
+            row["cache_hits"] += cache_hit
+            row["errors"] += error
+            row["estimated_calls"] += estimated
+            row["prompt_tokens"] += prompt_tokens
+            row["output_tokens"] += output_tokens
+            row["latency_s_total"] += latency_s
+            row["latency_s_max"] = max(row["latency_s_max"], latency_s)
+            row["cost_usd"] += cost_usd(model, prompt_tokens, output_tokens)
+            row["saved_usd"] += saved_usd
+
+    def summary(self):
+        """Rows ordered by spend, most expensive first, with per-call averages"""
+        with self._lock:
+            rows = [dict(row) for row in self._rows.values()]
+        for row in rows:
+            misses = row["calls"] - row["cache_hits"]
+            row["avg_latency_s"] = round(row["latency_s_total"] / misses, 3) if misses else 0.0
+            row["avg_prompt_tokens"] = round(row["prompt_tokens"] / misses) if misses else 0
+            row["avg_output_tokens"] = round(row["output_tokens"] / misses) if misses else 0
+            row["cache_hit_rate"] = round(row["cache_hits"] / row["calls"], 3)
+            for key in ("latency_s_total", "latency_s_max"):
+                row[key] = round(row[key], 3)
+            for key in ("cost_usd", "saved_usd"):
+                row[key] = round(row[key], 6)
+        rows.sort(key=lambda row: row["cost_usd"], reverse=True)
+        return {
+            "total_cost_usd": round(sum(row["cost_usd"] for row in rows), 6),
+            "total_saved_usd": round(sum(row["saved_usd"] for row in rows), 6),
+            "calls": rows
+        }
+
+
+llm_ledger = LLMLedger()
+
+
+class LLMCall:
+    """
+    Accounting for one model call, as `with LLMCall(...) as call:` or `async with`
+
+    Times the call (also as the telemetry stage "llm.<prompt_type>") and, on exit,
+    records tokens, latency and cost against the endpoint being served. Token counts
+    come from the response's usage metadata; without it (a failed or cancelled call,
+    a stream cut short) they are estimated from the lengths of the prompt and the text
+    received.
+    """
+
+    def __init__(self, prompt_type, model, prompt):
+        self.prompt_type = prompt_type
+        self.model = model_name(model)
+        self.prompt = prompt
+        self.response = None
+        self.text = ""
+        self._span = span(f"llm.{prompt_type}")
+        self._started = None
+
+    def feed(self, text):
+        """Add streamed text as it arrives, so a stream cut short can still be estimated"""
+        self.text += text
+
+    def finish(self, response):
+        """Note the completed response before the block exits"""
+        self.response = response
+        if not self.text:
+            self.text = _response_text(response)
+
+    def __enter__(self):
+        self._span.__enter__()
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        latency_s = time.perf_counter() - self._started
+        self._span.__exit__(exc_type, exc, tb)
+        usage = _usage(self.response)
+        prompt_tokens = getattr(usage, "prompt_token_count", None)
+        if prompt_tokens:
+            # Thinking tokens are billed as output
+            output_tokens = (getattr(usage, "candidates_token_count", 0) or 0) + \
+                            (getattr(usage, "thoughts_token_count", 0) or 0)
+            estimated = False
+        else:
+            prompt_tokens = estimate_tokens(self.prompt)
+            output_tokens = estimate_tokens(self.text)
+            estimated = True
+        self.prompt_tokens, self.output_tokens = prompt_tokens, output_tokens
+        _record(self.prompt_type, self.model, latency_s, prompt_tokens, output_tokens,
+                estimated=estimated, error=exc_type is not None)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+def _usage(response):
+    if response is None:
+        return None
+    try:
+        return response.usage_metadata
+    except Exception:
+        return None
+
+
+def _response_text(response):
+    try:
+        return response.text
+    except (ValueError, AttributeError):
+        # Blocked or empty responses have no text parts
+        return ""
+
+
+def _record(prompt_type, model, latency_s, prompt_tokens, output_tokens, cache_hit=False,
+            estimated=False, error=False, saved_usd=0.0):
+    endpoint = current_endpoint()
+    llm_ledger.record(endpoint, prompt_type, model, latency_s, prompt_tokens, output_tokens,
+                      cache_hit=cache_hit, estimated=estimated, error=error, saved_usd=saved_usd)
+    llm_calls.inc(endpoint=endpoint, prompt_type=prompt_type, model=model, cache="hit" if cache_hit else "miss")
+    llm_tokens.inc(prompt_tokens, endpoint=endpoint, prompt_type=prompt_type, model=model, direction="prompt")
+    llm_tokens.inc(output_tokens, endpoint=endpoint, prompt_type=prompt_type, model=model, direction="output")
+    llm_cost.inc(cost_usd(model, prompt_tokens, output_tokens), endpoint=endpoint, prompt_type=prompt_type,
+                 model=model)
+    if not cache_hit:
+        llm_latency.observe(latency_s, prompt_type=prompt_type, model=model)
+
+
+class ResponseCache:
+    """LRU of response texts with the tokens they cost, keyed by model, prompt and settings"""
+
+    def __init__(self, max_entries=LLM_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(model, prompt, kwargs):
+        material = json.dumps([model, prompt, kwargs], sort_keys=True, default=str)
+        return hashlib.sha1(material.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key, text, prompt_tokens, output_tokens):
+        if self.max_entries <= 0 or not text:
+            return
+        with self._lock:
+            self._entries[key] = (text, prompt_tokens, output_tokens)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+response_cache = ResponseCache()
+
+
+def _cache_lookup(model, prompt, prompt_type, kwargs):
+    key = ResponseCache.key(model_name(model), prompt, kwargs)
+    entry = response_cache.get(key)
+    if entry is None:
+        return key, None
+    text, prompt_tokens, output_tokens = entry
+    _record(prompt_type, model_name(model), 0.0, 0, 0, cache_hit=True,
+            saved_usd=cost_usd(model_name(model), prompt_tokens, output_tokens))
+    return key, CachedResponse(text)
+
+
+def generate(model, prompt, prompt_type, cache=False, **kwargs):
+    """model.generate_content(prompt, **kwargs), accounted, optionally answered from the cache"""
+    if cache:
+        key, cached = _cache_lookup(model, prompt, prompt_type, kwargs)
+        if cached is not None:
+            return cached
+    with LLMCall(prompt_type, model, prompt) as call:
+        response = model.generate_content(prompt, **kwargs)
+        call.finish(response)
+    if cache:
+        response_cache.put(key, call.text, call.prompt_tokens, call.output_tokens)
+    return response
+
+
+async def generate_async(model, prompt, prompt_type, cache=False, **kwargs):
+    """model.generate_content_async(prompt, **kwargs), accounted, optionally answered from the cache"""
+    if cache:
+        key, cached = _cache_lookup(model, prompt, prompt_type, kwargs)
+        if cached is not None:
+            return cached
+    async with LLMCall(prompt_type, model, prompt) as call:
+        response = await model.generate_content_async(prompt, **kwargs)
+        call.finish(response)
+    if cache:
+        response_cache.put(key, call.text, call.prompt_tokens, call.output_tokens)
+    return response
@@ -0,0 +1,261 @@
+import contextvars
+import threading
+import time
+from functools import wraps
+
+# Upper bounds (seconds) spanning a cache hit to a long Gemini fact check
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Stage timings of the request being served, for its Server-Timing header. Worker
+# threads started with asyncio.to_thread or by a sync endpoint copy the context, so
+# spans inside them land in the same request's list.
+_request_timings = contextvars.ContextVar('request_timings', default=None)
+# ASGI scope of the request or WebSocket being served, for attributing work to endpoints
+_request_scope = contextvars.ContextVar('request_scope', default=None)
+
+
+def _label_text(names, values):
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class _Metric:
+
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help_text = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value):
+        return [f"{self.name}{_label_text(self.labels, key)} {value}"]
+
+
+class Counter(_Metric):
+
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+
+    kind = "gauge"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(_Metric):
+
+    kind = "histogram"
+
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help_text, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                # Per-bucket counts, then the +Inf count and the sum
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-2] += 1
+            counts[-1] += value
+
+    def _samples(self, key, counts):
+        samples = []
+        names = self.labels + ("le",)
+        for bound, count in zip(self.buckets, counts):
+            samples.append(f"{self.name}_bucket{_label_text(names, key + (bound,))} {count}")
+        samples.append(f"{self.name}_bucket{_label_text(names, key + ('+Inf',))} {counts[-2]}")
+        samples.append(f"{self.name}_count{_label_text(self.labels, key)} {counts[-2]}")
+        samples.append(f"{self.name}_sum{_label_text(self.labels, key)} {round(counts[-1], 6)}")
+        return samples
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+stage_duration = metrics.register(Histogram(
+    "stage_duration_seconds", "Time spent in each backend stage", ("stage",)))
+stage_calls = metrics.register(Counter(
+    "stage_calls_total", "Stage executions by outcome", ("stage", "outcome")))
+stage_in_flight = metrics.register(Gauge(
+    "stage_in_flight", "Stage executions currently running", ("stage",)))
+request_duration = metrics.register(Histogram(
+    "http_request_duration_seconds", "Time to the first response byte", ("method", "route", "status")))
+requests_in_flight = metrics.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served"))
+
+
+class span:
+    """
+    Time one stage (a transcript fetch, an LLM call, a vector search, ...)
+
+    Usable as `with span("stage"):` or `async with span("stage"):`. The duration goes
+    to the stage histogram and, inside a request, to its Server-Timing header;
+    exceptions are counted as errors and re-raised.
+    """
+
+    def __init__(self, stage):
+        self.stage = stage
+        self._started = None
+
+    def __enter__(self):
+        stage_in_flight.inc(stage=self.stage)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._started
+        stage_in_flight.dec(stage=self.stage)
+        stage_duration.observe(elapsed, stage=self.stage)
+        stage_calls.inc(stage=self.stage, outcome="ok" if exc_type is None else "error")
+        timings = _request_timings.get()
+        if timings is not None:
+            timings.append((self.stage, elapsed))
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+def timed(stage):
+    """Decorator running a sync function inside span(stage)"""
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def server_timing(timings, total_s):
+    """Server-Timing header value, with repeated stages summed"""
+    stages = {}
+    for stage, elapsed in timings:
+        total, count = stages.get(stage, (0.0, 0))
+        stages[stage] = (total + elapsed, count + 1)
+    entries = []
+    for stage, (elapsed, count) in stages.items():
+        entry = f"{stage};dur={elapsed * 1000:.1f}"
+        if count > 1:
+            entry += f';desc="{count} calls"'
+        entries.append(entry)
+    entries.append(f"total;dur={total_s * 1000:.1f}")
+    return ", ".join(entries)
+
+
+def _route_template(scope):
+    """The matched route's path template, e.g. /vid/youtube-transcript/{video_id}"""
+    # FastAPI puts the matched route in the scope; its template keeps label values bounded
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or "unmatched"
+
+
+def current_endpoint():
+    """Route template of the request or WebSocket being served, or "background" outside one"""
+    scope = _request_scope.get()
+    if scope is None:
+        return "background"
+    route = _route_template(scope)
+    return route if scope["type"] == "http" else f"ws:{route}"
+
+
+class TimingMiddleware:
+    """
+    Pure ASGI middleware adding a Server-Timing header and recording request latency
+
+    The header lists the stages that finished before the response started, so for
+    streaming responses (debate SSE) it covers only the work done before the first
+    event. WebSocket traffic is only tagged with its scope, for current_endpoint().
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "websocket":
+            scope_token = _request_scope.set(scope)
+            try:
+                await self.app(scope, receive, send)
+            finally:
+                _request_scope.reset(scope_token)
+            return
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = []
+        token = _request_timings.set(timings)
+        scope_token = _request_scope.set(scope)
+        started = time.perf_counter()
+        requests_in_flight.inc()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                elapsed = time.perf_counter() - started
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", server_timing(timings, elapsed).encode("latin-1")))
+                message = {**message, "headers": headers}
+                request_duration.observe(elapsed, method=scope["method"], route=_route_template(scope),
+                                         status=message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            requests_in_flight.dec()
+            _request_timings.reset(token)
+            _request_scope.reset(scope_token)
@@ -0,0 +1,181 @@
+"""
+The multiplexed debate WebSocket protocol: scheduling, flow control and error paths
+
+Run from backend/: python -m pytest tests
+"""
+import asyncio
+import time
+
+from fastapi import FastAPI, WebSocket
+from fastapi.testclient import TestClient
+
+from agents_debate.debate_router import DebateRequest
+from agents_debate.ws_multiplex import DebateMultiplexer
+
+
+class FakeDebateService:
+    """
+    Streams a fixed number of turns without touching any model
+
+    turn_delay is slept before each turn. With together=n, no debate yields anything
+    until n are running, and then each yields all its events without suspending, so
+    every session's frames are queued before the writer sends any of them.
+    """
+
+    def __init__(self, turns=3, turn_delay=0, together=None):
+        self.turns = turns
+        self.turn_delay = turn_delay
+        self.together = together
+        self.running = 0
+        self.all_running = None
+
+    async def run_debate_stream(self, claim, debate_id=None, **kwargs):
+        if self.together:
+            if self.all_running is None:
+                self.all_running = asyncio.Event()
+            self.running += 1
+            if self.running == self.together:
+                self.all_running.set()
+            await self.all_running.wait()
+        yield {"type": "start", "claim": claim, "debate_id": debate_id}
+        for i in range(self.turns):
+            if not self.together:
+                await asyncio.sleep(self.turn_delay)
+            yield {"type": "turn", "claim": claim, "index": i}
+
+
+def make_client(turns=3, heartbeat_s=60, **service_options):
+    app = FastAPI()
+
+    @app.websocket("/ws")
+    async def websocket_endpoint(websocket: WebSocket):
+        await websocket.accept()
+        service = FakeDebateService(turns, **service_options)
+        await DebateMultiplexer(websocket, service, DebateRequest, heartbeat_s=heartbeat_s).run()
+
+    return TestClient(app)
+
+
+def start(session, **extra):
+    return {"type": "start", "session": session, "request": {"claim": "Coffee is good for you"}, **extra}
+
+
+def assert_alive(ws):
+    ws.send_json({"type": "ping"})
+    assert ws.receive_json()["type"] == "pong"
+
+
+def receive_until_end(ws, session):
+    frames = []
+    while True:
+        frame = ws.receive_json()
+        if frame.get("session") == session:
+            frames.append(frame)
+            if frame["type"] == "session_end":
+                return frames
+
+
+def test_bad_window_is_reported_without_closing():
+    with make_client().websocket_connect("/ws") as ws:
+        for window in ("abc", 0, -1, 2.5, True):
+            ws.send_json(start("s1", window=window))
+            error = ws.receive_json()
+            assert error == {"type": "error", "session": "s1", "message": "window must be a positive integer"}
+        assert_alive(ws)
+
+
+def test_request_must_be_an_object():
+    with make_client().websocket_connect("/ws") as ws:
+        ws.send_json({"type": "start", "session": "s1", "request": ["claim"]})
+        assert ws.receive_json()["message"] == "request must be an object"
+        ws.send_json({"type": "start", "session": "s1", "request": {}})
+        error = ws.receive_json()
+        assert error["type"] == "error" and "claim" in error["message"]
+        assert_alive(ws)
+
+
+def test_bad_ack_credits_are_reported():
+    with make_client(turns=4).websocket_connect("/ws") as ws:
+        ws.send_json(start("s1", window=1))
+        assert ws.receive_json()["type"] == "start"
+        for credits in ("x", 0, -3, None):
+            ws.send_json({"type": "ack", "session": "s1", "credits": credits})
+            error = ws.receive_json()
+            assert error == {"type": "error", "session": "s1", "message": "credits must be a positive integer"}
+        ws.send_json({"type": "ack", "session": "s1", "credits": 10})
+        frames = receive_until_end(ws, "s1")
+        assert [frame["type"] for frame in frames] == ["turn"] * 4 + ["session_end"]
+        assert frames[-1]["status"] == "complete"
+
+
+def test_binary_and_malformed_frames_are_rejected():
+    with make_client().websocket_connect("/ws") as ws:
+        ws.send_bytes(b"\x00\x01")
+        assert ws.receive_json()["message"] == "Messages must be JSON text frames"
+        ws.send_text("not json")
+        assert ws.receive_json()["message"] == "Messages must be JSON"
+        ws.send_json(["start"])
+        assert ws.receive_json()["message"] == "Unknown message type: None"
+        ws.send_json({"type": "cancel", "session": ["s1"]})
+        assert ws.receive_json()["message"] == "Unknown session"
+        assert_alive(ws)
+
+
+def test_other_sessions_survive_bad_messages():
+    with make_client().websocket_connect("/ws") as ws:
+        ws.send_json(start("good"))
+        ws.send_json(start("bad", window="abc"))
+        ws.send_bytes(b"junk")
+        frames = receive_until_end(ws, "good")
+        assert frames[-1]["status"] == "complete"
+        assert len([frame for frame in frames if frame["type"] == "turn"]) == 3
+
+
+def test_sessions_take_turns():
+    with make_client(turns=5, together=3).websocket_connect("/ws") as ws:
+        for session in ("a", "b", "c"):
+            ws.send_json(start(session))
+        order = [ws.receive_json()["session"] for _ in range(3 * 7)]
+        # start, 5 turns and session_end each, one frame per session in turn
+        assert order == order[:3] * 7
+        assert sorted(order[:3]) == ["a", "b", "c"]
+
+
+def test_window_holds_frames_until_acked():
+    with make_client(turns=4).websocket_connect("/ws") as ws:
+        ws.send_json(start("s1", window=2))
+        assert [ws.receive_json()["type"] for _ in range(2)] == ["start", "turn"]
+        time.sleep(0.2)
+        assert_alive(ws)  # the pong is the next frame: nothing more was sent
+        ws.send_json({"type": "ack", "session": "s1", "credits": 1})
+        assert ws.receive_json()["index"] == 1
+        time.sleep(0.2)
+        assert_alive(ws)
+        ws.send_json({"type": "ack", "session": "s1"})  # defaults to a full window
+        frames = receive_until_end(ws, "s1")
+        assert [frame.get("index") for frame in frames] == [2, 3, None]
+        assert frames[-1]["status"] == "complete"
+
+
+def test_cancel_ends_the_session():
+    with make_client(turns=3, turn_delay=30).websocket_connect("/ws") as ws:
+        ws.send_json(start("slow"))
+        ws.send_json(start("fast", window=1))
+        assert ws.receive_json()["type"] == "start"
+        assert ws.receive_json()["type"] == "start"
+        ws.send_json({"type": "cancel", "session": "slow"})
+        end = ws.receive_json()
+        assert end == {"type": "session_end", "session": "slow", "debate_id": end["debate_id"], "status": "cancelled"}
+        ws.send_json({"type": "ping"})
+        assert ws.receive_json() == {"type": "pong", "sessions": 1}
+        ws.send_json({"type": "cancel", "session": "slow"})
+        assert ws.receive_json()["message"] == "Unknown session"
+
+
+def test_idle_connection_gets_heartbeats():
+    with make_client(turns=1, turn_delay=30, heartbeat_s=0.05).websocket_connect("/ws") as ws:
+        assert ws.receive_json() == {"type": "heartbeat", "sessions": 0}
+        ws.send_json(start("s1"))
+        assert ws.receive_json()["type"] == "start"
+        # The debate is quiet while its turn is generated; the connection isn't
+        assert ws.receive_json() == {"type": "heartbeat", "sessions": 1}
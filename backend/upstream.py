@@ -0,0 +1,489 @@
+"""
+Record/replay layer for the upstream services the backend calls
+
+Every call to Gemini, YouTube transcripts, SerpAPI, Brave, article pages, OpenAI
+embeddings and ElevenLabs goes through call(), call_async() or call_stream() (or,
+for Gemini, a model wrapped with wrap_model()). UPSTREAM_MODE picks what they do:
+
+    live    (default) call the service; the layer is a single comparison
+    record  call the service and append request, response and latency to
+            <UPSTREAM_FIXTURES>/<service>.jsonl
+    replay  never touch the network: answer from the fixtures, after a delay drawn
+            from the recorded latencies of that operation (or the profile below),
+            failing at the configured error rate. Requests with no fixture get a
+            synthetic response of the right shape, so unrecorded inputs still work.
+
+Replay tuning:
+    UPSTREAM_LATENCY_SCALE  multiplier on every delay; 0 disables delays (default 1)
+    UPSTREAM_ERROR_RATE     probability that any call fails with UpstreamError (default 0)
+    UPSTREAM_PROFILE        JSON file overriding per-service behaviour, e.g.
+                            {"gemini": {"median_s": 2.0, "p95_s": 8.0, "error_rate": 0.02}}
+                            A service with median_s set uses that lognormal instead of
+                            its recorded latencies.
+    UPSTREAM_SEED           seed for the delays, errors and synthetic content
+
+The replays are in-process stand-ins at the client boundary rather than local
+servers: Gemini is reached over gRPC and most other services through SDK clients
+that can't be pointed at another host.
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+from telemetry import Counter, metrics
+
+MODES = ("live", "record", "replay")
+MODE = os.getenv('UPSTREAM_MODE', 'live')
+if MODE not in MODES:
+    raise ValueError(f"UPSTREAM_MODE must be one of {', '.join(MODES)}, not '{MODE}'")
+
+FIXTURES_DIR = os.getenv('UPSTREAM_FIXTURES', os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'fixtures'))
+LATENCY_SCALE = float(os.getenv('UPSTREAM_LATENCY_SCALE', '1.0'))
+ERROR_RATE = float(os.getenv('UPSTREAM_ERROR_RATE', '0'))
+
+# Latency (lognormal median and p95, seconds) of operations with nothing recorded
+DEFAULT_PROFILES = {
+    "gemini": {"median_s": 1.5, "p95_s": 5.0},
+    "youtube": {"median_s": 0.6, "p95_s": 1.5},
+    "serpapi": {"median_s": 0.8, "p95_s": 2.0},
+    "brave": {"median_s": 0.4, "p95_s": 1.0},
+    "web": {"median_s": 0.8, "p95_s": 3.0},
+    "openai": {"median_s": 0.25, "p95_s": 0.6},
+    "elevenlabs": {"median_s": 0.8, "p95_s": 2.0},
+}
+
+_profile_path = os.getenv('UPSTREAM_PROFILE')
+PROFILES = {}
+if _profile_path:
+    with open(_profile_path, encoding='utf-8') as handle:
+        PROFILES = json.load(handle)
+
+_rng = random.Random(os.getenv('UPSTREAM_SEED'))
+_rng_lock = threading.Lock()
+
+replays = metrics.register(Counter(
+    "upstream_replays_total", "Replayed upstream calls by result (fixture, synthetic, error)",
+    ("service", "operation", "result")))
+
+
+class UpstreamError(Exception):
+    """A replayed upstream failure (recorded, or injected at the configured error rate)"""
+
+
+def fixture_key(operation, request):
+    material = json.dumps([operation, request], sort_keys=True, default=str)
+    return hashlib.sha1(material.encode('utf-8')).hexdigest()
+
+
+class FixtureStore:
+    """Recorded calls, one JSONL file per service, loaded on first use"""
+
+    def __init__(self, directory=FIXTURES_DIR):
+        self.directory = directory
+        self._records = {}
+        self._latencies = {}
+        self._lock = threading.Lock()
+
+    def _path(self, service):
+        return os.path.join(self.directory, f"{service}.jsonl")
+
+    def _load(self, service):
+        if service in self._records:
+            return
+        records, latencies = {}, {}
+        path = self._path(service)
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as handle:
+                for line in handle:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    records[record["key"]] = record
+                    latencies.setdefault(record["operation"], []).append(record["latency_s"])
+        self._records[service] = records
+        self._latencies[service] = latencies
+
+    def get(self, service, key):
+        with self._lock:
+            self._load(service)
+            return self._records[service].get(key)
+
+    def latencies(self, service, operation):
+        with self._lock:
+            self._load(service)
+            return self._latencies[service].get(operation, [])
+
+    def requests(self, service, operation):
+        """Recorded requests for an operation, e.g. the video IDs a benchmark can replay"""
+        with self._lock:
+            self._load(service)
+            return [record["request"] for record in self._records[service].values()
+                    if record["operation"] == operation and "error" not in record]
+
+    def append(self, service, operation, request, latency_s, response=None, error=None, **extra):
+        record = {"operation": operation, "key": fixture_key(operation, request), "request": request,
+                  "latency_s": round(latency_s, 4), **extra}
+        if error is not None:
+            record["error"] = error
+        else:
+            record["response"] = response
+        line = json.dumps(record, default=str)
+        with self._lock:
+            self._load(service)
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(service), "a", encoding='utf-8') as handle:
+                handle.write(line + "\n")
+            self._records[service][record["key"]] = record
+            self._latencies[service].setdefault(operation, []).append(record["latency_s"])
+
+
+fixtures = FixtureStore()
+
+
+# Replay behaviour
+
+def _profile(service):
+    return {**DEFAULT_PROFILES.get(service, {}), **PROFILES.get(service, {})}
+
+
+def replay_latency(service, operation):
+    """Delay for one replayed call: the configured distribution, else a recorded latency"""
+    profile = _profile(service)
+    recorded = fixtures.latencies(service, operation)
+    with _rng_lock:
+        if recorded and "median_s" not in PROFILES.get(service, {}):
+            latency = _rng.choice(recorded)
+        else:
+            mu = math.log(profile.get("median_s", 0.5))
+            sigma = max(math.log(profile.get("p95_s", 1.0)) - mu, 0.0) / 1.645
+            latency = _rng.lognormvariate(mu, sigma)
+    return latency * LATENCY_SCALE
+
+
+def _should_fail(service):
+    rate = _profile(service).get("error_rate", ERROR_RATE)
+    if not rate:
+        return False
+    with _rng_lock:
+        return _rng.random() < rate
+
+
+def _replay(service, operation, request, synthesize):
+    """Response data for a replayed call, or UpstreamError"""
+    if _should_fail(service):
+        replays.inc(service=service, operation=operation, result="error")
+        raise UpstreamError(f"Injected {service} {operation} failure")
+    record = fixtures.get(service, fixture_key(operation, request))
+    if record is not None and "error" in record:
+        replays.inc(service=service, operation=operation, result="error")
+        raise UpstreamError(record["error"])
+    if record is not None:
+        replays.inc(service=service, operation=operation, result="fixture")
+        return record
+    if synthesize is None:
+        raise UpstreamError(f"No {service} fixture for {operation} {request}")
+    replays.inc(service=service, operation=operation, result="synthetic")
+    return {"response": synthesize(request, _seeded(request)), "synthetic": True}
+
+
+def _seeded(request):
+    """Random source for synthetic content, stable for a given request"""
+    return random.Random(fixture_key("synthetic", request))
+
+
+def _identity(value):
+    return value
+
+
+def call(service, operation, request, live, encode=_identity, decode=_identity, synthesize=None):
+    """
+    Run live() through the record/replay layer
+
+    request is the JSON-serializable part of the call that identifies its response;
+    encode turns live()'s result into JSON data for the fixture and decode turns
+    fixture data back into what live() would have returned.
+    """
+    if MODE == "live":
+        return live()
+    if MODE == "record":
+        started = time.perf_counter()
+        try:
+            result = live()
+        except Exception as e:
+            fixtures.append(service, operation, request, time.perf_counter() - started, error=str(e))
+            raise
+        fixtures.append(service, operation, request, time.perf_counter() - started, encode(result))
+        return result
+    time.sleep(replay_latency(service, operation))
+    return decode(_replay(service, operation, request, synthesize)["response"])
+
+
+async def call_async(service, operation, request, live, encode=_identity, decode=_identity, synthesize=None):
+    """call() for a coroutine function live"""
+    if MODE == "live":
+        return await live()
+    if MODE == "record":
+        started = time.perf_counter()
+        try:
+            result = await live()
+        except Exception as e:
+            fixtures.append(service, operation, request, time.perf_counter() - started, error=str(e))
+            raise
+        fixtures.append(service, operation, request, time.perf_counter() - started, encode(result))
+        return result
+    await asyncio.sleep(replay_latency(service, operation))
+    return decode(_replay(service, operation, request, synthesize)["response"])
+
+
+def call_stream(service, operation, request, live, synthesize=None, chunk_size=4096):
+    """call() for a live() returning an iterator of bytes; recorded whole, replayed in chunks"""
+    if MODE == "live":
+        yield from live()
+        return
+    if MODE == "record":
+        started = time.perf_counter()
+        chunks = []
+        try:
+            for chunk in live():
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            fixtures.append(service, operation, request, time.perf_counter() - started, error=str(e))
+            raise
+        fixtures.append(service, operation, request, time.perf_counter() - started,
+                        base64.b64encode(b"".join(chunks)).decode('ascii'))
+        return
+    time.sleep(replay_latency(service, operation))
+    data = base64.b64decode(_replay(service, operation, request, synthesize)["response"])
+    for start in range(0, len(data), chunk_size):
+        yield data[start:start + chunk_size]
+
+
+# Gemini
+
+class ReplayedResponse:
+    """What GenerativeModel returns, rebuilt from a fixture: text, usage and streamed chunks"""
+
+    def __init__(self, data, delays=None):
+        self.text = data["text"]
+        self.usage_metadata = SimpleNamespace(**data.get("usage", {}))
+        self._chunks = data.get("chunks") or [self.text]
+        self._delays = delays
+
+    def __aiter__(self):
+        return self._stream()
+
+    async def _stream(self):
+        for i, chunk in enumerate(self._chunks):
+            if self._delays:
+                await asyncio.sleep(self._delays[i])
+            yield SimpleNamespace(text=chunk)
+
+
+def _usage_data(response):
+    usage = getattr(response, "usage_metadata", None)
+    return {name: getattr(usage, name, 0) or 0
+            for name in ("prompt_token_count", "candidates_token_count", "thoughts_token_count")}
+
+
+def _llm_request(model_name, prompt, kwargs):
+    return {"model": model_name, "prompt": prompt, "config": kwargs.get("generation_config")}
+
+
+def synthetic_llm(request, rng):
+    """A response shaped for the prompt: a fact-check array, search terms or prose"""
+    prompt = request["prompt"]
+    words = ["evidence", "policy", "study", "report", "claim", "data", "experts", "analysis",
+             "source", "context", "trend", "impact", "survey", "record", "figures"]
+
+    def sentence():
+        body = " ".join(rng.choice(words) for _ in range(rng.randint(8, 16)))
+        return body.capitalize() + "."
+
+    if "JSON array" in prompt:
+        text = json.dumps([{
+            "id": f"synthetic_{i}",
+            "timestamp": 30 * i,
+            "content": sentence(),
+            "factuality_classification": rng.choice(["correct", "mostly correct", "misleading", "unverifiable"]),
+            "context_omission": rng.choice(["none", "minor", "major"]),
+            "emotional_language": rng.choice(["none", "mild", "strong"]),
+            "emotional_tone": rng.choice(["neutral", "positive", "negative", "mixed"]),
+            "reasoning_and_sources": sentence(),
+            "duration": rng.randint(5, 20),
+            "url": f"https://www.google.com/search?q=synthetic+claim+{i}"
+        } for i in range(rng.randint(3, 8))])
+    elif "search terms" in prompt:
+        text = ", ".join(" ".join(rng.choice(words) for _ in range(3)) for _ in range(3))
+    else:
+        max_tokens = (request.get("config") or {}).get("max_output_tokens") or 400
+        text = " ".join(sentence() for _ in range(max(2, min(max_tokens, 600) // 20)))
+    return {"text": text, "chunks": [text[i:i + 80] for i in range(0, len(text), 80)],
+            "usage": {"prompt_token_count": max(1, len(prompt) // 4),
+                      "candidates_token_count": max(1, len(text) // 4),
+                      "thoughts_token_count": 0}}
+
+
+class _RecordingStream:
+    """Pass a live stream through, recording its chunks and timing once it is exhausted"""
+
+    def __init__(self, response, request, started):
+        self._response = response
+        self._request = request
+        self._started = started
+
+    def __getattr__(self, name):
+        return getattr(self._response, name)
+
+    def __aiter__(self):
+        return self._stream()
+
+    async def _stream(self):
+        chunks = []
+        first_token_s = None
+        async for chunk in self._response:
+            try:
+                text = chunk.text
+            except ValueError:
+                text = ""
+            if text:
+                if first_token_s is None:
+                    first_token_s = time.perf_counter() - self._started
+                chunks.append(text)
+            yield chunk
+        fixtures.append("gemini", "stream", self._request, time.perf_counter() - self._started,
+                        {"text": "".join(chunks), "chunks": chunks, "usage": _usage_data(self._response)},
+                        first_token_s=round(first_token_s or 0.0, 4))
+
+
+class UpstreamModel:
+    """A GenerativeModel whose calls go through the record/replay layer"""
+
+    def __init__(self, model):
+        self._model = model
+        self.model_name = model.model_name
+
+    def __getattr__(self, name):
+        return getattr(self._model, name)
+
+    def _encode(self, response):
+        return {"text": response.text, "usage": _usage_data(response)}
+
+    def generate_content(self, prompt, **kwargs):
+        return call("gemini", "generate", _llm_request(self.model_name, prompt, kwargs),
+                    lambda: self._model.generate_content(prompt, **kwargs),
+                    encode=self._encode, decode=ReplayedResponse, synthesize=synthetic_llm)
+
+    async def generate_content_async(self, prompt, stream=False, **kwargs):
+        request = _llm_request(self.model_name, prompt, kwargs)
+        if not stream:
+            return await call_async("gemini", "generate", request,
+                                    lambda: self._model.generate_content_async(prompt, **kwargs),
+                                    encode=self._encode, decode=ReplayedResponse, synthesize=synthetic_llm)
+        if MODE == "record":
+            started = time.perf_counter()
+            response = await self._model.generate_content_async(prompt, stream=True, **kwargs)
+            return _RecordingStream(response, request, started)
+
+        # Replay: the first chunk after a time-to-first-token delay, the rest spread over the remainder
+        total_s = replay_latency("gemini", "stream")
+        record = _replay("gemini", "stream", request, synthetic_llm)
+        recorded_first = record.get("first_token_s")
+        share = recorded_first / record["latency_s"] if recorded_first and record.get("latency_s") else 0.3
+        data = record["response"]
+        chunks = data.get("chunks") or [data["text"]]
+        first_s = total_s * share
+        delays = [first_s] + [(total_s - first_s) / max(len(chunks) - 1, 1)] * (len(chunks) - 1)
+        return ReplayedResponse(data, delays)
+
+
+def wrap_model(model):
+    """Route a GenerativeModel's calls through the record/replay layer (a no-op when live)"""
+    return model if MODE == "live" else UpstreamModel(model)
+
+
+# Other services
+
+class ReplayedTranscript:
+    """Stands in for youtube_transcript_api's FetchedTranscript"""
+
+    def __init__(self, snippets):
+        self.snippets = snippets
+
+    def to_raw_data(self):
+        return self.snippets
+
+
+def synthetic_transcript(request, rng):
+    words = ["so", "today", "we", "look", "at", "the", "numbers", "and", "what", "people", "say",
+             "about", "this", "issue", "because", "it", "matters", "a", "lot", "more", "than", "you", "think"]
+    snippets = []
+    start = 0.0
+    for _ in range(rng.randint(120, 240)):
+        duration = round(rng.uniform(1.5, 5.0), 2)
+        snippets.append({"text": " ".join(rng.choice(words) for _ in range(rng.randint(5, 12))),
+                         "start": round(start, 2), "duration": duration})
+        start += duration
+    return snippets
+
+
+def synthetic_search_results(request, rng):
+    query = str(request.get("q", "query"))
+    slug = "-".join(query.lower().split())[:60] or "result"
+    return [{"link": f"https://example.com/{slug}/{i}", "title": f"{query.title()} ({i + 1})",
+             "displayed_link": "example.com", "snippet": f"Coverage of {query} from a synthetic source."}
+            for i in range(3)]
+
+
+def synthetic_serpapi(request, rng):
+    return {"organic_results": synthetic_search_results(request, rng)}
+
+
+def synthetic_brave(request, rng):
+    return {"query": {"original": request.get("q")},
+            "web": {"results": [{"title": result["title"], "url": result["link"], "description": result["snippet"]}
+                                for result in synthetic_search_results(request, rng)]}}
+
+
+def synthetic_page(request, rng):
+    words = ["the", "council", "voted", "on", "new", "measures", "after", "months", "of", "debate", "over",
+             "costs", "and", "benefits", "critics", "argued", "supporters", "said", "residents", "would"]
+    paragraphs = "".join(
+        "<p>" + " ".join(rng.choice(words) for _ in range(rng.randint(40, 90))).capitalize() + ".</p>"
+        for _ in range(rng.randint(6, 14)))
+    return (f"<html><head><title>{request['url']}</title></head><body><article>"
+            f"<h1>Synthetic article</h1>{paragraphs}</article></body></html>")
+
+
+EMBEDDING_DIMENSIONS = {"text-embedding-3-small": 1536, "text-embedding-3-large": 3072}
+
+
+def synthetic_embeddings(request, rng):
+    """Unit vectors seeded by each text, so equal texts embed equally"""
+    dimension = EMBEDDING_DIMENSIONS.get(request.get("model"), 1536)
+    vectors = []
+    for text in request["texts"]:
+        text_rng = random.Random(fixture_key("embedding", text))
+        vector = [text_rng.gauss(0.0, 1.0) for _ in range(dimension)]
+        norm = math.sqrt(sum(value * value for value in vector)) or 1.0
+        vectors.append([value / norm for value in vector])
+    return vectors
+
+
+# One silent 128 kbps, 44.1 kHz MPEG-1 layer III frame (~26 ms)
+_SILENT_MP3_FRAME = b"\xff\xfb\x90\x64" + b"\x00" * 413
+
+
+def synthetic_speech(request, rng):
+    """Silent MP3 about as long as the text would take to read"""
+    seconds = max(len(request.get("text", "")) / 15.0, 0.5)
+    return base64.b64encode(_SILENT_MP3_FRAME * min(int(seconds / 0.026), 4000)).decode('ascii')
@@ -1,14 +1,11 @@
-import sys
 import os
-import yt_dlp
-from youtube_transcript_api import YouTubeTranscriptApi
-import google.generativeai as genai
 from dotenv import load_dotenv
 import re
 import json
-import trafilatura
-import requests
-from serpapi import GoogleSearch
+
+# Client libraries (Gemini, trafilatura, requests, SerpAPI) are imported where they are
+# first used, so importing the router stays cheap. heavy_import keeps those first
+# imports from racing the warm-up factories and background tasks
 
 # BRAVE_KEY = os.getenv('BRAVE_API')
 # BASE_URL = os.getenv('BASE_URL')
@@ -16,8 +13,12 @@ from serpapi import GoogleSearch
 
 BRAVE_KEY="BSAcXlD8dkCTJhhNQQe87Z76DyCZzQb"
 BASE_URL="https://api.search.brave.com/res/v1/web/search"
-from fastapi import APIRouter
+from fastapi import APIRouter, BackgroundTasks
 from pydantic import BaseModel, ConfigDict
+from telemetry import span, timed
+from llm_accounting import generate
+from lifecycle import heavy_import
+import upstream
 
 router = APIRouter()
 load_dotenv()
@@ -47,14 +48,19 @@ def setup_gemini(api_key=None):
     if not api_key:
         raise ValueError("Gemini API key not found. Please set GEMINI_API_KEY environment variable or pass api_key parameter.")
     
+    genai = heavy_import("google.generativeai")
     genai.configure(api_key=api_key)
-    return genai.GenerativeModel('gemini-2.5-flash')
+    return upstream.wrap_model(genai.GenerativeModel('gemini-2.5-flash'))
 
 
 
 def get_article_raw(url):
-    dl = trafilatura.fetch_url(url)
-    return trafilatura.extract(dl, url, favor_precision=True)
+    trafilatura = heavy_import("trafilatura")
+    with span("article_fetch"):
+        dl = upstream.call("web", "fetch_url", {"url": url}, lambda: trafilatura.fetch_url(url),
+                           synthesize=upstream.synthetic_page)
+    with span("article_extract"):
+        return trafilatura.extract(dl, url, favor_precision=True)
 
 
 @router.get("/urls")
@@ -71,8 +77,11 @@ def get_news_articles(query: str, count=4):
         "search_lang": "en"
     }
 
-    response = requests.get(BASE_URL, headers=headers, params=params)
-    return response.json()
+    def fetch():
+        requests = heavy_import("requests")
+        return requests.get(BASE_URL, headers=headers, params=params).json()
+
+    return upstream.call("brave", "search", params, fetch, synthesize=upstream.synthetic_brave)
     articles = []
     if 'results' in data:
         for result in data['results']:
@@ -100,7 +109,7 @@ def create_summary(transcript_text, model=None, api_key=None):
     
     try:
         print("\nGenerating summary with Gemini...")
-        response = model.generate_content(prompt)
+        response = generate(model, prompt, "summary", cache=True)
         return response.text
     except Exception as e:
         print(f"Error generating summary: {e}")
@@ -131,7 +140,7 @@ def generate_alternate_links(article_text, article_title=None, model=None, api_k
         """
         
         print("\nAnalyzing bias and finding opposing perspectives...")
-        response = model.generate_content(bias_prompt)
+        response = generate(model, bias_prompt, "alternate_links", cache=True)
         search_terms = response.text.strip().replace('\n', ', ')
         print(f"Opposing search terms: {search_terms}")
         
@@ -150,22 +159,27 @@ def generate_alternate_links(article_text, article_title=None, model=None, api_k
         print(f"Error generating alternate links: {e}")
         return []
 
+@timed("search_web")
 def search_web(query):
     """Search the web using SerpAPI with fallback"""
     try:
         serpapi_key = os.getenv('SERPAPI_API_KEY')
-        if not serpapi_key:
+        if not serpapi_key and upstream.MODE != "replay":
             print("No SerpAPI key found, using fallback")
             return create_fallback_results(query)
         
         print(f"Searching for: {query}")
-        search = GoogleSearch({
-            "q": query,
-            "api_key": serpapi_key,
-            "num": 3  # Get 3 results
-        })
-        
-        results = search.get_dict()
+        def fetch():
+            GoogleSearch = heavy_import("serpapi").GoogleSearch
+            search = GoogleSearch({
+                "q": query,
+                "api_key": serpapi_key,
+                "num": 3  # Get 3 results
+            })
+            return search.get_dict()
+
+        results = upstream.call("serpapi", "search", {"q": query, "num": 3}, fetch,
+                                synthesize=upstream.synthetic_serpapi)
         
         # Check for API errors
         if "error" in results:
@@ -232,8 +246,18 @@ def create_fallback_results(query):
     
 
 
+def index_article_content(url, article_text, summary_text=None):
+    """Queue an article's text (and summary) for indexing into the debate evidence store"""
+    index_in_background = heavy_import("agents_debate.ingestion").index_in_background
+
+    documents = [(article_text, {"source": url, "type": "article"})]
+    if summary_text:
+        documents.append((summary_text, {"source": url, "type": "summary"}))
+    index_in_background(documents)
+
+
 @router.get("/alternative")
-def get_alternative_articles(url: str):
+def get_alternative_articles(url: str, background_tasks: BackgroundTasks):
     """
     Get alternative articles based on article URL.
     """
@@ -256,6 +280,9 @@ def get_alternative_articles(url: str):
         
         # Generate alternative links using web search
         alternate_links = generate_alternate_links(payload)
+
+        # Index article text and summary for debate evidence after the response is sent
+        background_tasks.add_task(index_article_content, url, payload, summary)
         
         return {
             "summary": summary or "Summary not available",
@@ -269,5 +296,29 @@ def get_alternative_articles(url: str):
         }
 
 
+@router.get("/sentiment")
+def get_article_sentiment(url: str, window: int = 5, method: str = "weighted", encoding: str = "json"):
+    """
+    Return a per-sentence sentiment curve with rolling aggregates for an article.
+    """
+    sentiment = heavy_import(".sentiment", __package__)
+
+    try:
+        print(f"Scoring sentiment for article: {url}")
 
+        payload = get_article_raw(url=url)
+
+        if not payload:
+            return {"error": "Could not extract article content", "url": url}
 
+        curve = sentiment.sentiment_timeseries(
+            texts=sentiment.split_sentences(payload),
+            window=window,
+            method=method,
+            encoding=encoding
+        )
+        curve["url"] = url
+        return curve
+    except Exception as e:
+        print(f"Error in get_article_sentiment: {str(e)}")
+        return {"error": f"Error scoring article sentiment: {str(e)}", "url": url}
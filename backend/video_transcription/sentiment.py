@@ -1,18 +1,30 @@
 import gensim.downloader as api
 import numpy as np
 from scipy.spatial.distance import cosine
+from collections import OrderedDict
+import base64
+import hashlib
+import json
+import re
+import threading
 
 class Word2VecSentimentScorer:
     """Score sentences for positive/negative sentiment using Word2Vec"""
     
-    def __init__(self, model_name='glove-twitter-25'):
+    def __init__(self, model_name='glove-twitter-25', keyed_vectors=None):
         """
         Initialize with pretrained Word2Vec model
         Options: 'word2vec-google-news-300', 'glove-twitter-25', 'glove-wiki-gigaword-300'
+
+        Pass keyed_vectors to reuse an already loaded (e.g. memory-mapped) model
+        instead of loading model_name through gensim's downloader.
         """
-        print(f"Loading pretrained model: {model_name}...")
-        self.model = api.load(model_name)
-        print("Model loaded successfully!")
+        if keyed_vectors is not None:
+            self.model = keyed_vectors
+        else:
+            print(f"Loading pretrained model: {model_name}...")
+            self.model = api.load(model_name)
+            print("Model loaded successfully!")
         
         # Positive tone (hopeful, constructive, favorable)
         positive_seeds = [
@@ -169,6 +181,225 @@ class Word2VecSentimentScorer:
             results.append(self.analyze(sentence, method))
         return results
 
+    def _tokenize_batch(self, sentences):
+        """
+        Map every in-vocabulary word of every sentence to its row in the model
+
+        Returns the flat row indices plus per-sentence [start, end) offsets into them
+        """
+        key_to_index = self.model.key_to_index
+        rows = []
+        offsets = np.zeros(len(sentences) + 1, dtype=np.int64)
+        for i, sentence in enumerate(sentences):
+            for word in sentence.lower().split():
+                index = key_to_index.get(word)
+                if index is not None:
+                    rows.append(index)
+            offsets[i + 1] = len(rows)
+        return np.asarray(rows, dtype=np.int64), offsets
+
+    def score_batch(self, sentences, method='weighted'):
+        """
+        Vectorized equivalent of analyze()['score'] for a list of sentences
+
+        Word vectors are gathered once and reduced per sentence with cumulative sums,
+        so the cost is a handful of matrix operations instead of one Python loop
+        (and one scipy call) per word.
+
+        Returns:
+            float64 array of scores, NaN where the reference methods produce NaN
+            (sentences with no in-vocabulary words under similarity/projection)
+        """
+        rows, offsets = self._tokenize_batch(sentences)
+        counts = np.diff(offsets)
+        word_vectors = self.model.vectors[rows].astype(np.float64)
+
+        # Segment sums via cumulative sums: sum(rows[a:b]) = cs[b] - cs[a]
+        cumulative = np.zeros((len(rows) + 1, self.model.vector_size))
+        np.cumsum(word_vectors, axis=0, out=cumulative[1:])
+        sums = cumulative[offsets[1:]] - cumulative[offsets[:-1]]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            sentence_vectors = sums / counts[:, None]
+        sentence_vectors[counts == 0] = 0.0
+
+        positive = self.positive_vector.astype(np.float64)
+        negative = self.negative_vector.astype(np.float64)
+
+        def seed_scores(vectors):
+            norms = np.linalg.norm(vectors, axis=1)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                pos_sim = vectors @ positive / (norms * np.linalg.norm(positive))
+                neg_sim = vectors @ negative / (norms * np.linalg.norm(negative))
+            return (pos_sim - neg_sim) / (pos_sim + neg_sim + 1e-8)
+
+        def similarity():
+            return seed_scores(sentence_vectors)
+
+        def projection():
+            axis = positive - negative
+            axis = axis / (np.linalg.norm(axis) + 1e-8)
+            return np.tanh(sentence_vectors @ axis)
+
+        def individual():
+            # Score each distinct word once, then average per sentence
+            unique_rows, inverse = np.unique(rows, return_inverse=True)
+            unique_scores = seed_scores(self.model.vectors[unique_rows].astype(np.float64))
+            word_cumulative = np.zeros(len(rows) + 1)
+            np.cumsum(unique_scores[inverse], out=word_cumulative[1:])
+            word_sums = word_cumulative[offsets[1:]] - word_cumulative[offsets[:-1]]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                scores = word_sums / counts
+            scores[counts == 0] = 0.0
+            return scores
+
+        if method == 'similarity':
+            return similarity()
+        elif method == 'projection':
+            return projection()
+        elif method == 'individual':
+            return individual()
+        else:  # weighted
+            return 0.4 * similarity() + 0.3 * projection() + 0.3 * individual()
+
+
+_scorers = {}
+_scorers_lock = threading.Lock()
+
+
+def get_scorer(model_name='glove-twitter-25'):
+    """Return a shared scorer, loading the pretrained model on first use"""
+    with _scorers_lock:
+        if model_name not in _scorers:
+            _scorers[model_name] = Word2VecSentimentScorer(model_name)
+        return _scorers[model_name]
+
+
+def split_sentences(text):
+    """Split article text into sentences for per-snippet scoring"""
+    sentences = re.split(r'(?<=[.!?])\s+|\n+', text or '')
+    return [sentence.strip() for sentence in sentences if sentence.strip()]
+
+
+def rolling_aggregates(scores, window=5, spike_threshold=2.0):
+    """
+    Trailing rolling mean/variance and spike detection over a score series
+
+    All windows are computed from cumulative sums of x and x^2, so the cost is O(n)
+    regardless of window size. A point is a spike when it deviates from the mean of
+    the preceding window by more than spike_threshold standard deviations of that window.
+
+    Returns:
+        (rolling_mean, rolling_var, spike_indices)
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    n = len(scores)
+    window = max(1, int(window))
+
+    cumulative = np.zeros(n + 1)
+    cumulative_sq = np.zeros(n + 1)
+    np.cumsum(scores, out=cumulative[1:])
+    np.cumsum(scores * scores, out=cumulative_sq[1:])
+
+    def window_stats(starts, ends):
+        sizes = np.maximum(ends - starts, 1)
+        mean = (cumulative[ends] - cumulative[starts]) / sizes
+        mean_sq = (cumulative_sq[ends] - cumulative_sq[starts]) / sizes
+        return mean, np.maximum(mean_sq - mean * mean, 0.0)
+
+    index = np.arange(n)
+
+    # Window ending at (and including) each point
+    rolling_mean, rolling_var = window_stats(np.maximum(index - window + 1, 0), index + 1)
+
+    # Window immediately preceding each point
+    prev_starts = np.maximum(index - window, 0)
+    prev_mean, prev_var = window_stats(prev_starts, index)
+    prev_std = np.sqrt(prev_var)
+    has_history = (index - prev_starts) >= 2
+    deviation = np.abs(scores - prev_mean)
+    # Floor the std so a flat stretch followed by small jitter is not flagged
+    spikes = np.flatnonzero(has_history & (deviation > spike_threshold * np.maximum(prev_std, 0.05)))
+
+    return rolling_mean, rolling_var, spikes
+
+
+def _encode_series(values, dtype, encoding):
+    """Pack a numeric series as a base64 little-endian typed array or a plain list"""
+    array = np.ascontiguousarray(values, dtype=np.dtype(dtype).newbyteorder('<'))
+    if encoding == 'base64':
+        return base64.b64encode(array.tobytes()).decode('ascii')
+    if array.dtype.kind == 'f':
+        return np.round(array.astype(np.float64), 4).tolist()
+    return array.tolist()
+
+
+_timeseries_cache = OrderedDict()
+_timeseries_cache_lock = threading.Lock()
+TIMESERIES_CACHE_SIZE = 256
+
+
+def sentiment_timeseries(texts, starts=None, durations=None, window=5, method='weighted',
+                         spike_threshold=2.0, encoding='json', model_name='glove-twitter-25'):
+    """
+    Build a per-snippet sentiment curve with rolling aggregates
+
+    Args:
+        texts: snippet texts in playback/reading order
+        starts: optional snippet start times in seconds (defaults to the snippet index)
+        durations: optional snippet durations in seconds
+        window: rolling window size in snippets
+        method: 'similarity', 'projection', 'individual', or 'weighted'
+        encoding: 'json' for plain number lists, 'base64' for little-endian typed arrays
+            (float32 series, int32 spike indices) that map directly onto JS TypedArrays
+
+    Results are cached per content hash, so repeated requests for the same video or
+    article skip scoring entirely.
+    """
+    if starts is None:
+        starts = range(len(texts))
+    if durations is None:
+        durations = [0.0] * len(texts)
+
+    content_hash = hashlib.sha256(json.dumps(
+        [list(texts), list(starts), list(durations), window, method, spike_threshold, model_name]
+    ).encode('utf-8')).hexdigest()
+
+    with _timeseries_cache_lock:
+        curve = _timeseries_cache.get(content_hash)
+        if curve is not None:
+            _timeseries_cache.move_to_end(content_hash)
+
+    if curve is None:
+        scores = get_scorer(model_name).score_batch(list(texts), method) if texts else np.zeros(0)
+        # Snippets with no known words carry no tone information
+        scores = np.nan_to_num(scores, nan=0.0)
+        rolling_mean, rolling_var, spikes = rolling_aggregates(scores, window, spike_threshold)
+        curve = {
+            "start": np.asarray(starts, dtype=np.float64),
+            "duration": np.asarray(durations, dtype=np.float64),
+            "score": scores,
+            "rolling_mean": rolling_mean,
+            "rolling_var": rolling_var,
+            "spikes": spikes,
+        }
+        with _timeseries_cache_lock:
+            _timeseries_cache[content_hash] = curve
+            while len(_timeseries_cache) > TIMESERIES_CACHE_SIZE:
+                _timeseries_cache.popitem(last=False)
+
+    return {
+        "content_hash": content_hash,
+        "method": method,
+        "window": window,
+        "count": len(curve["score"]),
+        "encoding": encoding,
+        "series": {
+            name: _encode_series(curve[name], 'float32', encoding)
+            for name in ("start", "duration", "score", "rolling_mean", "rolling_var")
+        },
+        "spikes": _encode_series(curve["spikes"], 'int32', encoding),
+    }
+
 
 # Example usage
 if __name__ == "__main__":
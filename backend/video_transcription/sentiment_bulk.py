@@ -0,0 +1,286 @@
+"""
+Bulk sentiment scoring for archived transcripts and articles
+
+Usage:
+    python -m video_transcription.sentiment_bulk sentences.jsonl scores/ --workers 8
+
+The embedding matrix is exported once to a gensim .kv file and every worker process
+opens it with mmap='r', so all workers share the same page-cache copy of the vectors
+instead of each holding its own. Input is streamed in fixed-size chunks with a bounded
+number of chunks in flight, and each scored chunk is written straight to its own
+columnar part file, so memory stays flat no matter how large the corpus is.
+"""
+import argparse
+import gc
+import glob
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+from gensim.models import KeyedVectors
+
+DEFAULT_MODEL_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "htv10", "sentiment")
+
+# Per-process scorer, attached to the memory-mapped vectors by _init_worker
+_worker_scorer = None
+
+
+def export_model(model_name, cache_dir=DEFAULT_MODEL_CACHE):
+    """
+    Save the pretrained model as a gensim .kv file with its vectors in a separate .npy
+
+    Returns the .kv path. The export is skipped when it already exists.
+    """
+    import gensim.downloader as api
+
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"{model_name}.kv")
+    if os.path.exists(path):
+        return path
+
+    print(f"Exporting {model_name} for memory-mapped loading...")
+    model = api.load(model_name)
+    # sep_limit=0 forces the vectors into their own .npy file so they can be mmapped
+    model.save(path, sep_limit=0)
+    del model
+    gc.collect()
+    print(f"Exported model to {path}")
+    return path
+
+
+def _init_worker(model_path, model_name):
+    """Attach this worker to the shared, read-only embedding matrix"""
+    global _worker_scorer
+    from .sentiment import Word2VecSentimentScorer
+
+    keyed_vectors = KeyedVectors.load(model_path, mmap='r')
+    _worker_scorer = Word2VecSentimentScorer(model_name, keyed_vectors=keyed_vectors)
+
+
+def _score_chunk(chunk_index, first_row, texts, method):
+    """Score one chunk in a worker process and return its columns"""
+    scores = _worker_scorer.score_batch(texts, method)
+
+    # Same thresholds as Word2VecSentimentScorer.analyze
+    labels = np.zeros(len(scores), dtype=np.int8)
+    labels[scores > 0.2] = 1
+    labels[scores < -0.2] = -1
+
+    return chunk_index, {
+        "row": np.arange(first_row, first_row + len(texts), dtype=np.int64),
+        "score": scores.astype(np.float32),
+        "label": labels,
+    }
+
+
+def iter_chunks(path, chunk_size=10000, text_field="text", id_field="id"):
+    """
+    Stream (chunk_index, first_row, texts, ids) from a JSONL or plain-text file
+
+    JSONL lines contribute record[text_field] (and record[id_field] when present);
+    any other file is read as one sentence per non-empty line.
+    """
+    is_jsonl = path.endswith((".jsonl", ".ndjson"))
+    chunk_index = 0
+    first_row = 0
+    texts, ids = [], []
+
+    with open(path, encoding="utf-8") as handle:
+        for line in handle:
+            line = line.strip()
+            if not line:
+                continue
+            if is_jsonl:
+                record = json.loads(line)
+                texts.append(str(record.get(text_field, "")))
+                ids.append(str(record.get(id_field, first_row + len(texts) - 1)))
+            else:
+                texts.append(line)
+                ids.append(str(first_row + len(texts) - 1))
+
+            if len(texts) >= chunk_size:
+                yield chunk_index, first_row, texts, ids
+                chunk_index += 1
+                first_row += len(texts)
+                texts, ids = [], []
+
+    if texts:
+        yield chunk_index, first_row, texts, ids
+
+
+def _part_path(output_dir, chunk_index):
+    return os.path.join(output_dir, f"part-{chunk_index:06d}.npz")
+
+
+def _part_paths(output_dir):
+    return sorted(glob.glob(os.path.join(output_dir, "part-*.npz")))
+
+
+# Settings that decide which rows land in which part and how they are scored; a
+# resumed run must match the run that wrote the existing parts
+RESUME_SETTINGS = ("input", "model", "method", "chunk_size", "text_field", "id_field")
+
+
+def _check_resumable(output_dir, settings):
+    """Raise ValueError if the parts already in output_dir came from different settings"""
+    if not _part_paths(output_dir):
+        return
+    manifest_path = os.path.join(output_dir, "manifest.json")
+    if not os.path.exists(manifest_path):
+        raise ValueError(f"{output_dir} has part files but no manifest.json, so they can't be resumed safely; "
+                         f"rerun with --no-resume to rescore from scratch")
+    with open(manifest_path, encoding="utf-8") as handle:
+        manifest = json.load(handle)
+    mismatched = [f"{key} {manifest.get(key)!r} -> {settings[key]!r}"
+                  for key in RESUME_SETTINGS if manifest.get(key) != settings[key]]
+    if mismatched:
+        raise ValueError(f"Existing parts in {output_dir} were written with different settings "
+                         f"({', '.join(mismatched)}); rerun with the same settings or with --no-resume")
+
+
+def _write_manifest(output_dir, manifest):
+    with open(os.path.join(output_dir, "manifest.json"), "w", encoding="utf-8") as handle:
+        json.dump(manifest, handle, indent=2)
+
+
+def _part_totals(output_dir):
+    """(chunks, rows) across every part file in output_dir, from earlier runs too"""
+    parts = _part_paths(output_dir)
+    rows = 0
+    for path in parts:
+        with np.load(path) as part:
+            rows += len(part["row"])
+    return len(parts), rows
+
+
+def _write_part(output_dir, chunk_index, columns):
+    """Write one chunk's columns atomically so a crash never leaves a partial part"""
+    path = _part_path(output_dir, chunk_index)
+    temp_path = path + ".tmp"
+    with open(temp_path, "wb") as handle:
+        np.savez(handle, **columns)
+    os.replace(temp_path, path)
+
+
+def score_file(input_path, output_dir, model_name='glove-twitter-25', method='weighted',
+               workers=None, chunk_size=10000, text_field="text", id_field="id",
+               model_cache=DEFAULT_MODEL_CACHE, resume=True):
+    """
+    Score every sentence in input_path with a process pool, writing columnar parts
+
+    Each part-NNNNNN.npz holds the columns row (int64), id (str), score (float32,
+    NaN for sentences with no known words) and label (int8: -1/0/1). With resume,
+    chunks whose part file already exists are skipped; since chunk boundaries depend
+    on the settings, resuming raises ValueError if they differ from the run that wrote
+    the existing parts. Without resume, existing parts are removed first.
+
+    Returns a summary dict, also written to output_dir/manifest.json. Its totals count
+    every part in output_dir; chunks_written and rows_written count this run only.
+    """
+    workers = workers or os.cpu_count() or 1
+    os.makedirs(output_dir, exist_ok=True)
+    settings = {
+        "input": os.path.abspath(input_path),
+        "model": model_name,
+        "method": method,
+        "chunk_size": chunk_size,
+        "text_field": text_field,
+        "id_field": id_field,
+    }
+    if resume:
+        _check_resumable(output_dir, settings)
+    else:
+        for path in _part_paths(output_dir):
+            os.remove(path)
+    # Written before any part, so an interrupted run can still be resumed safely
+    _write_manifest(output_dir, settings)
+    model_path = export_model(model_name, model_cache)
+
+    # Two chunks per worker keeps every worker busy while bounding queued input
+    max_in_flight = 2 * workers
+    pending = {}
+    total_rows = 0
+    total_chunks = 0
+    skipped_chunks = 0
+    started = time.perf_counter()
+
+    def drain(block_until):
+        nonlocal total_rows, total_chunks
+        while len(pending) > block_until:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                ids = pending.pop(future)
+                chunk_index, columns = future.result()
+                columns["id"] = np.asarray(ids)
+                _write_part(output_dir, chunk_index, columns)
+                total_rows += len(ids)
+                total_chunks += 1
+                elapsed = time.perf_counter() - started
+                print(f"Scored chunk {chunk_index} ({total_rows} sentences, "
+                      f"{total_rows / max(elapsed, 1e-9):.0f} sentences/sec)", file=sys.stderr)
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(model_path, model_name)) as executor:
+        for chunk_index, first_row, texts, ids in iter_chunks(input_path, chunk_size, text_field, id_field):
+            if resume and os.path.exists(_part_path(output_dir, chunk_index)):
+                skipped_chunks += 1
+                continue
+            future = executor.submit(_score_chunk, chunk_index, first_row, texts, method)
+            pending[future] = ids
+            drain(max_in_flight - 1)
+        drain(0)
+
+    elapsed = time.perf_counter() - started
+    chunks, rows = _part_totals(output_dir)
+    summary = {
+        **settings,
+        "workers": workers,
+        "chunks": chunks,
+        "rows": rows,
+        "chunks_written": total_chunks,
+        "chunks_skipped": skipped_chunks,
+        "rows_written": total_rows,
+        "seconds": round(elapsed, 3),
+        "columns": {"row": "int64", "id": "str", "score": "float32", "label": "int8"},
+    }
+    _write_manifest(output_dir, summary)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk sentiment scoring with a process pool")
+    parser.add_argument("input", help="JSONL file (one record per line) or text file (one sentence per line)")
+    parser.add_argument("output_dir", help="Directory for part-*.npz column files and manifest.json")
+    parser.add_argument("--model", default="glove-twitter-25")
+    parser.add_argument("--method", default="weighted", choices=["similarity", "projection", "individual", "weighted"])
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--text-field", default="text")
+    parser.add_argument("--id-field", default="id")
+    parser.add_argument("--model-cache", default=DEFAULT_MODEL_CACHE)
+    parser.add_argument("--no-resume", action="store_true", help="Rescore chunks that already have part files")
+    args = parser.parse_args(argv)
+
+    try:
+        summary = score_file(
+            args.input,
+            args.output_dir,
+            model_name=args.model,
+            method=args.method,
+            workers=args.workers,
+            chunk_size=args.chunk_size,
+            text_field=args.text_field,
+            id_field=args.id_field,
+            model_cache=args.model_cache,
+            resume=not args.no_resume,
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
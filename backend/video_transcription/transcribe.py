@@ -1,16 +1,24 @@
-import sys
 import os
-import yt_dlp
-from youtube_transcript_api import YouTubeTranscriptApi
-import google.generativeai as genai
+import asyncio
+from functools import lru_cache
 from dotenv import load_dotenv
 import re
-from fastapi import APIRouter
-from serpapi import GoogleSearch
+from fastapi import APIRouter, BackgroundTasks, Request, Response
+from cancellation import CancelOnDisconnect, ClientDisconnected, http_disconnect
+from telemetry import span, timed
+from llm_accounting import generate, generate_async
+from lifecycle import heavy_import
+import upstream
+
+# Client libraries (Gemini, YouTube transcripts, SerpAPI) are imported where they are
+# first used, so importing the router stays cheap. heavy_import keeps those first
+# imports from racing the warm-up factories and background tasks
 
 router = APIRouter()
 load_dotenv()
 
+TRANSCRIPT_CACHE_SIZE = int(os.getenv('TRANSCRIPT_CACHE_SIZE', '128'))
+
 def setup_gemini(api_key=None):
     """Setup Gemini API with API key from environment or parameter"""
     if api_key is None:
@@ -19,20 +27,34 @@ def setup_gemini(api_key=None):
     if not api_key:
         raise ValueError("Gemini API key not found. Please set GEMINI_API_KEY environment variable or pass api_key parameter.")
     
+    genai = heavy_import("google.generativeai")
     genai.configure(api_key=api_key)
-    return genai.GenerativeModel('gemini-2.5-flash')
+    return upstream.wrap_model(genai.GenerativeModel('gemini-2.5-flash'))
 
+@timed("transcript_fetch")
 def get_transcript(video_id, languages=['en']):
-    """Get YouTube video transcript"""
+    """Get YouTube video transcript (cached, so a retried or abandoned request doesn't refetch it)"""
+    return _fetch_transcript(video_id, tuple(languages))
+
+def join_transcript_text(snippets):
+    """A transcript's snippets as one string, in order"""
+    return ' '.join([snippet['text'] for snippet in snippets])
+
+@lru_cache(maxsize=TRANSCRIPT_CACHE_SIZE)
+def _fetch_transcript(video_id, languages):
+    def fetch():
+        YouTubeTranscriptApi = heavy_import("youtube_transcript_api").YouTubeTranscriptApi
+        return YouTubeTranscriptApi().fetch(video_id, languages=languages)
+
     print(f'Getting transcript for id {video_id}')
-    ytt_api = YouTubeTranscriptApi()
-    transcript_obj = ytt_api.fetch(video_id, languages=languages)
+    transcript_obj = upstream.call(
+        "youtube", "transcript", {"video_id": video_id, "languages": list(languages)}, fetch,
+        encode=lambda transcript: transcript.to_raw_data(), decode=upstream.ReplayedTranscript,
+        synthesize=upstream.synthetic_transcript
+    )
     print(f'Transcript acquired for id {video_id}')
 
-    def get_raw_text(transcript_obj):
-        return ' '.join([snippet['text'] for snippet in transcript_obj.to_raw_data()])
-
-    transcript_obj.raw_text = get_raw_text(transcript_obj)
+    transcript_obj.raw_text = join_transcript_text(transcript_obj.to_raw_data())
     print(f'Converted to raw text: {len(transcript_obj.raw_text)} characters')
     
     return transcript_obj
@@ -50,7 +72,7 @@ def create_summary(transcript_text, model=None, api_key=None):
     
     try:
         print("\nGenerating summary with Gemini...")
-        response = model.generate_content(prompt)
+        response = generate(model, prompt, "summary", cache=True)
         return response.text
     except Exception as e:
         print(f"Error generating summary: {e}")
@@ -74,7 +96,7 @@ def generate_alternate_links(transcript_text, video_title=None, model=None, api_
         """
         
         print("\nAnalyzing bias and finding opposing perspectives...")
-        response = model.generate_content(bias_prompt)
+        response = generate(model, bias_prompt, "alternate_links", cache=True)
         search_terms = response.text.strip().replace('\n', ', ')
         print(f"Opposing search terms: {search_terms}")
         
@@ -93,22 +115,27 @@ def generate_alternate_links(transcript_text, video_title=None, model=None, api_
         print(f"Error generating alternate links: {e}")
         return "Error finding alternate links"
 
+@timed("search_web")
 def search_web(query):
     """Search the web using SerpAPI with fallback"""
     try:
         serpapi_key = os.getenv('SERPAPI_API_KEY')
-        if not serpapi_key:
+        if not serpapi_key and upstream.MODE != "replay":
             print("No SerpAPI key found, using fallback")
             return create_fallback_results(query)
         
         print(f"Searching for: {query}")
-        search = GoogleSearch({
-            "q": query,
-            "api_key": serpapi_key,
-            "num": 3  # Get 3 results
-        })
-        
-        results = search.get_dict()
+        def fetch():
+            GoogleSearch = heavy_import("serpapi").GoogleSearch
+            search = GoogleSearch({
+                "q": query,
+                "api_key": serpapi_key,
+                "num": 3  # Get 3 results
+            })
+            return search.get_dict()
+
+        results = upstream.call("serpapi", "search", {"q": query, "num": 3}, fetch,
+                                synthesize=upstream.synthetic_serpapi)
         
         # Check for API errors
         if "error" in results:
@@ -342,8 +369,18 @@ def parse_fact_checks_response(gemini_response, video_id):
         print(f"Error parsing fact checks response: {e}")
         return []
 
+def index_video_content(video_id, transcript_text, summary_text=None):
+    """Queue a video's transcript (and summary) for indexing into the debate evidence store"""
+    index_in_background = heavy_import("agents_debate.ingestion").index_in_background
+
+    source = f"https://www.youtube.com/watch?v={video_id}"
+    documents = [(transcript_text, {"source": source, "type": "transcript", "video_id": video_id})]
+    if summary_text:
+        documents.append((summary_text, {"source": source, "type": "summary", "video_id": video_id}))
+    index_in_background(documents)
+
 @router.get("/youtube-summary/{video_id}")
-def getYouTubeSummary(video_id: str):
+def getYouTubeSummary(video_id: str, background_tasks: BackgroundTasks):
     """Generate summary and alternate links for a YouTube video"""
     try:
         print(f"\n=== Processing video ID: {video_id} ===")
@@ -359,6 +396,9 @@ def getYouTubeSummary(video_id: str):
         
         # Parse alternate links into JSON format
         alternate_links_json = parse_alternate_links_to_json(alternate_links_response)
+
+        # Index transcript and summary for debate evidence after the response is sent
+        background_tasks.add_task(index_video_content, video_id, transcript.raw_text, summary_text)
         
         # Return response
         response = {
@@ -378,17 +418,37 @@ def getYouTubeSummary(video_id: str):
         }
 
 @router.get("/youtube-transcript/{video_id}")
-def getYouTubeTranscript(video_id: str):
-    """Extract transcript and return fact checks in FlashEvent format"""
+async def getYouTubeTranscript(video_id: str, request: Request, response: Response,
+                               background_tasks: BackgroundTasks):
+    """
+    Extract transcript and return fact checks in FlashEvent format
+
+    The Gemini call is cancelled if the client disconnects. Work already running in
+    worker threads (the transcript fetch, URL searches) can't be interrupted and
+    finishes on its own; the transcript still lands in the cache and the index.
+    A fact check that failed also returns [], with an X-Degraded header to tell it
+    apart from a video with nothing to check.
+    """
+    try:
+        async with CancelOnDisconnect(http_disconnect(request)):
+            return await _fact_check_video(video_id, background_tasks, response)
+    except ClientDisconnected:
+        print(f"Client disconnected, fact check for {video_id} cancelled")
+        return []
+
+async def _fact_check_video(video_id, background_tasks, response):
     try:
         print(f"\n=== Processing YouTube video: {video_id} ===")
         
         # Get the transcript first
-        transcript_obj = get_transcript(video_id=video_id)
+        transcript_obj = await asyncio.to_thread(get_transcript, video_id=video_id)
         transcript_text = transcript_obj.raw_text
+
+        # Index the transcript for debate evidence after the response is sent
+        background_tasks.add_task(index_video_content, video_id, transcript_text)
         
-        # Setup Gemini model
-        model = setup_gemini()
+        # Setup Gemini model; its first import must not block the event loop
+        model = await asyncio.to_thread(setup_gemini)
         
         # The fact-checking prompt that returns FlashEvent format
         prompt = f"""You are an expert, meticulous, and neutral fact-checker and bias analyst. Your primary goal is to provide a comprehensive and objective analysis of the provided YouTube video content. Analyze this YouTube video transcript, identify the main topic(s) and any related statements/claims.
@@ -428,20 +488,51 @@ Analyze at least two statements for each minute of the video's duration. For exa
         print(prompt)
         
         # Generate response from Gemini
-        response = model.generate_content(prompt)
+        gemini_response = await generate_async(model, prompt, "fact_check", cache=True)
 
-        print(response)
+        print(gemini_response)
         
-        # Parse the response to get FlashEvent array
-        fact_checks = parse_fact_checks_response(response.text, video_id)
+        # Parse the response to get FlashEvent array (may search for missing URLs)
+        async with span("parse_fact_checks"):
+            fact_checks = await asyncio.to_thread(parse_fact_checks_response, gemini_response.text, video_id)
         
         print(f"Generated {len(fact_checks)} fact checks successfully")
         return fact_checks
         
     except Exception as e:
         print(f"Error in getYouTubeTranscript: {str(e)}")
+        response.headers["X-Degraded"] = "fact_check"
         return []
 
+@router.get("/youtube-sentiment/{video_id}")
+def getYouTubeSentiment(video_id: str, window: int = 5, method: str = "weighted", encoding: str = "json"):
+    """Return a per-snippet sentiment curve with rolling aggregates for a YouTube video"""
+    sentiment_timeseries = heavy_import(".sentiment", __package__).sentiment_timeseries
+
+    try:
+        print(f"\n=== Scoring sentiment for video: {video_id} ===")
+
+        transcript_obj = get_transcript(video_id=video_id)
+        snippets = transcript_obj.to_raw_data()
+
+        curve = sentiment_timeseries(
+            texts=[snippet['text'] for snippet in snippets],
+            starts=[snippet['start'] for snippet in snippets],
+            durations=[snippet['duration'] for snippet in snippets],
+            window=window,
+            method=method,
+            encoding=encoding
+        )
+        curve["video_id"] = video_id
+        return curve
+
+    except Exception as e:
+        print(f"Error in getYouTubeSentiment: {str(e)}")
+        return {
+            "error": f"Error scoring YouTube sentiment: {str(e)}",
+            "video_id": video_id,
+        }
+
 @router.get("/test-gemini")
 def testGemini():
     """Test if Gemini API is working"""